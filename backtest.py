@@ -0,0 +1,314 @@
+"""
+Backtest không giao diện cho chiến lược EMA/LWMA/Donchian của backtest.html
+
+Quy tắc giống hệt bản trình duyệt (checkAndExecuteTrades, openPosition, checkForExitSignals):
+- Bỏ qua các nến có chỉ số < max(emaPeriod, lwmaPeriod, donchianPeriod)
+- LONG khi close > EMA và LWMA > Donchian middle, SHORT khi close < EMA và LWMA < Donchian middle,
+  vào lệnh tại giá close của nến tín hiệu, khối lượng = balance * orderSizePercent / giá
+- Thoát lệnh từ nến kế tiếp: kiểm tra SL trước rồi mới tới TP, khớp đúng giá SL/TP;
+  nến vừa thoát lệnh không được vào lệnh mới
+
+Chỉ báo được tính một lần bằng NumPy. Vòng lặp chỉ chạy theo số lệnh: điểm thoát được tìm bằng
+find_exit, điểm vào tiếp theo bằng tìm kiếm nhị phân trên các chỉ số có tín hiệu.
+
+Chạy: python backtest.py METISUSDT --ema 20 --lwma 14 --donchian 20 --tp 2.5 --sl 1.5
+"""
+import argparse
+import bisect
+import json
+import math
+import time
+
+import numpy as np
+
+import indicators
+from data_cache import DATA_DIRECTORY, load_frame, resolve_source
+
+# Tham số mặc định giống backtest.html
+DEFAULT_PARAMS = {
+    "ema_period": 20,
+    "lwma_period": 14,
+    "lwma_weights": None,
+    "donchian_period": 20,
+    "initial_balance": 1000.0,
+    "order_size_percent": 0.10,
+    "take_profit_percent": 0.025,
+    "stop_loss_percent": 0.015,
+}
+
+# Độ dài cửa sổ đầu tiên khi tìm điểm thoát (tăng gấp đôi nếu chưa thấy)
+EXIT_SEARCH_CHUNK = 64
+
+def load_candles(symbol, timeframe='15m', directory=DATA_DIRECTORY):
+    """
+    Đọc nến của một symbol thành dict mảng NumPy: time (Unix giây của open_time), open, high, low, close
+    """
+    path, _ = resolve_source(symbol, timeframe, directory)
+    if path is None:
+        raise FileNotFoundError(f"Không có dữ liệu cho {symbol} ({timeframe}) trong {directory}")
+    df = load_frame(path)
+    return {
+        "time": df['open_time'].to_numpy('datetime64[s]').astype(np.int64),
+        "open": df['open'].to_numpy(np.float64),
+        "high": df['high'].to_numpy(np.float64),
+        "low": df['low'].to_numpy(np.float64),
+        "close": df['close'].to_numpy(np.float64),
+    }
+
+def merge_params(params=None):
+    merged = dict(DEFAULT_PARAMS)
+    if params:
+        merged.update(params)
+    return merged
+
+def compute_indicators(candles, params):
+    """
+    Tính EMA, LWMA (trọng số tùy chỉnh nếu có từ 2 giá trị trở lên) và Donchian middle
+    """
+    close = candles["close"]
+    weights = params.get("lwma_weights")
+    if weights and len(weights) > 1:
+        lwma_values = indicators.weighted_ma(close, weights)
+    else:
+        lwma_values = indicators.lwma(close, params["lwma_period"])
+    _, middle, _ = indicators.donchian(candles["high"], candles["low"], params["donchian_period"])
+    return {
+        "ema": indicators.ema(close, params["ema_period"]),
+        "lwma": lwma_values,
+        "donchian_middle": middle,
+    }
+
+def entry_signals(candles, indicator_values, params):
+    """
+    Trả về (long_mask, short_mask) theo điều kiện vào lệnh của checkAndExecuteTrades
+    """
+    close = candles["close"]
+    ema_values = indicator_values["ema"]
+    lwma_values = indicator_values["lwma"]
+    middle = indicator_values["donchian_middle"]
+
+    # So sánh với NaN luôn False, tương đương giá trị null trong bản JS
+    long_mask = (close > ema_values) & (lwma_values > middle)
+    short_mask = (close < ema_values) & (lwma_values < middle)
+
+    max_period = max(params["ema_period"], params["lwma_period"], params["donchian_period"])
+    long_mask[:max_period] = False
+    short_mask[:max_period] = False
+    return long_mask, short_mask
+
+def find_exit(high, low, start, is_long, take_profit, stop_loss, high_list=None, low_list=None):
+    """
+    Tìm nến đầu tiên từ `start` chạm SL hoặc TP (SL được ưu tiên trong cùng một nến)
+
+    Phần lớn lệnh đóng sau vài chục nến nên EXIT_SEARCH_CHUNK nến đầu được duyệt trên list Python
+    (high_list/low_list) để tránh chi phí gọi NumPy; sau đó mới so sánh vectorized theo cửa sổ tăng dần.
+
+    Returns:
+    tuple: (chỉ số nến, 'SL'/'TP') hoặc (None, None) nếu chưa thoát tới hết dữ liệu
+    """
+    n = len(high)
+    chunk = EXIT_SEARCH_CHUNK
+    if high_list is not None:
+        stop = min(n, start + chunk)
+        for k in range(start, stop):
+            if is_long:
+                if low_list[k] <= stop_loss:
+                    return k, 'SL'
+                if high_list[k] >= take_profit:
+                    return k, 'TP'
+            else:
+                if high_list[k] >= stop_loss:
+                    return k, 'SL'
+                if low_list[k] <= take_profit:
+                    return k, 'TP'
+        start = stop
+        chunk *= 2
+
+    while start < n:
+        stop = min(n, start + chunk)
+        if is_long:
+            sl_hit = low[start:stop] <= stop_loss
+            tp_hit = high[start:stop] >= take_profit
+        else:
+            sl_hit = high[start:stop] >= stop_loss
+            tp_hit = low[start:stop] <= take_profit
+        hits = np.flatnonzero(sl_hit | tp_hit)
+        if len(hits):
+            k = hits[0]
+            return start + int(k), 'SL' if sl_hit[k] else 'TP'
+        start = stop
+        chunk *= 2
+    return None, None
+
+def new_metrics(initial_balance):
+    return {
+        "totalTrades": 0, "winningTrades": 0, "losingTrades": 0, "winRate": 0, "grossProfit": 0,
+        "grossLoss": 0, "profitFactor": 0, "peakBalance": initial_balance, "maxDrawdown": 0,
+        "longTrades": 0, "shortTrades": 0, "tpHits": 0, "slHits": 0
+    }
+
+def update_metrics(metrics, trade, balance):
+    """
+    Cập nhật thống kê sau mỗi lệnh đóng (như updateMetrics)
+    """
+    metrics["totalTrades"] += 1
+    if trade["pnl"] > 0:
+        metrics["winningTrades"] += 1
+    else:
+        metrics["losingTrades"] += 1
+
+    metrics["grossProfit"] += max(0, trade["pnl"])
+    metrics["grossLoss"] += abs(min(0, trade["pnl"]))
+
+    if trade["type"] == 'LONG':
+        metrics["longTrades"] += 1
+    else:
+        metrics["shortTrades"] += 1
+
+    if trade["exitReason"] == 'TP':
+        metrics["tpHits"] += 1
+    elif trade["exitReason"] == 'SL':
+        metrics["slHits"] += 1
+
+    if balance > metrics["peakBalance"]:
+        metrics["peakBalance"] = balance
+    drawdown = ((metrics["peakBalance"] - balance) / metrics["peakBalance"]) * 100 if metrics["peakBalance"] > 0 else 0
+    metrics["maxDrawdown"] = max(metrics["maxDrawdown"], drawdown)
+
+    metrics["winRate"] = (metrics["winningTrades"] / metrics["totalTrades"]) * 100 if metrics["totalTrades"] > 0 else 0
+    if metrics["grossLoss"] > 0:
+        metrics["profitFactor"] = metrics["grossProfit"] / metrics["grossLoss"]
+    else:
+        metrics["profitFactor"] = math.inf if metrics["grossProfit"] > 0 else 0
+
+def run_backtest(candles, params=None, indicator_values=None):
+    """
+    Chạy backtest trên một symbol
+
+    Parameters:
+    candles (dict): Kết quả của load_candles
+    params (dict): Tham số chiến lược (thiếu thì lấy từ DEFAULT_PARAMS)
+    indicator_values (dict): Chỉ báo đã tính sẵn (dùng lại khi quét tham số)
+
+    Returns:
+    dict: {"trades": [...], "metrics": {...}, "balance": ..., "openPosition": ... hoặc None}
+    """
+    params = merge_params(params)
+    if indicator_values is None:
+        indicator_values = compute_indicators(candles, params)
+    long_mask, short_mask = entry_signals(candles, indicator_values, params)
+    signal_index = np.flatnonzero(long_mask | short_mask).tolist()
+    is_long_signal = long_mask.tolist()
+
+    # Truy cập từng phần tử trên list Python nhanh hơn nhiều so với trên mảng NumPy
+    times = candles["time"].tolist()
+    high = candles["high"]
+    low = candles["low"]
+    high_list = high.tolist()
+    low_list = low.tolist()
+    close = candles["close"].tolist()
+    balance = float(params["initial_balance"])
+    tp_percent = params["take_profit_percent"]
+    sl_percent = params["stop_loss_percent"]
+    metrics = new_metrics(balance)
+    trades = []
+    open_position = None
+
+    cursor = 0
+    while cursor < len(signal_index):
+        entry = signal_index[cursor]
+        is_long = is_long_signal[entry]
+        entry_price = close[entry]
+        quantity = balance * params["order_size_percent"] / entry_price
+        if is_long:
+            take_profit = entry_price * (1 + tp_percent)
+            stop_loss = entry_price * (1 - sl_percent)
+        else:
+            take_profit = entry_price * (1 - tp_percent)
+            stop_loss = entry_price * (1 + sl_percent)
+        if quantity <= 0 or stop_loss == entry_price or take_profit == entry_price:
+            # openPosition bỏ qua lệnh, thử lại ở tín hiệu kế tiếp
+            cursor += 1
+            continue
+
+        exit_index, reason = find_exit(high, low, entry + 1, is_long, take_profit, stop_loss, high_list, low_list)
+        position_type = 'LONG' if is_long else 'SHORT'
+        if exit_index is None:
+            open_position = {
+                "type": position_type, "entryPrice": entry_price, "quantity": quantity,
+                "entryTime": times[entry], "entryIndex": entry,
+                "takeProfit": take_profit, "stopLoss": stop_loss
+            }
+            break
+
+        exit_price = stop_loss if reason == 'SL' else take_profit
+        direction = 1 if is_long else -1
+        pnl = direction * (exit_price - entry_price) * quantity
+        trade = {
+            "id": len(trades) + 1,
+            "type": position_type,
+            "entryPrice": entry_price,
+            "exitPrice": exit_price,
+            "exitReason": reason,
+            "pnl": pnl,
+            "pnlPercent": (pnl / (entry_price * quantity)) * 100,
+            "entryTime": times[entry],
+            "exitTime": times[exit_index],
+            "duration": (times[exit_index] - times[entry]) // 60,
+        }
+        trades.append(trade)
+        balance += pnl
+        update_metrics(metrics, trade, balance)
+
+        # Nến thoát lệnh không vào lệnh mới: tìm tín hiệu đầu tiên sau nến đó
+        cursor = bisect.bisect_left(signal_index, exit_index + 1)
+
+    return {"trades": trades, "metrics": metrics, "balance": balance, "openPosition": open_position}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backtest chiến lược EMA/LWMA/Donchian")
+    parser.add_argument('symbol')
+    parser.add_argument('--timeframe', default='15m')
+    parser.add_argument('--ema', type=int, default=DEFAULT_PARAMS["ema_period"])
+    parser.add_argument('--lwma', type=int, default=DEFAULT_PARAMS["lwma_period"])
+    parser.add_argument('--weights', default='', help="Trọng số LWMA tùy chỉnh, VD: 14,13,12")
+    parser.add_argument('--donchian', type=int, default=DEFAULT_PARAMS["donchian_period"])
+    parser.add_argument('--tp', type=float, default=DEFAULT_PARAMS["take_profit_percent"] * 100, help="Take profit (%%)")
+    parser.add_argument('--sl', type=float, default=DEFAULT_PARAMS["stop_loss_percent"] * 100, help="Stop loss (%%)")
+    parser.add_argument('--size', type=float, default=DEFAULT_PARAMS["order_size_percent"] * 100, help="Khối lượng mỗi lệnh (%% balance)")
+    parser.add_argument('--balance', type=float, default=DEFAULT_PARAMS["initial_balance"])
+    parser.add_argument('--output', help="Ghi danh sách lệnh và thống kê ra file JSON")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    candles = load_candles(args.symbol, args.timeframe)
+    params = {
+        "ema_period": args.ema,
+        "lwma_period": args.lwma,
+        "lwma_weights": indicators.parse_weights(args.weights),
+        "donchian_period": args.donchian,
+        "initial_balance": args.balance,
+        "order_size_percent": args.size / 100,
+        "take_profit_percent": args.tp / 100,
+        "stop_loss_percent": args.sl / 100,
+    }
+
+    start = time.perf_counter()
+    result = run_backtest(candles, params)
+    elapsed = time.perf_counter() - start
+
+    metrics = result["metrics"]
+    print(f"{args.symbol} ({args.timeframe}): {len(candles['close'])} nến trong {elapsed * 1000:.1f} ms")
+    print(f"Số lệnh: {metrics['totalTrades']} (LONG {metrics['longTrades']} / SHORT {metrics['shortTrades']}), "
+          f"TP {metrics['tpHits']} / SL {metrics['slHits']}")
+    print(f"Win rate: {metrics['winRate']:.2f}%, profit factor: {metrics['profitFactor']:.2f}, "
+          f"max drawdown: {metrics['maxDrawdown']:.2f}%")
+    print(f"Balance: {params['initial_balance']:.2f} -> {result['balance']:.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark candle archive nén (.ohlcz) so với CSV và CSV gzip
+
+- Kích thước: tổng CSV, gzip (mức 6, như file .gz mà trang JS đọc được) và archive
+- Giải mã: nến/s khi đọc toàn bộ bằng pd.read_csv (CSV, gzip) và candle_archive.read_dataframe
+- Truy cập ngẫu nhiên: thời gian đọc 100 nến cuối và một khoảng 1 ngày ở giữa file
+
+Chạy từ thư mục gốc: python benchmarks/bench_archive.py --symbols 20
+"""
+import argparse
+import gzip
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import pandas as pd
+
+import candle_archive
+
+DATA_DIRECTORY = "binance_futures_data"
+
+def read_csv_bytes(content):
+    return pd.read_csv(io.BytesIO(content), parse_dates=['open_time', 'close_time'])
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark candle archive nén")
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--interval', default='15m')
+    parser.add_argument('--samples', type=int, default=200, help="Số lần đọc ngẫu nhiên")
+    args = parser.parse_args()
+
+    suffix = f"_{args.interval}.csv"
+    csv_paths = sorted(os.path.join(DATA_DIRECTORY, f) for f in os.listdir(DATA_DIRECTORY)
+                       if f.endswith(suffix))[:args.symbols]
+    hints = candle_archive.load_hints()
+    sizes = {"CSV": 0, "gzip": 0, "archive": 0}
+    elapsed = {"CSV": 0.0, "gzip": 0.0, "archive": 0.0}
+    rows = 0
+    encode_time = 0.0
+    archives = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for csv_path in csv_paths:
+            with open(csv_path, 'rb') as f:
+                content = f.read()
+            packed = gzip.compress(content, compresslevel=6)
+            df, seconds = timed(read_csv_bytes, content)
+            elapsed["CSV"] += seconds
+            _, seconds = timed(lambda: read_csv_bytes(gzip.decompress(packed)))
+            elapsed["gzip"] += seconds
+
+            path = os.path.join(directory, os.path.basename(candle_archive.archive_path_for_csv(csv_path)))
+            symbol = os.path.basename(csv_path).split('_')[1]
+            _, seconds = timed(candle_archive.write_archive, df, path, hints.get(symbol))
+            encode_time += seconds
+            decoded, seconds = timed(candle_archive.read_dataframe, path)
+            elapsed["archive"] += seconds
+            # Archive không lưu cột ignore, open_time/close_time ở độ phân giải ms
+            if not all((decoded[name].values == df[name].values).all() for name in decoded.columns):
+                raise RuntimeError(f"Archive của {csv_path} không khớp CSV")
+
+            sizes["CSV"] += len(content)
+            sizes["gzip"] += len(packed)
+            sizes["archive"] += os.path.getsize(path)
+            rows += len(df)
+            archives.append((path, df['open_time'].iloc[0].value // 10 ** 6, df['open_time'].iloc[-1].value // 10 ** 6))
+
+        print(f"{len(csv_paths)} file, {rows} nến, codec {candle_archive.CODEC_NAMES[candle_archive.default_codec()]}")
+        for name, size in sizes.items():
+            print(f"{name:8s} {size / 1e6:8.1f} MB ({sizes['CSV'] / size:5.2f}x nhỏ hơn CSV) | "
+                  f"đọc toàn bộ {rows / elapsed[name]:12,.0f} nến/s")
+        print(f"Mã hóa archive: {rows / encode_time:,.0f} nến/s")
+
+        rng = random.Random(0)
+        samples = [rng.choice(archives) for _ in range(args.samples)]
+        start = time.perf_counter()
+        for path, _, _ in samples:
+            candle_archive.read_dataframe(path, last=100)
+        tail_latency = (time.perf_counter() - start) / len(samples)
+        start = time.perf_counter()
+        for path, first, last in samples:
+            start_ms = rng.randint(first, last)
+            candle_archive.read_range(path, start_ms, start_ms + 86400000)
+        range_latency = (time.perf_counter() - start) / len(samples)
+        print(f"Đọc 100 nến cuối: {tail_latency * 1e3:.2f} ms | khoảng 1 ngày ngẫu nhiên: {range_latency * 1e3:.2f} ms")
+
+if __name__ == '__main__':
+    main()
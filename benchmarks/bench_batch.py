@@ -0,0 +1,57 @@
+"""
+Benchmark tải watchlist: N request /api/data riêng lẻ so với một request /api/data/batch
+(dùng Flask test client, không qua mạng), có và không có lựa chọn columns
+
+Chạy từ thư mục gốc: python benchmarks/bench_batch.py --symbols 50 --limit 500
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import server
+
+def timed(label, func, repeat):
+    start = time.perf_counter()
+    size = 0
+    for _ in range(repeat):
+        size = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<40} {elapsed * 1000:>8.1f} ms/lần  {size / 1e3:>9.1f} KB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /api/data/batch")
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--timeframe', default='15m')
+    parser.add_argument('--limit', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    suffix = f"_{args.timeframe}.csv"
+    names = sorted(f for f in os.listdir(server.frame_cache.directory) if f.endswith(suffix))
+    symbols = [name[len("binance_"):-len(suffix)] for name in names][:args.symbols]
+    client = server.app.test_client()
+
+    def single():
+        return sum(len(client.get(f"/api/data?symbol={symbol}&timeframe={args.timeframe}&limit={args.limit}").data)
+                   for symbol in symbols)
+
+    def batch(columns=None):
+        url = f"/api/data/batch?symbols={','.join(symbols)}&timeframe={args.timeframe}&limit={args.limit}"
+        if columns:
+            url += f"&columns={columns}"
+        return len(client.get(url).data)
+
+    # Lần đầu để nạp cache, các lần sau đo trên cache nóng
+    single()
+    print(f"{len(symbols)} symbol, {args.limit} nến mỗi symbol, {server.BATCH_WORKERS} luồng batch")
+    timed(f"{len(symbols)} request /api/data", single, args.repeat)
+    timed("1 request /api/data/batch", batch, args.repeat)
+    timed("1 request /api/data/batch columns=close", lambda: batch("close"), args.repeat)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark tốc độ tải: tuần tự (download_futures_data) so với engine đồng thời (download_many)
+chạy trên mock server cục bộ, không cần mạng
+
+Chạy từ thư mục gốc: python benchmarks/bench_download.py --symbols 10 --workers 8 --latency 0.05
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import binance
+import mock_binance
+from rate_limiter import WeightRateLimiter
+
+def list_symbols(count, interval='15m'):
+    suffix = f"_{interval}.csv"
+    names = sorted(f for f in os.listdir(binance.DATA_DIRECTORY) if f.endswith(suffix))
+    return [name[len("binance_"):-len(suffix)] for name in names][:count]
+
+def run_sequential(symbols, interval):
+    rows = 0
+    for symbol in symbols:
+        df = binance.download_futures_data(symbol, interval)
+        if df is not None:
+            rows += len(df)
+    return rows
+
+def run_concurrent(symbols, interval, workers, weight_limit):
+    tasks = [(symbol, interval, None, None, None) for symbol in symbols]
+    limiter = WeightRateLimiter(weight_limit)
+    rows = 0
+    for task, df in binance.download_many(tasks, workers, limiter):
+        if df is not None:
+            rows += len(df)
+    return rows, limiter.stats()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tải kline trên mock server")
+    parser.add_argument('--symbols', type=int, default=10)
+    parser.add_argument('--interval', default='15m')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05, help="Độ trễ giả lập mỗi request (giây)")
+    parser.add_argument('--weight-limit', type=int, default=2400)
+    parser.add_argument('--skip-sequential', action='store_true')
+    args = parser.parse_args()
+
+    mock_binance.settings["latency"] = args.latency
+    mock_binance.settings["weight_limit"] = args.weight_limit
+    server, base_url = mock_binance.start_in_thread()
+    binance.BINANCE_FAPI_URL = base_url
+    symbols = list_symbols(args.symbols, args.interval)
+
+    try:
+        if not args.skip_sequential:
+            mock_binance.reset_stats()
+            start = time.perf_counter()
+            rows = run_sequential(symbols, args.interval)
+            elapsed = time.perf_counter() - start
+            print(f"Tuần tự:   {rows} nến trong {elapsed:.2f}s ({rows / elapsed:,.0f} nến/s), mock: {dict(mock_binance.stats)}")
+
+        mock_binance.reset_stats()
+        start = time.perf_counter()
+        rows, limiter_stats = run_concurrent(symbols, args.interval, args.workers, args.weight_limit)
+        elapsed = time.perf_counter() - start
+        print(f"Đồng thời: {rows} nến trong {elapsed:.2f}s ({rows / elapsed:,.0f} nến/s), "
+              f"workers={args.workers}, limiter: {limiter_stats}, mock: {dict(mock_binance.stats)}")
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark các định dạng response của /api/data (rows, columns, binary) trên symbol có nhiều nến nhất:
+thời gian tạo response, kích thước (có và không gzip) và thời gian trả 304 khi ETag khớp
+
+Chạy từ thư mục gốc: python benchmarks/bench_encoding.py --repeat 5
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import response_encoding
+import server
+
+def timed(client, url, repeat, headers=None):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(url, headers=headers or {})
+    return response, (time.perf_counter() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark định dạng response của /api/data")
+    parser.add_argument('--timeframe', default='15m')
+    parser.add_argument('--limit', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    paths = glob.glob(os.path.join(server.frame_cache.directory, f"*_{args.timeframe}.csv"))
+    symbol = os.path.basename(max(paths, key=os.path.getsize)).split('_')[1]
+    client = server.app.test_client()
+    print(f"{symbol} {args.timeframe}, limit={args.limit}")
+
+    for data_format in response_encoding.available_formats():
+        url = f"/api/data?symbol={symbol}&timeframe={args.timeframe}&limit={args.limit}&format={data_format}"
+        # Lần đầu để nạp cache dữ liệu
+        client.get(url)
+        plain, plain_time = timed(client, url, args.repeat)
+        packed, packed_time = timed(client, url, args.repeat, {'Accept-Encoding': 'gzip'})
+        _, cached_time = timed(client, url, args.repeat, {'If-None-Match': plain.headers['ETag']})
+        print(f"{data_format:<8} {plain_time * 1000:>7.1f} ms {len(plain.data) / 1e6:>6.2f} MB | "
+              f"gzip {packed_time * 1000:>7.1f} ms {len(packed.data) / 1e6:>6.2f} MB | 304 {cached_time * 1000:>5.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Benchmark bước nhận dữ liệu kline trên các response đã ghi sẵn (fixture), không cần mạng
+
+- Parse + ghép: cách cũ (json.loads, list các list của mọi nến, pd.DataFrame + pd.to_numeric)
+  so với parse_klines_page + KlineBuffer: thời gian, nến/s và bộ nhớ đỉnh (tracemalloc)
+- HTTP: phát lại các fixture bằng server HTTP/1.1 cục bộ có keep-alive, so sánh requests.get
+  (mỗi request một kết nối mới) với requests.Session dùng lại kết nối
+
+Lần chạy đầu tự ghi fixture (các trang 1500 nến lấy từ mock_binance) vào benchmarks/fixtures.
+
+Chạy từ thư mục gốc: python benchmarks/bench_ingest.py --symbols 5
+"""
+import argparse
+import gc
+import glob
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import pandas as pd
+import requests
+
+import binance
+import mock_binance
+from kline_ingest import KLINE_COLUMNS, KlineBuffer, parse_klines_page
+
+FIXTURE_DIRECTORY = os.path.join("benchmarks", "fixtures", "klines")
+
+def record_fixtures(symbols, interval, directory=FIXTURE_DIRECTORY):
+    """
+    Ghi lại nội dung response của mọi trang klines của các symbol từ mock server
+    """
+    os.makedirs(directory, exist_ok=True)
+    server, base_url = mock_binance.start_in_thread()
+    session = requests.Session()
+    try:
+        for symbol in symbols:
+            start_time = 0
+            page_index = 0
+            while True:
+                response = session.get(f"{base_url}/fapi/v1/klines", params={
+                    'symbol': symbol, 'interval': interval, 'startTime': start_time, 'limit': binance.KLINES_LIMIT})
+                response.raise_for_status()
+                rows = response.json()
+                if not rows:
+                    break
+                path = os.path.join(directory, f"{symbol}_{interval}_{page_index:04d}.json")
+                with open(path, 'wb') as f:
+                    f.write(response.content)
+                start_time = rows[-1][0] + 1
+                page_index += 1
+    finally:
+        server.shutdown()
+
+def load_fixtures(interval, directory=FIXTURE_DIRECTORY):
+    """
+    Returns:
+    dict: {symbol: [nội dung từng trang (bytes)]}
+    """
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(directory, f"*_{interval}_*.json"))):
+        symbol = os.path.basename(path).rsplit('_', 2)[0]
+        with open(path, 'rb') as f:
+            fixtures.setdefault(symbol, []).append(f.read())
+    return fixtures
+
+def legacy_ingest(pages):
+    # Cách làm trước đây của download_futures_data
+    all_data = []
+    for content in pages:
+        all_data.extend(json.loads(content))
+    df = pd.DataFrame(all_data, columns=KLINE_COLUMNS)
+    for col in ['open', 'high', 'low', 'close', 'volume', 'quote_asset_volume',
+                'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume']:
+        df[col] = pd.to_numeric(df[col])
+    df['open_time'] = pd.to_datetime(df['open_time'], unit='ms')
+    df['close_time'] = pd.to_datetime(df['close_time'], unit='ms')
+    return df
+
+def streaming_ingest(pages):
+    buffer = KlineBuffer(len(pages) * binance.KLINES_LIMIT)
+    for content in pages:
+        buffer.extend(parse_klines_page(content))
+    return buffer.to_dataframe()
+
+def measure_speed(ingest, fixtures, repeat):
+    rows = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for pages in fixtures.values():
+            rows += len(ingest(pages))
+    return rows, time.perf_counter() - start
+
+def measure_memory(ingest, pages):
+    """
+    Bộ nhớ đỉnh (tracemalloc) khi nhận toàn bộ các trang của một symbol, và kích thước DataFrame cuối
+    """
+    gc.collect()
+    tracemalloc.start()
+    df = ingest(pages)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, int(df.memory_usage(deep=True).sum())
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1: giữ kết nối giữa các request như API thật
+    protocol_version = "HTTP/1.1"
+    payloads = []
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with FixtureHandler.lock:
+            FixtureHandler.connections += 1
+
+    def do_GET(self):
+        body = self.payloads[int(self.path.rsplit('/', 1)[-1])]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def measure_http(payloads):
+    """
+    Phát lại các fixture và tải lần lượt: requests.get so với requests.Session
+    """
+    FixtureHandler.payloads = payloads
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/page"
+    results = {}
+    try:
+        for name, client in (("requests.get", requests), ("Session", binance.create_session(1))):
+            FixtureHandler.connections = 0
+            start = time.perf_counter()
+            for index in range(len(payloads)):
+                parse_klines_page(client.get(f"{base_url}/{index}", timeout=30).content)
+            results[name] = (time.perf_counter() - start, FixtureHandler.connections)
+    finally:
+        server.shutdown()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nhận dữ liệu kline trên fixture")
+    parser.add_argument('--symbols', type=int, default=5)
+    parser.add_argument('--interval', default='15m')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--record', action='store_true', help="Ghi lại fixture từ mock server")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.interval)
+    if args.record or len(fixtures) < args.symbols:
+        suffix = f"_{args.interval}.csv"
+        names = sorted(f for f in os.listdir(binance.DATA_DIRECTORY) if f.endswith(suffix))
+        symbols = [name[len("binance_"):-len(suffix)] for name in names][:args.symbols]
+        record_fixtures(symbols, args.interval)
+        fixtures = load_fixtures(args.interval)
+    fixtures = dict(list(fixtures.items())[:args.symbols])
+    pages = sum(len(p) for p in fixtures.values())
+    size = sum(len(content) for p in fixtures.values() for content in p)
+    print(f"Fixture: {len(fixtures)} symbol, {pages} trang, {size / 1e6:.1f} MB JSON")
+
+    largest = max(fixtures.values(), key=len)
+    for name, ingest in (("Cũ (json + DataFrame)", legacy_ingest), ("Mới (KlineBuffer)", streaming_ingest)):
+        rows, elapsed = measure_speed(ingest, fixtures, args.repeat)
+        peak, final = measure_memory(ingest, largest)
+        print(f"{name:24s} {rows / elapsed:12,.0f} nến/s | bộ nhớ đỉnh {peak / 1e6:7.1f} MB "
+              f"cho {len(largest)} trang, DataFrame cuối {final / 1e6:.1f} MB ({peak / final:.1f}x)")
+
+    payloads = [content for p in fixtures.values() for content in p]
+    for name, (elapsed, connections) in measure_http(payloads).items():
+        print(f"HTTP {name:13s} {len(payloads)} request trong {elapsed:.2f}s, {connections} kết nối")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark quét điều kiện vào lệnh trên mọi symbol trong config.json:
+từng symbol một (đọc nến cuối, indicators.ema/lwma/donchian, backtest.entry_signals) so với
+scanner (một panel symbol x thời gian, chỉ báo tính cho mọi symbol trong một lượt)
+
+Chạy từ thư mục gốc: python benchmarks/bench_scanner.py --bars 500
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import numpy as np
+
+import backtest
+import scanner
+from data_cache import FrameCache
+
+def scan_one_by_one(symbols, timeframe, bars, params, load):
+    matches = []
+    for symbol in symbols:
+        df = load(symbol, timeframe, bars)
+        if df is None or len(df) == 0:
+            continue
+        candles = {name: df[name].to_numpy(np.float64) for name in ('high', 'low', 'close')}
+        values = backtest.compute_indicators(candles, params)
+        long_mask, short_mask = backtest.entry_signals(candles, values, params)
+        if long_mask[-1]:
+            matches.append((symbol, 'long'))
+        elif short_mask[-1]:
+            matches.append((symbol, 'short'))
+    return matches
+
+def scan_panel(symbols, timeframe, bars, params, load):
+    panel = scanner.load_panel(symbols, timeframe, bars, load)
+    matches = scanner.scan(panel, params["ema_period"], params["lwma_period"], params["donchian_period"])
+    return [(match["symbol"], match["side"]) for match in matches]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scanner trên mọi symbol")
+    parser.add_argument('--timeframe', default='15m')
+    parser.add_argument('--bars', type=int, default=scanner.DEFAULT_BARS)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    symbols = scanner.config_symbols()
+    params = backtest.merge_params()
+    runs = (("Từng symbol", scan_one_by_one, lambda: FrameCache().get),
+            ("Scanner (FrameCache)", scan_panel, lambda: FrameCache().get),
+            ("Scanner (store)", scan_panel, scanner.store_loader))
+    for name, run, make_loader in runs:
+        load = make_loader()
+        start = time.perf_counter()
+        result = run(symbols, args.timeframe, args.bars, params, load)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            run(symbols, args.timeframe, args.bars, params, load)
+        warm = (time.perf_counter() - start) / args.repeat
+        print(f"{name:<22} {len(symbols)} symbol, {args.bars} nến: lần đầu {cold * 1000:7.1f} ms, "
+              f"cache nóng {warm * 1000:7.1f} ms, {len(result)} symbol thỏa điều kiện")
+
+if __name__ == '__main__':
+    main()
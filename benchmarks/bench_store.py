@@ -0,0 +1,52 @@
+"""
+Benchmark đọc dữ liệu: CSV (pd.read_csv) so với candle store nhị phân (memory-map)
+trên toàn bộ thư mục binance_futures_data
+
+Chạy từ thư mục gốc: python benchmarks/bench_store.py --last 100
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import pandas as pd
+
+import candle_store
+
+def timed(label, func, paths):
+    start = time.perf_counter()
+    rows = sum(func(path) for path in paths)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed * 1000:>10.1f} ms  {rows:>10} nến  ({rows / elapsed:,.0f} nến/s)")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CSV so với candle store")
+    parser.add_argument('--directory', default="binance_futures_data")
+    parser.add_argument('--last', type=int, default=100)
+    args = parser.parse_args()
+
+    csv_paths = sorted(glob.glob(os.path.join(args.directory, "*.csv")))
+    if any(not os.path.exists(candle_store.store_path_for_csv(path)) for path in csv_paths):
+        candle_store.build_all(args.directory)
+    store_paths = [candle_store.store_path_for_csv(path) for path in csv_paths]
+    last = args.last
+
+    print(f"{len(csv_paths)} symbol, toàn bộ file:")
+    csv_full = timed("CSV pd.read_csv", lambda p: len(pd.read_csv(p, parse_dates=['open_time', 'close_time'])), csv_paths)
+    store_full = timed("Store read_dataframe", lambda p: len(candle_store.read_dataframe(p)), store_paths)
+    timed("Store read_columns (NumPy)", lambda p: len(candle_store.read_columns(p)['close']), store_paths)
+
+    print(f"\n{len(csv_paths)} symbol, {last} nến cuối:")
+    csv_tail = timed("CSV pd.read_csv + tail", lambda p: len(pd.read_csv(p, parse_dates=['open_time', 'close_time']).tail(last)), csv_paths)
+    store_tail = timed("Store read_dataframe(last)", lambda p: len(candle_store.read_dataframe(p, last=last)), store_paths)
+
+    print(f"\nTăng tốc: toàn bộ {csv_full / store_full:.1f}x, {last} nến cuối {csv_tail / store_tail:.1f}x")
+
+if __name__ == '__main__':
+    main()
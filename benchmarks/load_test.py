@@ -0,0 +1,242 @@
+"""
+Load test cho server.py: nhiều client đồng thời gọi /api/data trên dữ liệu cục bộ, đo p50/p90/p99 và request/giây
+
+- Mặc định tự chạy `server.py --production --workers N` trên một cổng trống rồi dừng khi xong;
+  --url để đo một server đang chạy sẵn (VD: dev server `python server.py`, hoặc gunicorn)
+- Pha "burst": mọi client cùng lúc gọi đúng một key chưa có trong cache (đo hiệu quả single-flight)
+- Pha "steady": mỗi client gọi liên tục trong --duration giây; --hot là tỉ lệ request vào một symbol "nóng",
+  phần còn lại chia đều cho --symbols symbol đầu tiên, limit chọn ngẫu nhiên trong --limits
+- Client chạy bằng luồng; --processes > 1 chia client cho nhiều tiến trình để phía client không thành nút thắt
+
+Chạy từ thư mục gốc: python benchmarks/load_test.py --workers 4 --clients 32 --duration 15
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from data_cache import DATA_DIRECTORY
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(workers, port):
+    """
+    Chạy server.py ở chế độ production trong tiến trình con, chờ tới khi trả lời được /metrics
+    """
+    process = subprocess.Popen(
+        [sys.executable, 'server.py', '--production', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server.py dừng với mã {process.returncode}")
+        try:
+            requests.get(f"{base_url}/metrics", timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("server.py không khởi động được sau 30s")
+
+def local_symbols(timeframe, count):
+    suffix = f"_{timeframe}.csv"
+    names = sorted((f for f in os.listdir(DATA_DIRECTORY) if f.endswith(suffix)),
+                   key=lambda name: os.path.getsize(os.path.join(DATA_DIRECTORY, name)), reverse=True)
+    return [name[len("binance_"):-len(suffix)] for name in names][:count]
+
+def client_loop(base_url, paths, deadline, seed, results):
+    """
+    Một client: gọi liên tục các path chọn ngẫu nhiên tới deadline, ghi (độ trễ giây, mã trạng thái, số byte)
+    paths: (các path nóng, mọi path, tỉ lệ request vào path nóng)
+    """
+    hot_paths, all_paths, hot = paths
+    rng = random.Random(seed)
+    session = requests.Session()
+    latencies, statuses, size = [], [], 0
+    while time.monotonic() < deadline:
+        path = rng.choice(hot_paths if rng.random() < hot else all_paths)
+        started = time.perf_counter()
+        try:
+            response = session.get(base_url + path, timeout=60)
+            status = response.status_code
+            size += len(response.content)
+        except requests.RequestException:
+            status = 0
+        latencies.append(time.perf_counter() - started)
+        statuses.append(status)
+    results.append((latencies, statuses, size))
+
+def run_threads(base_url, paths, clients, duration, seed):
+    results = []
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=client_loop, args=(base_url, paths, deadline, seed + i, results))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return ([value for latencies, _, _ in results for value in latencies],
+            [value for _, statuses, _ in results for value in statuses],
+            sum(size for _, _, size in results))
+
+def run_process(task):
+    return run_threads(*task)
+
+def run_steady(base_url, paths, clients, duration, processes):
+    """
+    Chạy `clients` client trong `processes` tiến trình
+
+    Returns:
+    tuple: (mảng độ trễ, mảng mã trạng thái, tổng byte, thời gian thực)
+    """
+    processes = max(1, min(processes, clients))
+    shares = [clients // processes + (1 if i < clients % processes else 0) for i in range(processes)]
+    tasks = [(base_url, paths, share, duration, 1000 * i) for i, share in enumerate(shares)]
+    started = time.perf_counter()
+    if processes == 1:
+        parts = [run_process(tasks[0])]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            parts = pool.map(run_process, tasks)
+    elapsed = time.perf_counter() - started
+    latencies = np.concatenate([np.asarray(part[0]) for part in parts])
+    statuses = np.concatenate([np.asarray(part[1], dtype=np.int64) for part in parts])
+    return latencies, statuses, sum(part[2] for part in parts), elapsed
+
+def run_burst(base_url, path, clients):
+    """
+    Mọi client gọi cùng một path tại cùng một thời điểm (barrier), trả về mảng độ trễ
+    """
+    barrier = threading.Barrier(clients)
+    latencies = [None] * clients
+
+    def fire(index):
+        session = requests.Session()
+        barrier.wait()
+        started = time.perf_counter()
+        session.get(base_url + path, timeout=60)
+        latencies[index] = time.perf_counter() - started
+
+    threads = [threading.Thread(target=fire, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.asarray(latencies)
+
+def latency_summary(latencies):
+    if not len(latencies):
+        return {}
+    ms = latencies * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p90_ms": round(float(np.percentile(ms, 90)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+    }
+
+def build_paths(symbols, timeframe, limits, hot, data_format):
+    """
+    Tỉ lệ `hot` request vào symbol đầu tiên, còn lại chia đều mọi symbol
+
+    Returns:
+    tuple: (các path nóng, mọi path, hot)
+    """
+    query = f"&format={data_format}" if data_format else ""
+    hot_paths = [f"/api/data?symbol={symbols[0]}&timeframe={timeframe}&limit={limit}{query}" for limit in limits]
+    all_paths = [f"/api/data?symbol={symbol}&timeframe={timeframe}&limit={limit}{query}"
+                 for symbol in symbols for limit in limits]
+    return hot_paths, all_paths, hot
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/data của server.py")
+    parser.add_argument('--url', help="Server đang chạy (mặc định: tự chạy server.py --production)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Số worker của server tự chạy")
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--processes', type=int, default=1, help="Số tiến trình chạy client")
+    parser.add_argument('--duration', type=float, default=10.0, help="Thời gian pha steady (giây)")
+    parser.add_argument('--timeframe', default='15m')
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--limits', default='100,500,1500')
+    parser.add_argument('--hot', type=float, default=0.5, help="Tỉ lệ request vào symbol nóng")
+    parser.add_argument('--format', default='', help="format của /api/data (mặc định: rows)")
+    parser.add_argument('--output', help="Ghi kết quả JSON vào file")
+    args = parser.parse_args()
+
+    symbols = local_symbols(args.timeframe, args.symbols)
+    if not symbols:
+        sys.exit(f"Không có dữ liệu {args.timeframe} trong {DATA_DIRECTORY}")
+    limits = [int(value) for value in args.limits.split(',') if value]
+    paths = build_paths(symbols, args.timeframe, limits, args.hot, args.format)
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        process, base_url = start_server(args.workers, free_port())
+    try:
+        # Key chưa từng được gọi: toàn bộ file của symbol cuối, qua from=0
+        burst_path = f"/api/data?symbol={symbols[-1]}&timeframe={args.timeframe}&from=0&format=binary"
+        burst = run_burst(base_url, burst_path, args.clients)
+        latencies, statuses, size, elapsed = run_steady(base_url, paths, args.clients, args.duration, args.processes)
+        server_metrics = requests.get(f"{base_url}/metrics?format=json", timeout=10).json()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    errors = int((statuses != 200).sum())
+    result = {
+        "url": args.url or f"server.py --production --workers {args.workers}",
+        "clients": args.clients,
+        "client_processes": args.processes,
+        "duration_seconds": round(elapsed, 3),
+        "symbols": len(symbols),
+        "limits": limits,
+        "hot": args.hot,
+        "burst": {"path": burst_path, **latency_summary(burst)},
+        "steady": {
+            "requests": int(len(latencies)),
+            "errors": errors,
+            "requests_per_sec": round(len(latencies) / elapsed, 1) if elapsed > 0 else None,
+            "mb_per_sec": round(size / elapsed / 1e6, 2) if elapsed > 0 else None,
+            **latency_summary(latencies),
+        },
+        # Số liệu của worker trả lời request /metrics (mỗi worker có số liệu riêng)
+        "server_worker": {name: value for name, value in server_metrics.get("gauges", {}).items()
+                          if name.startswith(('frame_cache_', 'resample_cache_', 'worker_pid'))},
+    }
+
+    burst_stats = result["burst"]
+    steady = result["steady"]
+    print(f"Target: {result['url']}, {args.clients} client, {len(symbols)} symbol, limits {args.limits}")
+    print(f"Burst ({args.clients} request cùng key): p50 {burst_stats['p50_ms']} ms, max {burst_stats['max_ms']} ms")
+    print(f"Steady {elapsed:.1f}s: {steady['requests']} request, {errors} lỗi, {steady['requests_per_sec']} req/s, "
+          f"{steady['mb_per_sec']} MB/s")
+    print(f"  p50 {steady['p50_ms']} ms  p90 {steady['p90_ms']} ms  p99 {steady['p99_ms']} ms  max {steady['max_ms']} ms")
+    print(f"Worker: {result['server_worker']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Đã ghi kết quả vào {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""
+Bộ benchmark chung cho các đường nóng: đọc dữ liệu, /api/data, tải qua mock API, gộp nến, chỉ báo, backtest
+
+Mọi case chạy trên dữ liệu có sẵn trong binance_futures_data và mock_binance (không cần mạng).
+Mỗi case chạy `repeat` lần, ghi trung vị và lần nhanh nhất vào file JSON (mặc định
+benchmarks/results/latest.json) kèm thông tin máy, phiên bản thư viện và commit git, rồi so với
+baseline đã lưu theo lần nhanh nhất (ít bị nhiễu bởi các tiến trình khác hơn trung vị): case chậm hơn
+baseline quá ngưỡng --threshold bị đánh dấu và script trả mã lỗi 1.
+
+- load_*_cold: FrameCache mới mỗi lần (không tính page cache của hệ điều hành), load_*_warm: cache đã nạp
+- api_data_limit_*: /api/data qua Flask test client với cache đã nạp
+- download: download_many trên mock_binance phát lại các nến đã lưu (không có độ trễ giả lập)
+
+Chạy từ thư mục gốc:
+  python benchmarks/run_all.py                   (chạy và so với baseline nếu có)
+  python benchmarks/run_all.py --save-baseline   (chạy và lưu kết quả làm baseline)
+  python benchmarks/run_all.py --only api_data,backtest --repeat 3
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import numpy as np
+import pandas as pd
+
+import backtest
+import binance
+import indicators
+import mock_binance
+import scanner
+import server
+from data_cache import DATA_DIRECTORY, FrameCache, csv_path, load_frame
+from rate_limiter import WeightRateLimiter
+from resampler import resample
+from tail_reader import read_tail
+
+RESULTS_DIRECTORY = os.path.join("benchmarks", "results")
+RESULTS_FILE = os.path.join(RESULTS_DIRECTORY, "latest.json")
+BASELINE_FILE = os.path.join(RESULTS_DIRECTORY, "baseline.json")
+# Chậm hơn baseline quá tỉ lệ này thì coi là chậm đi
+DEFAULT_THRESHOLD = 1.25
+# Chênh lệch nhỏ hơn mức này (ms) là nhiễu đo, không tính là chậm đi dù vượt tỉ lệ
+MIN_DELTA_MS = 1.0
+API_LIMITS = (100, 1000, 10000, 100000)
+RESAMPLE_TIMEFRAMES = ('1h', '4h', '1d')
+# Cache đủ lớn để giữ toàn bộ dữ liệu, lần đọc "warm" không bị LRU đẩy ra
+CACHE_BYTES = 8 * 1024 ** 3
+
+def measure(func, repeat, setup=None):
+    """
+    Chạy func `repeat` lần (setup chạy trước mỗi lần, không tính giờ)
+
+    Returns:
+    tuple: (danh sách thời gian từng lần (giây), giá trị trả về của lần cuối)
+    """
+    times = []
+    value = None
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        start = time.perf_counter()
+        value = func(state) if setup is not None else func()
+        times.append(time.perf_counter() - start)
+    return times, value
+
+def largest_symbol(symbols, timeframe):
+    return max(symbols, key=lambda symbol: os.path.getsize(csv_path(symbol, timeframe)))
+
+def data_symbols(timeframe):
+    return [symbol for symbol in scanner.config_symbols() if os.path.exists(csv_path(symbol, timeframe))]
+
+class Suite:
+    """
+    Các case benchmark; mỗi phương thức case_* trả về dict {tên case: (thời gian, số nến hoặc None)}
+    """
+
+    def __init__(self, symbol, symbols, timeframe, repeat, download_symbols):
+        self.symbol = symbol
+        self.symbols = symbols
+        self.timeframe = timeframe
+        self.repeat = repeat
+        self.download_symbols = download_symbols
+        self.candles = backtest.load_candles(symbol, timeframe)
+
+    def case_load(self):
+        results = {}
+        for name, symbols in (("single", [self.symbol]), ("all", self.symbols)):
+            def load(cache, symbols=symbols):
+                return sum(len(cache.get(symbol, self.timeframe)) for symbol in symbols)
+            new_cache = lambda: FrameCache(max_bytes=CACHE_BYTES)
+            results[f"load_{name}_cold"] = measure(load, self.repeat, new_cache)
+            warm_cache = new_cache()
+            load(warm_cache)
+            results[f"load_{name}_warm"] = measure(lambda: load(warm_cache), self.repeat)
+        results["load_single_csv"] = measure(lambda: len(load_frame(csv_path(self.symbol, self.timeframe))),
+                                             self.repeat)
+        return results
+
+    def case_api_data(self):
+        client = server.app.test_client()
+        results = {}
+        for limit in API_LIMITS:
+            url = f"/api/data?symbol={self.symbol}&timeframe={self.timeframe}&limit={limit}"
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url}: HTTP {response.status_code}")
+            rows = len(response.get_json()["marketdata"][self.symbol.lower()]["data"])
+            times, _ = measure(lambda: client.get(url).status_code, self.repeat)
+            results[f"api_data_limit_{limit}"] = (times, rows)
+        return results
+
+    def case_download(self):
+        tasks = []
+        for symbol in self.symbols[:self.download_symbols]:
+            tail = read_tail(csv_path(symbol, self.timeframe), 1)
+            # Kết thúc ở nến cuối đã lưu để số trang không phụ thuộc vào ngày chạy
+            end_time = int(tail['open_time'].to_numpy('datetime64[ms]').astype(np.int64)[-1])
+            tasks.append((symbol, self.timeframe, None, end_time, None))
+
+        # Đo tốc độ tải và ghép trang, không đo rate limit (cả mock lẫn limiter đều không giới hạn weight)
+        mock_binance.settings["latency"] = 0.0
+        mock_binance.settings["weight_limit"] = 10 ** 9
+        mock_server, base_url = mock_binance.start_in_thread()
+        original_url = binance.BINANCE_FAPI_URL
+        binance.BINANCE_FAPI_URL = base_url
+        try:
+            def download():
+                rows = 0
+                limiter = WeightRateLimiter(weight_limit=10 ** 9)
+                # Bỏ các dòng in tiến độ của download_many
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for _, df in binance.download_many(tasks, binance.DOWNLOAD_WORKERS, limiter):
+                        rows += 0 if df is None else len(df)
+                return rows
+            # Lần đầu nạp CSV vào bộ nhớ của mock server
+            download()
+            return {"download": measure(download, self.repeat)}
+        finally:
+            binance.BINANCE_FAPI_URL = original_url
+            mock_server.shutdown()
+
+    def case_resample(self):
+        df = FrameCache(max_bytes=CACHE_BYTES).get(self.symbol, self.timeframe)
+        results = {}
+        for timeframe in RESAMPLE_TIMEFRAMES:
+            times, _ = measure(lambda: resample(df, timeframe), self.repeat)
+            results[f"resample_{timeframe}"] = (times, len(df))
+        return results
+
+    def case_indicators(self):
+        close, high, low = self.candles["close"], self.candles["high"], self.candles["low"]
+        params = backtest.DEFAULT_PARAMS
+        return {
+            "indicators_ema": measure(lambda: len(indicators.ema(close, params["ema_period"])), self.repeat),
+            "indicators_lwma": measure(lambda: len(indicators.lwma(close, params["lwma_period"])), self.repeat),
+            "indicators_donchian": measure(lambda: len(indicators.donchian(high, low, params["donchian_period"])[1]),
+                                           self.repeat),
+        }
+
+    def case_backtest(self):
+        times, _ = measure(lambda: backtest.run_backtest(self.candles), self.repeat)
+        return {"backtest": (times, len(self.candles["close"]))}
+
+    def case_scan(self):
+        load = scanner.store_loader()
+        def scan():
+            panel = scanner.load_panel(self.symbols, self.timeframe, scanner.DEFAULT_BARS, load)
+            scanner.scan(panel)
+            return len(panel["symbols"]) * scanner.DEFAULT_BARS
+        return {"scan_all": measure(scan, self.repeat)}
+
+    def cases(self):
+        return [name[len("case_"):] for name in dir(self) if name.startswith("case_")]
+
+def summarize(times, rows):
+    result = {
+        "median_ms": round(statistics.median(times) * 1000, 3),
+        "min_ms": round(min(times) * 1000, 3),
+        "runs": len(times),
+    }
+    if rows:
+        result["rows"] = int(rows)
+        result["rows_per_sec"] = round(rows / statistics.median(times), 1)
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment():
+    return {
+        "time": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+def compare(results, baseline, threshold, min_delta_ms=MIN_DELTA_MS):
+    """
+    In bảng so sánh với baseline
+
+    Returns:
+    list: tên các case chậm hơn baseline quá ngưỡng
+    """
+    regressions = []
+    print(f"\n{'Case':<28} {'Median (ms)':>12} {'Min (ms)':>10} {'Baseline':>10} {'Tỉ lệ':>8}")
+    for name, result in results.items():
+        base = baseline.get(name) if baseline else None
+        if base is None:
+            print(f"{name:<28} {result['median_ms']:>12.3f} {result['min_ms']:>10.3f} {'-':>10} {'-':>8}")
+            continue
+        ratio = result['min_ms'] / base['min_ms'] if base['min_ms'] else float('inf')
+        flag = ''
+        if ratio > threshold and result['min_ms'] - base['min_ms'] >= min_delta_ms:
+            flag = '  CHẬM HƠN'
+            regressions.append(name)
+        elif ratio < 1 / threshold:
+            flag = '  nhanh hơn'
+        print(f"{name:<28} {result['median_ms']:>12.3f} {result['min_ms']:>10.3f} {base['min_ms']:>10.3f} "
+              f"{ratio:>8.2f}{flag}")
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Chạy bộ benchmark và so với baseline")
+    parser.add_argument('--timeframe', default='15m')
+    parser.add_argument('--symbol', help="Symbol cho các case một symbol (mặc định: file CSV lớn nhất)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--download-symbols', type=int, default=10, help="Số symbol trong case download")
+    parser.add_argument('--only', help="Chỉ chạy các nhóm case, VD: load,api_data")
+    parser.add_argument('--output', default=RESULTS_FILE)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help="Lưu kết quả lần này làm baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Tỉ lệ thời gian/baseline (lần nhanh nhất) bị coi là chậm đi")
+    parser.add_argument('--min-delta-ms', type=float, default=MIN_DELTA_MS,
+                        help="Chênh lệch tối thiểu (ms) để bị coi là chậm đi")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    symbols = data_symbols(args.timeframe)
+    if not symbols:
+        print(f"Không có dữ liệu {args.timeframe} trong {DATA_DIRECTORY}")
+        sys.exit(1)
+    symbol = args.symbol or largest_symbol(symbols, args.timeframe)
+    suite = Suite(symbol, symbols, args.timeframe, args.repeat, args.download_symbols)
+
+    groups = suite.cases()
+    if args.only:
+        selected = [name.strip() for name in args.only.split(',') if name.strip()]
+        unknown = set(selected).difference(groups)
+        if unknown:
+            print(f"Không có nhóm case: {', '.join(sorted(unknown))} (có: {', '.join(groups)})")
+            sys.exit(2)
+        groups = [name for name in groups if name in selected]
+
+    print(f"Symbol: {symbol}, {len(symbols)} symbol có dữ liệu, repeat={args.repeat}")
+    results = {}
+    for group in groups:
+        start = time.perf_counter()
+        for name, (times, rows) in getattr(suite, f"case_{group}")().items():
+            results[name] = summarize(times, rows)
+        print(f"  {group:<12} {time.perf_counter() - start:6.1f}s")
+
+    report = {
+        "environment": environment(),
+        "parameters": {"symbol": symbol, "timeframe": args.timeframe, "repeat": args.repeat,
+                       "symbols": len(symbols), "download_symbols": args.download_symbols},
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Đã ghi kết quả vào {args.output}")
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("parameters", {}).get("symbol") != symbol:
+            print(f"Cảnh báo: baseline đo trên {baseline.get('parameters', {}).get('symbol')}, lần này trên {symbol}")
+    regressions = compare(results, baseline["results"] if baseline else None, args.threshold, args.min_delta_ms)
+
+    if args.save_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"Đã lưu baseline {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} case chậm hơn baseline quá {args.threshold:.2f}x: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
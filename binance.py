@@ -3,12 +3,24 @@ import pandas as pd
 import numpy as np
 import time
 import requests
-import json
 import glob
-from datetime import datetime, timedelta
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from tqdm import tqdm
 from colorama import Fore, Style, init
 
+from rate_limiter import WeightRateLimiter, get_klines_weight
+from candle_archive import ARCHIVE_SUFFIX, append_archive, hints_from_symbol_desc, write_archive
+from candle_store import STORE_SUFFIX, append_store, read_dataframe, write_store
+from download_planner import (EXCHANGE_INFO_CACHE, EXCHANGE_INFO_TTL, current_time_ms, load_exchange_info,
+                              missing_range, pages_weight, split_pages)
+from kline_ingest import KlineBuffer, pages_to_dataframe, parse_klines_page
+from metadata_store import METADATA_DB, open_store
+from metrics import registry as metrics
+from tail_reader import refresh_index
+
 # Khởi tạo colorama
 init(autoreset=True)
 
@@ -18,8 +30,25 @@ DATA_DIRECTORY = "binance_futures_data"
 #DEFAULT_TIMEFRAMES = ['5m', '15m', '1h', '4h']
 DEFAULT_TIMEFRAMES = ['15m']
 
+# Địa chỉ API Binance Futures (có thể trỏ sang mock server để benchmark offline)
+BINANCE_FAPI_URL = os.environ.get('BINANCE_FAPI_URL', 'https://fapi.binance.com')
+# Số luồng tải đồng thời mặc định
+DOWNLOAD_WORKERS = int(os.environ.get('BINANCE_DOWNLOAD_WORKERS', 8))
+# Số lượng nến tối đa mà API cho phép trong một lần gọi
+KLINES_LIMIT = 1500
+# Số lần tối đa chờ và thử lại khi bị 429/418
+MAX_RATE_LIMIT_RETRIES = 20
+# Ghi thêm archive nén (.ohlcz) bên cạnh CSV (bật bằng --archive hoặc BINANCE_ARCHIVE=1)
+ARCHIVE_ENABLED = os.environ.get('BINANCE_ARCHIVE', '0') == '1'
+
 # File cấu hình
 CONFIG_FILE = "config.json"
+# Báo cáo JSON của mỗi lần chạy: thời gian từng bước, tốc độ tải từng symbol, weight và số lần thử lại
+SUMMARY_FILE = "download_summary.json"
+
+# Số cặp symbol-timeframe ghi vào metadata trước mỗi lần commit
+# (nếu bị ngắt giữa chừng, lần chạy sau chỉ tải lại các nến trùng và bỏ qua khi ghi nối tiếp)
+METADATA_COMMIT_EVERY = 20
 
 def create_directory(directory):
     """
@@ -29,16 +58,13 @@ def create_directory(directory):
         os.makedirs(directory)
         print(f"{Fore.GREEN}Đã tạo thư mục {directory}{Style.RESET_ALL}")
 
-def get_all_futures_symbols():
+def get_all_futures_symbols(refresh=False, ttl=EXCHANGE_INFO_TTL):
     """
     Lấy tất cả các symbol đang giao dịch trên Binance Futures, chỉ lọc các cặp USDT
+    exchangeInfo được lấy từ cache (EXCHANGE_INFO_CACHE) nếu còn hạn, refresh=True để luôn gọi API
     """
-    url = 'https://fapi.binance.com/fapi/v1/exchangeInfo'
-    
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
+        data, source = load_exchange_info(BINANCE_FAPI_URL, EXCHANGE_INFO_CACHE, ttl, refresh)
         
         symbols = []
         symbol_info_dict = {}
@@ -48,17 +74,18 @@ def get_all_futures_symbols():
                 symbols.append(symbol_info['symbol'])
                 symbol_info_dict[symbol_info['symbol']] = symbol_info
         
-        print(f"{Fore.CYAN}Đã tìm thấy {len(symbols)} cặp USDT đang giao dịch trên Binance Futures{Style.RESET_ALL}")
+        origin = "cache" if source == "cache" else ("cache đã hết hạn" if source == "stale" else "API")
+        print(f"{Fore.CYAN}Đã tìm thấy {len(symbols)} cặp USDT đang giao dịch trên Binance Futures (exchangeInfo từ {origin}){Style.RESET_ALL}")
         return symbols, symbol_info_dict, data
     except Exception as e:
         print(f"{Fore.RED}Lỗi khi lấy danh sách symbol: {e}{Style.RESET_ALL}")
         return [], {}, {}
 
-def get_earliest_timestamp(symbol, interval):
+def get_earliest_timestamp(symbol, interval, session=None):
     """
     Lấy timestamp của thời điểm đầu tiên một symbol future được niêm yết trên Binance
     """
-    url = f'https://fapi.binance.com/fapi/v1/klines'
+    url = f'{BINANCE_FAPI_URL}/fapi/v1/klines'
     params = {
         'symbol': symbol,
         'interval': interval,
@@ -67,11 +94,15 @@ def get_earliest_timestamp(symbol, interval):
     }
     
     try:
-        response = requests.get(url, params=params)
+        with metrics.timer('stage', stage='http_fetch'):
+            response = (session or requests).get(url, params=params, timeout=30)
+        metrics.inc('klines_requests', status=response.status_code)
+        metrics.inc('api_weight', get_klines_weight(1))
         response.raise_for_status()
-        klines = response.json()
-        if klines:
-            return klines[0][0]  # timestamp đầu tiên có sẵn
+        with metrics.timer('stage', stage='json_decode'):
+            klines = parse_klines_page(response.content)
+        if len(klines):
+            return int(klines[0][0])  # timestamp đầu tiên có sẵn
     except Exception as e:
         print(f"{Fore.RED}Lỗi khi lấy timestamp đầu tiên cho {symbol}: {e}{Style.RESET_ALL}")
     
@@ -100,47 +131,6 @@ def get_interval_ms(interval):
     }
     return interval_dict.get(interval, 24 * 60 * 60 * 1000)  # Mặc định là 1 ngày
 
-def load_config():
-    """
-    Đọc file cấu hình nếu tồn tại, nếu không thì tạo mới
-    """
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-                print(f"{Fore.GREEN}Đã đọc file cấu hình {CONFIG_FILE}{Style.RESET_ALL}")
-                return config
-        except Exception as e:
-            print(f"{Fore.RED}Lỗi khi đọc file cấu hình: {e}. Tạo file mới.{Style.RESET_ALL}")
-    
-    # Tạo cấu trúc mới nếu file không tồn tại hoặc có lỗi
-    config = {
-        "exchange": {
-            "binance": {
-                "datatype": "crypto",
-                "markettype": "future",
-                "marketdata": {}
-            }
-        }
-    }
-    
-    # Lưu file cấu hình mới
-    save_config(config)
-    print(f"{Fore.GREEN}Đã tạo file cấu hình mới {CONFIG_FILE}{Style.RESET_ALL}")
-    
-    return config
-
-def save_config(config):
-    """
-    Lưu cấu hình vào file
-    """
-    try:
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=4)
-            print(f"{Fore.GREEN}Đã lưu file cấu hình {CONFIG_FILE}{Style.RESET_ALL}")
-    except Exception as e:
-        print(f"{Fore.RED}Lỗi khi lưu file cấu hình: {e}{Style.RESET_ALL}")
-
 def get_crypto_icon_url(symbol):
     """
     Tạo URL cho biểu tượng của cryptocurrency
@@ -161,76 +151,52 @@ def extract_symbol_pair(symbol):
     # Trường hợp khác (không nên xảy ra vì chúng ta đã lọc)
     return symbol[:-4], symbol[-4:]
 
-def update_config_for_symbol(config, symbol, timeframe, filename, symbol_info=None, start_date=None, end_date=None):
+def record_symbol(metadata, symbol, symbol_info=None):
     """
-    Cập nhật cấu hình cho một symbol và timeframe, bao gồm thông tin chi tiết từ exchangeInfo
+    Thêm symbol vào metadata nếu chưa có, kèm thông tin chi tiết từ exchangeInfo
     """
     base_symbol, quote_pair = extract_symbol_pair(symbol)
-    
-    # Chuyển symbol về chữ thường để sử dụng làm key
-    symbol_key = symbol.lower()
-    
-    # Lấy đối tượng marketdata
-    marketdata = config["exchange"]["binance"]["marketdata"]
-    
-    # Nếu symbol chưa tồn tại trong cấu hình, thêm mới
-    if symbol_key not in marketdata:
+    if metadata.add_symbol(symbol, base_symbol, quote_pair, get_crypto_icon_url(base_symbol), symbol_info):
         print(f"{Fore.YELLOW}Thêm symbol mới {symbol} vào cấu hình{Style.RESET_ALL}")
-        
-        # Tạo cấu trúc cơ bản
-        marketdata[symbol_key] = {
-            "symbol": base_symbol,
-            "pair": quote_pair,
-            "fullname": symbol,
-            "icon": get_crypto_icon_url(base_symbol),
-            "data": []
-        }
-        
-        # Thêm thông tin chi tiết của symbol nếu có
-        if symbol_info:
-            marketdata[symbol_key]["symbolDesc"] = symbol_info
-    
-    # Kiểm tra xem timeframe đã tồn tại chưa
-    timeframe_exists = False
-    for tf_data in marketdata[symbol_key]["data"]:
-        if tf_data["name"] == timeframe:
-            # Cập nhật thông tin timeframe
-            tf_data["datalink"] = f"{symbol}_{timeframe}.csv"
-            if start_date:
-                tf_data["fromdate"] = start_date
-            if end_date:
-                tf_data["enddate"] = end_date
-            timeframe_exists = True
-            break
-    
-    # Nếu timeframe chưa tồn tại, thêm mới
-    if not timeframe_exists:
+
+def record_coverage(metadata, symbol, timeframe, filename, symbol_info=None):
+    """
+    Ghi lại khoảng dữ liệu đang có trong file CSV sau khi tải (ngày bắt đầu/kết thúc như config.json,
+    open_time đầu/cuối, số dòng và kích thước file lấy từ sparse index)
+    """
+    record_symbol(metadata, symbol, symbol_info)
+    index = refresh_index(filename)
+    last_open_time = get_last_open_time(filename)
+    if index.n_rows == 0 or last_open_time is None:
+        return
+
+    first_open_time = int(index.times[0])
+    last_open_ms = int(last_open_time.value // 1_000_000)
+    # enddate là ngày của close_time nến cuối như trước đây
+    end_time = pd.Timestamp(last_open_ms + get_interval_ms(timeframe) - 1, unit='ms')
+    if metadata.get_coverage(symbol, timeframe) is None:
         print(f"{Fore.YELLOW}Thêm timeframe mới {timeframe} cho {symbol} vào cấu hình{Style.RESET_ALL}")
-        marketdata[symbol_key]["data"].append({
-            "name": timeframe,
-            "datalink": f"{symbol}_{timeframe}.csv",
-            "fromdate": start_date if start_date else "",
-            "enddate": end_date if end_date else ""
-        })
-    
-    return config
+    metadata.set_coverage(
+        symbol, timeframe, f"{symbol}_{timeframe}.csv",
+        fromdate=pd.Timestamp(first_open_time, unit='ms').strftime('%Y-%m-%d'),
+        enddate=end_time.strftime('%Y-%m-%d'),
+        first_open_time=first_open_time,
+        last_open_time=last_open_ms,
+        row_count=index.n_rows,
+        data_start=index.data_start,
+        file_size=index.file_size,
+    )
 
-def get_symbol_timeframe_info(config, symbol, timeframe):
+def export_config(metadata):
     """
-    Lấy thông tin về symbol và timeframe từ cấu hình
+    Xuất config.json từ metadata cho các trang web đang đọc file này
     """
-    symbol_key = symbol.lower()
-    
     try:
-        marketdata = config["exchange"]["binance"]["marketdata"]
-        if symbol_key in marketdata:
-            for tf_data in marketdata[symbol_key]["data"]:
-                if tf_data["name"] == timeframe:
-                    return tf_data
+        with metrics.timer('stage', stage='config_save'):
+            metadata.export_config(CONFIG_FILE)
+        print(f"{Fore.GREEN}Đã lưu file cấu hình {CONFIG_FILE}{Style.RESET_ALL}")
     except Exception as e:
-        print(f"{Fore.RED}Lỗi khi đọc thông tin symbol {symbol}, timeframe {timeframe}: {e}{Style.RESET_ALL}")
-    
-    return None
+        print(f"{Fore.RED}Lỗi khi lưu file cấu hình: {e}{Style.RESET_ALL}")
 
 def check_existing_files(symbol, timeframe):
     """
@@ -245,44 +211,68 @@ def check_existing_files(symbol, timeframe):
     
     return existing_files
 
-def get_download_list(symbols, timeframes, config, symbol_info_dict):
+def get_stored_last_open_time(metadata, symbol, timeframe):
     """
-    Tạo danh sách các cặp symbol-timeframe cần tải
+    open_time (ms) cuối cùng đã lưu của (symbol, timeframe): lấy từ metadata, nếu metadata chưa có
+    (VD: nạp từ config.json cũ) thì đọc dòng cuối của file CSV. None nếu chưa có dữ liệu
+    """
+    coverage = metadata.get_coverage(symbol, timeframe)
+    if coverage is not None and coverage.get("last_open_time") is not None:
+        return int(coverage["last_open_time"])
+    filename = f"{DATA_DIRECTORY}/binance_{symbol}_{timeframe}.csv"
+    if not os.path.exists(filename) or os.path.getsize(filename) == 0:
+        return None
+    last_open_time = get_last_open_time(filename)
+    return None if last_open_time is None else int(last_open_time.value // 1_000_000)
+
+def get_download_list(symbols, timeframes, metadata, symbol_info_dict, now=None):
+    """
+    Tạo danh sách các cặp symbol-timeframe cần tải, kèm khoảng thời gian chính xác (ms) còn thiếu:
+    từ nến sau open_time cuối đã lưu (hoặc từ onboardDate với symbol mới) tới nến đã đóng gần nhất
+    
+    Returns:
+    tuple: (download_list, update_list), mỗi phần tử là (symbol, timeframe, start, end, symbol_info);
+           start là None khi symbol mới không có onboardDate (phải hỏi API nến đầu tiên)
     """
     download_list = []
     update_list = []
-    today = datetime.now().strftime('%Y-%m-%d')
+    up_to_date = 0
+    now = current_time_ms() if now is None else now
     
     # Kiểm tra từng cặp symbol-timeframe
     for symbol in symbols:
+        symbol_info = symbol_info_dict.get(symbol)
+        symbol_desc = symbol_info or metadata.get_symbol_desc(symbol) or {}
+        onboard_time = symbol_desc.get("onboardDate")
         for timeframe in timeframes:
-            symbol_tf_info = get_symbol_timeframe_info(config, symbol, timeframe)
+            last_open_time = get_stored_last_open_time(metadata, symbol, timeframe)
+            planned = missing_range(last_open_time, onboard_time, get_interval_ms(timeframe), now)
+            if planned is None:
+                up_to_date += 1
+                continue
             
-            if symbol_tf_info is None:
-                # Symbol hoặc timeframe chưa có trong cấu hình
-                download_list.append((symbol, timeframe, None, None, symbol_info_dict.get(symbol)))
+            start_time, end_time = planned
+            task = (symbol, timeframe, start_time, end_time, symbol_info)
+            if last_open_time is None:
+                download_list.append(task)
                 print(f"{Fore.CYAN}Thêm {symbol} ({timeframe}) vào danh sách tải mới{Style.RESET_ALL}")
-            elif symbol_tf_info["enddate"] != today:
-                # Symbol đã có nhưng cần cập nhật
-                start_date = symbol_tf_info["enddate"]
-                # Nếu enddate rỗng, tải toàn bộ dữ liệu
-                if not start_date:
-                    download_list.append((symbol, timeframe, None, None, symbol_info_dict.get(symbol)))
-                    print(f"{Fore.CYAN}Thêm {symbol} ({timeframe}) vào danh sách tải mới (không có dữ liệu){Style.RESET_ALL}")
-                else:
-                    # Chuyển đổi string date sang datetime
-                    start_date_dt = datetime.strptime(start_date, '%Y-%m-%d')
-                    # Cộng thêm 1 ngày để không tải trùng dữ liệu
-                    start_date_dt = start_date_dt + timedelta(days=1)
-                    start_date_ts = int(start_date_dt.timestamp() * 1000)
-                    update_list.append((symbol, timeframe, start_date_ts, None, symbol_info_dict.get(symbol)))
-                    print(f"{Fore.CYAN}Thêm {symbol} ({timeframe}) vào danh sách cập nhật từ {start_date_dt.strftime('%Y-%m-%d')}{Style.RESET_ALL}")
             else:
-                print(f"{Fore.GREEN}{symbol} ({timeframe}) đã cập nhật đến ngày hôm nay{Style.RESET_ALL}")
+                update_list.append(task)
+                start_text = pd.Timestamp(start_time, unit='ms').strftime('%Y-%m-%d %H:%M')
+                print(f"{Fore.CYAN}Thêm {symbol} ({timeframe}) vào danh sách cập nhật từ {start_text} UTC{Style.RESET_ALL}")
     
+    if up_to_date:
+        print(f"{Fore.GREEN}{up_to_date} cặp symbol-timeframe đã có đến nến đã đóng gần nhất{Style.RESET_ALL}")
     return download_list, update_list
 
-def download_futures_data(symbol, interval='1d', start_time=None, end_time=None, retry_count=3):
+def record_symbol_download(symbol, interval, rows, seconds):
+    """
+    Ghi lại số nến và thời gian tải của một symbol cho báo cáo cuối lần chạy
+    """
+    metrics.observe('symbol_download', seconds, symbol=symbol, timeframe=interval)
+    metrics.inc('rows_downloaded', rows, symbol=symbol, timeframe=interval)
+
+def download_futures_data(symbol, interval='1d', start_time=None, end_time=None, retry_count=3, session=None):
     """
     Tải xuống dữ liệu futures của Binance cho một symbol
     
@@ -292,26 +282,27 @@ def download_futures_data(symbol, interval='1d', start_time=None, end_time=None,
     start_time (int): Timestamp (ms) bắt đầu
     end_time (int): Timestamp (ms) kết thúc (mặc định: thời gian hiện tại)
     retry_count (int): Số lần thử lại nếu gặp lỗi
+    session (requests.Session): Session dùng lại kết nối giữa các request (mặc định: tạo mới)
     
     Returns:
     pandas.DataFrame: DataFrame chứa dữ liệu
     """
+    session = session or create_session(1)
+    
     # Nếu không cung cấp thời gian kết thúc, sử dụng thời gian hiện tại
     if end_time is None:
         end_time = int(datetime.now().timestamp() * 1000)
     
     # Nếu không cung cấp thời gian bắt đầu, lấy thời gian đầu tiên của symbol
     if start_time is None:
-        start_time = get_earliest_timestamp(symbol, interval)
+        start_time = get_earliest_timestamp(symbol, interval, session)
         if start_time is None:
             print(f"{Fore.RED}Không thể lấy thời gian bắt đầu cho {symbol} với khung thời gian {interval}{Style.RESET_ALL}")
             return None
     
-    # Khởi tạo DataFrame để lưu trữ dữ liệu
-    all_data = []
-    
-    # Số lượng nến tối đa mà API cho phép trong một lần gọi
-    limit = 1500
+    # Số nến mỗi lần gọi: chia đều khoảng cần tải, tối đa số lượng mà API cho phép trong một lần gọi
+    windows = plan_page_windows(start_time, end_time, interval)
+    limit = windows[0][2] if windows else KLINES_LIMIT
     
     # Tải dữ liệu lần lượt
     current_start = start_time
@@ -323,13 +314,17 @@ def download_futures_data(symbol, interval='1d', start_time=None, end_time=None,
     # Ước tính số lần request cần thực hiện
     estimated_iterations = max(1, min(1000, (total_time_range // (limit * get_interval_ms(interval))) + 1))
     
+    # Các trang được parse thẳng vào bộ đệm theo cột, cấp phát trước theo số nến ước tính
+    buffer = KlineBuffer(min(total_time_range // get_interval_ms(interval) + 1, estimated_iterations * limit))
+    
     # Tạo progress bar
     progress_bar = tqdm(total=estimated_iterations, desc=f"{symbol} ({interval})", 
                         bar_format="{l_bar}%s{bar}%s{r_bar}" % (Fore.GREEN, Style.RESET_ALL))
     
+    started = time.perf_counter()
     retries = 0
     while current_start < end_time:
-        url = 'https://fapi.binance.com/fapi/v1/klines'
+        url = f'{BINANCE_FAPI_URL}/fapi/v1/klines'
         params = {
             'symbol': symbol,
             'interval': interval,
@@ -339,18 +334,22 @@ def download_futures_data(symbol, interval='1d', start_time=None, end_time=None,
         }
         
         try:
-            response = requests.get(url, params=params)
+            with metrics.timer('stage', stage='http_fetch'):
+                response = session.get(url, params=params, timeout=30)
+            metrics.inc('klines_requests', status=response.status_code)
+            metrics.inc('api_weight', get_klines_weight(limit))
             response.raise_for_status()
-            data = response.json()
+            with metrics.timer('stage', stage='json_decode'):
+                page = parse_klines_page(response.content)
             
-            if not data:
+            if not len(page):
                 # Không còn dữ liệu
                 break
             
-            all_data.extend(data)
+            buffer.extend(page)
             
             # Cập nhật thời gian bắt đầu cho lần gọi tiếp theo
-            current_start = data[-1][0] + 1
+            current_start = buffer.last_open_time() + 1
             
             # Cập nhật progress bar
             progress_bar.update(1)
@@ -363,6 +362,7 @@ def download_futures_data(symbol, interval='1d', start_time=None, end_time=None,
             
         except Exception as e:
             retries += 1
+            metrics.inc('klines_retries', reason='error')
             if retries > retry_count:
                 print(f"\n{Fore.RED}Đã thử lại {retry_count} lần nhưng không thành công: {e}{Style.RESET_ALL}")
                 break
@@ -374,75 +374,392 @@ def download_futures_data(symbol, interval='1d', start_time=None, end_time=None,
     
     progress_bar.close()
     
-    if not all_data:
+    if not len(buffer):
         print(f"{Fore.RED}Không có dữ liệu cho {symbol} với khung thời gian {interval}{Style.RESET_ALL}")
         return None
     
     # Chuyển đổi dữ liệu thành DataFrame
-    df = pd.DataFrame(all_data, columns=[
-        'open_time', 'open', 'high', 'low', 'close', 'volume',
-        'close_time', 'quote_asset_volume', 'number_of_trades',
-        'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
-    ])
+    with metrics.timer('stage', stage='dataframe_build'):
+        df = buffer.to_dataframe()
+    record_symbol_download(symbol, interval, len(df), time.perf_counter() - started)
     
-    # Chuyển đổi kiểu dữ liệu
-    numeric_columns = ['open', 'high', 'low', 'close', 'volume', 
-                      'quote_asset_volume', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume']
+    print(f"{Fore.GREEN}Hoàn thành! Đã tải xuống {len(df)} bản ghi cho {symbol} ({interval}){Style.RESET_ALL}")
     
-    for col in numeric_columns:
-        df[col] = pd.to_numeric(df[col])
+    return df
+
+def create_session(pool_size=DOWNLOAD_WORKERS):
+    """
+    Tạo requests.Session dùng chung với connection pool đủ lớn cho số luồng tải
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def fetch_klines_page(session, limiter, symbol, interval, start_time, end_time=None, limit=KLINES_LIMIT, retry_count=3):
+    """
+    Tải một trang kline, tuân theo rate limiter dùng chung
     
-    # Chuyển đổi timestamps thành datetime
-    df['open_time'] = pd.to_datetime(df['open_time'], unit='ms')
-    df['close_time'] = pd.to_datetime(df['close_time'], unit='ms')
+    Returns:
+    numpy.ndarray: Mảng (số nến, 12) từ parse_klines_page, hoặc None nếu thất bại sau `retry_count` lần thử lại
+    """
+    url = f'{BINANCE_FAPI_URL}/fapi/v1/klines'
+    params = {
+        'symbol': symbol,
+        'interval': interval,
+        'startTime': start_time,
+        'limit': limit
+    }
+    if end_time is not None:
+        params['endTime'] = end_time
+    weight = get_klines_weight(limit)
+    
+    errors = 0
+    limited = 0
+    while True:
+        with metrics.timer('stage', stage='rate_limit_wait'):
+            limiter.acquire(weight)
+        metrics.inc('api_weight', weight)
+        try:
+            with metrics.timer('stage', stage='http_fetch'):
+                response = session.get(url, params=params, timeout=30)
+            limiter.update_from_headers(response.headers)
+            metrics.inc('klines_requests', status=response.status_code)
+            
+            if response.status_code in (429, 418):
+                # Quá giới hạn: dừng tất cả các luồng theo Retry-After, không tính vào số lần thử lại
+                limited += 1
+                metrics.inc('klines_retries', reason='rate_limit')
+                if limited > MAX_RATE_LIMIT_RETRIES:
+                    raise Exception(f"HTTP {response.status_code} quá {MAX_RATE_LIMIT_RETRIES} lần")
+                delay = limiter.backoff(response.headers.get('Retry-After'), limited)
+                print(f"\n{Fore.YELLOW}{symbol} ({interval}): HTTP {response.status_code}, tạm dừng {delay:.1f}s{Style.RESET_ALL}")
+                continue
+            
+            response.raise_for_status()
+            with metrics.timer('stage', stage='json_decode'):
+                return parse_klines_page(response.content)
+        except Exception as e:
+            errors += 1
+            metrics.inc('klines_retries', reason='error')
+            if errors > retry_count:
+                print(f"\n{Fore.RED}Đã thử lại {retry_count} lần nhưng không thành công: {e}{Style.RESET_ALL}")
+                return None
+            print(f"\n{Fore.YELLOW}Lỗi khi tải dữ liệu {symbol} ({interval}): {e}. Thử lại lần {errors}/{retry_count}{Style.RESET_ALL}")
+            time.sleep(2 * errors)
+
+def plan_page_windows(start_time, end_time, interval, limit=KLINES_LIMIT):
+    """
+    Chia các nến trong [start_time, end_time] thành ít trang nhất có số nến đều nhau, mỗi trang tối đa `limit` nến
     
-    print(f"{Fore.GREEN}Hoàn thành! Đã tải xuống {len(df)} bản ghi cho {symbol} ({interval}){Style.RESET_ALL}")
+    Returns:
+    list: (page_start, page_end, page_limit)
+    """
+    return split_pages(start_time, end_time, get_interval_ms(interval), limit)
+
+def download_many(tasks, workers=DOWNLOAD_WORKERS, limiter=None, session=None):
+    """
+    Tải đồng thời nhiều symbol và nhiều trang của mỗi symbol bằng thread pool
     
-    return df
+    Parameters:
+    tasks (list): Danh sách (symbol, interval, start_time, end_time, symbol_info)
+    workers (int): Số luồng tải đồng thời
+    limiter (WeightRateLimiter): Rate limiter dùng chung (mặc định: tạo mới)
+    session (requests.Session): Session dùng chung (mặc định: tạo mới)
+    
+    Yields:
+    tuple: (task, DataFrame hoặc None) theo thứ tự symbol tải xong
+    """
+    limiter = limiter or WeightRateLimiter()
+    session = session or create_session(workers)
+    now = int(datetime.now().timestamp() * 1000)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Bước 1: lấy thời gian bắt đầu cho các symbol mới (song song)
+        starts = {}
+        earliest_futures = {}
+        for i, (symbol, interval, start_time, end_time, symbol_info) in enumerate(tasks):
+            if start_time is None:
+                earliest_futures[executor.submit(fetch_klines_page, session, limiter, symbol, interval, 0, None, 1)] = i
+            else:
+                starts[i] = start_time
+        for future in as_completed(earliest_futures):
+            klines = future.result()
+            starts[earliest_futures[future]] = int(klines[0][0]) if klines is not None and len(klines) else None
+        
+        # Bước 2: chia các trang và gửi tất cả vào pool
+        page_futures = {}
+        pending = {}
+        results = {}
+        started = {}
+        for i, (symbol, interval, start_time, end_time, symbol_info) in enumerate(tasks):
+            if starts.get(i) is None:
+                print(f"{Fore.RED}Không thể lấy thời gian bắt đầu cho {symbol} với khung thời gian {interval}{Style.RESET_ALL}")
+                yield tasks[i], None
+                continue
+            windows = plan_page_windows(starts[i], end_time or now, interval)
+            if not windows:
+                print(f"{Fore.GREEN}Không có nến mới cho {symbol} ({interval}){Style.RESET_ALL}")
+                yield tasks[i], None
+                continue
+            pending[i] = len(windows)
+            results[i] = [None] * len(windows)
+            started[i] = time.perf_counter()
+            for page_index, (page_start, page_end, page_limit) in enumerate(windows):
+                future = executor.submit(fetch_klines_page, session, limiter, symbol, interval,
+                                         page_start, page_end, page_limit)
+                page_futures[future] = (i, page_index)
+        
+        # Bước 3: ghép các trang khi một symbol đã tải xong toàn bộ
+        for future in as_completed(page_futures):
+            i, page_index = page_futures.pop(future)
+            page = future.result()
+            results[i][page_index] = page
+            pending[i] -= 1
+            if pending[i]:
+                continue
+            
+            symbol, interval = tasks[i][0], tasks[i][1]
+            pages = []
+            for page in results.pop(i):
+                if page is None:
+                    # Trang lỗi: chỉ giữ phần dữ liệu liên tục phía trước để không tạo lỗ hổng
+                    print(f"{Fore.RED}{symbol} ({interval}): có trang tải lỗi, chỉ giữ dữ liệu liên tục trước đó{Style.RESET_ALL}")
+                    break
+                pages.append(page)
+            
+            if not sum(len(page) for page in pages):
+                print(f"{Fore.RED}Không có dữ liệu cho {symbol} với khung thời gian {interval}{Style.RESET_ALL}")
+                yield tasks[i], None
+                continue
+            
+            with metrics.timer('stage', stage='dataframe_build'):
+                df = pages_to_dataframe(pages)
+            record_symbol_download(symbol, interval, len(df), time.perf_counter() - started.pop(i))
+            print(f"{Fore.GREEN}Hoàn thành! Đã tải xuống {len(df)} bản ghi cho {symbol} ({interval}){Style.RESET_ALL}")
+            yield tasks[i], df
+
+def get_last_open_time(filename, block_size=4096):
+    """
+    Lấy open_time của dòng cuối cùng trong file CSV bằng cách đọc ngược từ cuối file,
+    không cần parse toàn bộ file
+    
+    Returns:
+    pandas.Timestamp: open_time cuối cùng, hoặc None nếu file chưa có dữ liệu
+    """
+    with open(filename, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + data
+            # Đã có ít nhất một dòng hoàn chỉnh phía sau dấu xuống dòng
+            if b'\n' in data.rstrip(b'\r\n'):
+                break
+    
+    last_line = data.rstrip(b'\r\n').rsplit(b'\n', 1)[-1].strip()
+    if not last_line or last_line.startswith(b'open_time'):
+        return None
+    return pd.Timestamp(last_line.split(b',', 1)[0].decode())
+
+def write_csv_atomic(df, filename):
+    """
+    Ghi toàn bộ DataFrame ra file tạm rồi đổi tên, tránh để lại file ghi dở
+    """
+    temp_filename = f"{filename}.tmp"
+    df.to_csv(temp_filename, index=False)
+    os.replace(temp_filename, filename)
+
+def append_rows_to_csv(df, filename):
+    """
+    Ghi nối tiếp các dòng mới vào cuối file CSV trong một lần ghi.
+    Nếu ghi lỗi, file được cắt về kích thước ban đầu nên không bao giờ còn dòng ghi dở
+    """
+    payload = df.to_csv(header=False, index=False).encode()
+    
+    with open(filename, 'r+b') as f:
+        f.seek(0, os.SEEK_END)
+        original_size = f.tell()
+        if original_size > 0:
+            f.seek(original_size - 1)
+            if f.read(1) != b'\n':
+                payload = b'\n' + payload
+        
+        f.seek(original_size)
+        try:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            f.truncate(original_size)
+            raise
 
 def save_data_to_csv(df, symbol, interval, directory=DATA_DIRECTORY):
     """
     Lưu DataFrame vào file CSV
+    
+    Nếu file đã có dữ liệu: chỉ ghi nối tiếp các nến mới hơn open_time cuối cùng trong file
+    (các nến trùng bị loại). Nếu chưa có: ghi toàn bộ file một cách atomic.
     """
     # Tạo thư mục nếu chưa tồn tại
     create_directory(directory)
     
     # Lấy thời gian kết thúc của dữ liệu để đặt tên file 
     filename = f"{directory}/binance_{symbol}_{interval}.csv"
-    df.to_csv(filename, index=False)
-    print(f"{Fore.GREEN}Đã lưu dữ liệu vào file {filename}{Style.RESET_ALL}")
+    df = df.drop_duplicates(subset='open_time', keep='last').sort_values('open_time')
+    
+    last_open_time = None
+    if os.path.exists(filename) and os.path.getsize(filename) > 0:
+        last_open_time = get_last_open_time(filename)
+    
+    if last_open_time is None:
+        write_csv_atomic(df, filename)
+        print(f"{Fore.GREEN}Đã lưu dữ liệu vào file {filename}{Style.RESET_ALL}")
+        return filename
+    
+    new_rows = df[df['open_time'] > last_open_time]
+    if new_rows.empty:
+        print(f"{Fore.GREEN}Không có nến mới cho {symbol} ({interval}){Style.RESET_ALL}")
+        return filename
+    
+    append_rows_to_csv(new_rows, filename)
+    print(f"{Fore.GREEN}Đã ghi thêm {len(new_rows)} nến vào file {filename}{Style.RESET_ALL}")
+    
+    return filename
+
+def save_data_to_store(df, symbol, interval, directory=DATA_DIRECTORY):
+    """
+    Lưu DataFrame vào candle store nhị phân (đọc bằng memory-map) bên cạnh file CSV
+    Gọi sau save_data_to_csv: nếu store chưa có mà CSV đã có lịch sử thì tạo store từ toàn bộ CSV
+    """
+    filename = f"{directory}/binance_{symbol}_{interval}{STORE_SUFFIX}"
+    csv_filename = f"{directory}/binance_{symbol}_{interval}.csv"
+    
+    if not os.path.exists(filename) and os.path.exists(csv_filename):
+        rows = write_store(pd.read_csv(csv_filename, parse_dates=['open_time', 'close_time']), filename)
+        print(f"{Fore.GREEN}Đã tạo store {filename} ({rows} nến){Style.RESET_ALL}")
+    else:
+        rows = append_store(df, filename)
+        print(f"{Fore.GREEN}Đã ghi thêm {rows} nến vào store {filename}{Style.RESET_ALL}")
     
     return filename
 
-def update_config_from_data(config, df, symbol, timeframe, symbol_info=None):
+def save_data_to_archive(df, symbol, interval, symbol_info=None, directory=DATA_DIRECTORY):
     """
-    Cập nhật thông tin trong config từ dữ liệu đã tải
+    Lưu DataFrame vào archive nén (.ohlcz), số chữ số thập phân lấy từ tickSize/stepSize của symbol
+    Gọi sau save_data_to_store: nếu archive chưa có thì tạo từ toàn bộ lịch sử (đọc từ store, nhanh hơn CSV)
     """
-    # Lấy ngày bắt đầu và kết thúc từ DataFrame
-    from_date = df['open_time'].min().strftime('%Y-%m-%d')
-    end_date = df['close_time'].max().strftime('%Y-%m-%d')
+    filename = f"{directory}/binance_{symbol}_{interval}{ARCHIVE_SUFFIX}"
+    store_filename = f"{directory}/binance_{symbol}_{interval}{STORE_SUFFIX}"
+    hints = hints_from_symbol_desc(symbol_info)
     
-    # Cập nhật config
-    config = update_config_for_symbol(config, symbol, timeframe, f"{symbol}_{timeframe}.csv", symbol_info, from_date, end_date)
+    if not os.path.exists(filename) and os.path.exists(store_filename):
+        rows = write_archive(read_dataframe(store_filename), filename, hints)
+        print(f"{Fore.GREEN}Đã tạo archive {filename} ({rows} nến){Style.RESET_ALL}")
+    else:
+        rows = append_archive(df, filename, hints)
+        print(f"{Fore.GREEN}Đã ghi thêm {rows} nến vào archive {filename}{Style.RESET_ALL}")
     
-    return config
+    return filename
+
+def save_downloaded_data(data, symbol, timeframe, symbol_info, metadata, archive=False):
+    """
+    Ghi dữ liệu vừa tải vào CSV, candle store (và archive nếu bật), rồi cập nhật metadata
+    """
+    with metrics.timer('stage', stage='csv_write'):
+        filename = save_data_to_csv(data, symbol, timeframe)
+    with metrics.timer('stage', stage='store_write'):
+        save_data_to_store(data, symbol, timeframe)
+    if archive:
+        with metrics.timer('stage', stage='archive_write'):
+            save_data_to_archive(data, symbol, timeframe, symbol_info)
+    with metrics.timer('stage', stage='metadata_write'):
+        record_coverage(metadata, symbol, timeframe, filename, symbol_info)
+
+def build_run_summary(started_at, elapsed, limiter=None):
+    """
+    Báo cáo của một lần chạy từ các số liệu đã đo: thời gian từng bước, tốc độ tải từng symbol,
+    số request theo mã HTTP, số lần thử lại và weight đã dùng
+    """
+    stages = {}
+    for labels, count, total, largest in metrics.series('stage'):
+        stages[labels['stage']] = {
+            "count": count,
+            "total_seconds": round(total, 3),
+            "mean_ms": round(total / count * 1000, 3),
+            "max_ms": round(largest * 1000, 3),
+        }
+    
+    symbols = []
+    for labels, _, seconds, _ in metrics.series('symbol_download'):
+        rows = metrics.counter('rows_downloaded', **labels)
+        symbols.append({
+            "symbol": labels['symbol'],
+            "timeframe": labels['timeframe'],
+            "rows": rows,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None,
+        })
+    symbols.sort(key=lambda item: item["seconds"], reverse=True)
+    total_rows = sum(item["rows"] for item in symbols)
+    
+    weight = {"requested": metrics.counter('api_weight')}
+    if limiter is not None:
+        weight.update(limiter.stats())
+    return {
+        "started_at": datetime.fromtimestamp(started_at).isoformat(timespec='seconds'),
+        "elapsed_seconds": round(elapsed, 3),
+        "symbols_downloaded": len(symbols),
+        "rows_downloaded": total_rows,
+        "rows_per_sec": round(total_rows / elapsed, 1) if elapsed > 0 else None,
+        "requests": {labels['status']: count for labels, count in metrics.counter_series('klines_requests')},
+        "retries": {labels['reason']: count for labels, count in metrics.counter_series('klines_retries')},
+        "exchange_info": {labels['source']: count for labels, count in metrics.counter_series('exchange_info')},
+        "weight": weight,
+        "stages": stages,
+        "symbols": symbols,
+    }
+
+def write_run_summary(summary, filename=SUMMARY_FILE):
+    try:
+        with open(filename, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"{Fore.CYAN}Đã ghi báo cáo lần chạy vào {filename} ({summary['rows_downloaded']} nến, "
+              f"{summary['elapsed_seconds']}s, weight {summary['weight']['requested']}){Style.RESET_ALL}")
+    except OSError as e:
+        print(f"{Fore.RED}Lỗi khi ghi báo cáo {filename}: {e}{Style.RESET_ALL}")
 
-def auto_download_futures_data():
+def auto_download_futures_data(workers=DOWNLOAD_WORKERS, archive=ARCHIVE_ENABLED, summary_file=SUMMARY_FILE,
+                               refresh_exchange_info=False):
     """
     Tự động tải dữ liệu futures cho tất cả các symbol và timeframe, chỉ các cặp USDT
+    workers <= 1: tải tuần tự như cũ, ngược lại dùng engine tải đồng thời
+    archive: ghi thêm archive nén (.ohlcz)
+    summary_file: file báo cáo JSON của lần chạy (None để không ghi)
+    refresh_exchange_info: gọi lại exchangeInfo kể cả khi cache còn hạn
     """
-    # Đọc file cấu hình
-    config = load_config()
+    started_at = time.time()
+    started = time.perf_counter()
+    limiter = WeightRateLimiter() if workers > 1 else None
+    # Mở metadata (lần đầu sẽ nạp từ config.json có sẵn)
+    metadata = open_store(METADATA_DB, CONFIG_FILE)
     
     # Lấy tất cả symbol đang giao dịch, chỉ lấy các cặp USDT và thông tin chi tiết
-    symbols, symbol_info_dict, exchange_info = get_all_futures_symbols()
+    symbols, symbol_info_dict, exchange_info = get_all_futures_symbols(refresh_exchange_info)
     
     # Tạo danh sách cần tải (chỉ những symbol và timeframe chưa tồn tại hoặc cần cập nhật)
-    download_list, update_list = get_download_list(symbols, DEFAULT_TIMEFRAMES, config, symbol_info_dict)
+    download_list, update_list = get_download_list(symbols, DEFAULT_TIMEFRAMES, metadata, symbol_info_dict)
     
     total_tasks = len(download_list) + len(update_list)
     if total_tasks == 0:
-        print(f"{Fore.GREEN}Tất cả dữ liệu đã cập nhật đến ngày hôm nay. Không cần tải thêm.{Style.RESET_ALL}")
+        print(f"{Fore.GREEN}Tất cả dữ liệu đã có đến nến đã đóng gần nhất. Không cần tải thêm.{Style.RESET_ALL}")
+        metadata.close()
+        if summary_file:
+            write_run_summary(build_run_summary(started_at, time.perf_counter() - started), summary_file)
         return
     
     print(f"{Fore.CYAN}Cần tải {len(download_list)} cặp symbol-timeframe mới và cập nhật {len(update_list)} cặp{Style.RESET_ALL}")
@@ -452,46 +769,101 @@ def auto_download_futures_data():
     update_symbol_count = len(set([item[0] for item in update_list]))
     print(f"{Fore.CYAN}Số lượng symbol cần tải mới: {new_symbol_count}, cần cập nhật: {update_symbol_count}{Style.RESET_ALL}")
     
+    # Ước tính số trang và weight (chưa tính các symbol mới phải hỏi nến đầu tiên)
+    planned_pages = [plan_page_windows(start_time, end_time, timeframe)
+                     for _, timeframe, start_time, end_time, _ in download_list + update_list if start_time is not None]
+    print(f"{Fore.CYAN}Dự kiến {sum(len(pages) for pages in planned_pages)} request, "
+          f"weight {sum(pages_weight(pages) for pages in planned_pages)}{Style.RESET_ALL}")
+    
     # Tạo thanh tiến trình tổng thể
     overall_progress = tqdm(total=total_tasks, desc="Tổng tiến độ", 
                            bar_format="{l_bar}%s{bar}%s{r_bar}" % (Fore.BLUE, Style.RESET_ALL))
     
-    # Tải dữ liệu mới
-    process_data_list(download_list, config, overall_progress, 0, "Tải mới")
-    
-    # Cập nhật dữ liệu
-    process_data_list(update_list, config, overall_progress, len(download_list), "Cập nhật")
+    if workers > 1:
+        # Tải mới và cập nhật cùng lúc, dùng chung một rate limiter
+        process_data_list_concurrent(download_list + update_list, metadata, overall_progress, workers, limiter, archive)
+    else:
+        # Tải dữ liệu mới
+        process_data_list(download_list, metadata, overall_progress, 0, "Tải mới", archive)
+        
+        # Cập nhật dữ liệu
+        process_data_list(update_list, metadata, overall_progress, len(download_list), "Cập nhật", archive)
     
     overall_progress.close()
+    
+    # Ghi config.json một lần khi kết thúc thay vì sau mỗi symbol
+    export_config(metadata)
+    metadata.close()
+    if summary_file:
+        write_run_summary(build_run_summary(started_at, time.perf_counter() - started, limiter), summary_file)
     print(f"{Fore.GREEN}Đã hoàn thành việc tải dữ liệu!{Style.RESET_ALL}")
 
-def process_data_list(data_list, config, progress_bar, start_index, action_text):
+def process_data_list(data_list, metadata, progress_bar, start_index, action_text, archive=False):
     """
     Xử lý danh sách dữ liệu cần tải
     """
-    for i, (symbol, timeframe, start_time, end_time, symbol_info) in enumerate(data_list):
-        try:
-            print(f"\n{Fore.YELLOW}[{i+1+start_index}/{progress_bar.total}] {action_text} dữ liệu cho {symbol} ({timeframe}){Style.RESET_ALL}")
+    # Dùng chung một session (keep-alive) cho mọi symbol thay vì mở kết nối mới mỗi request
+    session = create_session(1)
+    with metadata.batch():
+        for i, (symbol, timeframe, start_time, end_time, symbol_info) in enumerate(data_list):
+            try:
+                print(f"\n{Fore.YELLOW}[{i+1+start_index}/{progress_bar.total}] {action_text} dữ liệu cho {symbol} ({timeframe}){Style.RESET_ALL}")
+                
+                # Tải dữ liệu
+                data = download_futures_data(symbol, timeframe, start_time, end_time, session=session)
+                
+                # Lưu dữ liệu và cập nhật metadata
+                if data is not None and not data.empty:
+                    save_downloaded_data(data, symbol, timeframe, symbol_info, metadata, archive)
+                
+            except Exception as e:
+                print(f"{Fore.RED}Lỗi khi xử lý {symbol} ({timeframe}): {e}{Style.RESET_ALL}")
             
-            # Tải dữ liệu
-            data = download_futures_data(symbol, timeframe, start_time, end_time)
+            # Cập nhật tiến trình tổng thể
+            progress_bar.update(1)
+            if (i + 1) % METADATA_COMMIT_EVERY == 0:
+                metadata.commit()
             
-            # Lưu dữ liệu và cập nhật cấu hình
-            if data is not None and not data.empty:
-                filename = save_data_to_csv(data, symbol, timeframe)
-                config = update_config_from_data(config, data, symbol, timeframe, symbol_info)
-                save_config(config)
+            # Tạm dừng giữa các lần tải để tránh vượt quá giới hạn tốc độ API
+            time.sleep(0.5)
+
+def process_data_list_concurrent(data_list, metadata, progress_bar, workers=DOWNLOAD_WORKERS, limiter=None, archive=False):
+    """
+    Xử lý danh sách dữ liệu cần tải bằng engine tải đồng thời
+    Việc ghi file và cập nhật metadata vẫn chạy trên luồng chính
+    """
+    limiter = limiter or WeightRateLimiter()
+    tasks = download_many(data_list, workers, limiter)
+    with metadata.batch():
+        for i, ((symbol, timeframe, start_time, end_time, symbol_info), data) in enumerate(tasks):
+            try:
+                if data is not None and not data.empty:
+                    save_downloaded_data(data, symbol, timeframe, symbol_info, metadata, archive)
+            except Exception as e:
+                print(f"{Fore.RED}Lỗi khi xử lý {symbol} ({timeframe}): {e}{Style.RESET_ALL}")
             
-        except Exception as e:
-            print(f"{Fore.RED}Lỗi khi xử lý {symbol} ({timeframe}): {e}{Style.RESET_ALL}")
-        
-        # Cập nhật tiến trình tổng thể
-        progress_bar.update(1)
-        
-        # Tạm dừng giữa các lần tải để tránh vượt quá giới hạn tốc độ API
-        time.sleep(0.5)
+            progress_bar.update(1)
+            if (i + 1) % METADATA_COMMIT_EVERY == 0:
+                metadata.commit()
+    
+    stats = limiter.stats()
+    print(f"{Fore.CYAN}Weight đã dùng: {stats['total_weight']}, số lần back-off: {stats['backoff_count']}{Style.RESET_ALL}")
+    return metadata
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Binance Futures data downloader")
+    parser.add_argument('--workers', type=int, default=DOWNLOAD_WORKERS,
+                        help="Số luồng tải đồng thời (1 = tải tuần tự)")
+    parser.add_argument('--archive', action='store_true', default=ARCHIVE_ENABLED,
+                        help="Ghi thêm archive nén (.ohlcz) bên cạnh CSV")
+    parser.add_argument('--summary', default=SUMMARY_FILE,
+                        help="File báo cáo JSON của lần chạy (chuỗi rỗng để không ghi)")
+    parser.add_argument('--refresh-exchange-info', action='store_true',
+                        help=f"Gọi lại exchangeInfo kể cả khi cache {EXCHANGE_INFO_CACHE} còn hạn")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
     print(f"{Fore.CYAN}===== BINANCE FUTURES DATA DOWNLOADER ====={Style.RESET_ALL}")
     print(f"{Fore.CYAN}Script sẽ tự động tải dữ liệu cho các cặp USDT và timeframe chưa tồn tại{Style.RESET_ALL}")
     print(f"{Fore.CYAN}Đồng thời cập nhật dữ liệu cho các symbol đã tồn tại nếu cần{Style.RESET_ALL}")
@@ -500,7 +872,7 @@ def main():
     create_directory(DATA_DIRECTORY)
     
     # Bắt đầu tải dữ liệu tự động
-    auto_download_futures_data()
+    auto_download_futures_data(args.workers, args.archive, args.summary, args.refresh_exchange_info)
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,454 @@
+"""
+Kho nến nén theo block (.ohlcz) cho lưu trữ lâu dài, giải nén từng block khi cần
+
+Mỗi block chứa tối đa `block_rows` nến, các cột được mã hóa riêng rồi nén chung:
+- open_time: delta giữa các nến liên tiếp (gần như hằng số 900000 với 15m)
+- close_time: lưu close_time - open_time rồi delta (không còn lặp lại '...:59.999')
+- giá và khối lượng: đổi sang số nguyên theo số chữ số thập phân (gợi ý từ tickSize/stepSize trong
+  symbolDesc, tự dò nếu không khớp) rồi delta; cột nào không đổi được chính xác thì giữ float64
+- các byte của mỗi giá trị 8 byte được xếp lại theo thứ tự byte (shuffle) trước khi nén
+Codec: zstd nếu có thư viện zstandard, lz4 nếu có lz4, ngược lại zlib của thư viện chuẩn.
+
+Định dạng file (little-endian):
+- Header 64 byte: magic (8s), version (H), codec (H), block_rows (I), số nến (Q), số block (Q),
+  offset của bảng index (Q)
+- Các block nén nối tiếp nhau
+- Bảng index: mỗi block một dòng (open_time đầu, open_time cuối, offset, kích thước, số nến), dùng để
+  tìm kiếm nhị phân theo thời gian và chỉ giải nén các block cần đọc
+
+Ghi nối tiếp chỉ mã hóa lại block cuối (chưa đầy) và các block mới, ghi chúng cùng bảng index mới vào sau
+cuối file (sau bảng index cũ) rồi mới cập nhật header, nên nếu bị ngắt thì file cũ vẫn đọc được. Phần block
+và bảng index cũ bị bỏ lại được dọn khi quá lớn.
+
+Chạy: python candle_archive.py   (tạo file .ohlcz cho mọi file CSV trong binance_futures_data)
+"""
+import argparse
+import glob
+import json
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from candle_store import COLUMN_DTYPES, COLUMN_NAMES, TIME_COLUMNS, dataframe_to_columns
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+MAGIC = b'OHLCZIP1'
+VERSION = 1
+HEADER_FORMAT = '<8sHHIQQQ'
+HEADER_SIZE = 64
+ARCHIVE_SUFFIX = '.ohlcz'
+DEFAULT_BLOCK_ROWS = 4096
+# Dọn phần block bị bỏ lại khi chiếm quá tỉ lệ này của file
+MAX_DEAD_RATIO = 0.25
+
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+CODEC_LZ4 = 2
+CODEC_NAMES = {CODEC_ZLIB: 'zlib', CODEC_ZSTD: 'zstd', CODEC_LZ4: 'lz4'}
+
+# Cách mã hóa của mỗi cột trong block
+KIND_RAW = 0
+KIND_DELTA = 1
+KIND_SCALED_DELTA = 2
+KIND_OFFSET_DELTA = 3
+COLUMN_HEADER = struct.Struct('<BB')
+MAX_DECIMALS = 12
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+QUANTITY_COLUMNS = ('volume', 'taker_buy_base_asset_volume')
+
+INDEX_DTYPE = np.dtype([
+    ('first_open_time', '<i8'),
+    ('last_open_time', '<i8'),
+    ('offset', '<u8'),
+    ('size', '<u8'),
+    ('rows', '<u8'),
+])
+
+def default_codec():
+    if zstandard is not None:
+        return CODEC_ZSTD
+    if lz4_frame is not None:
+        return CODEC_LZ4
+    return CODEC_ZLIB
+
+def compress(codec, data):
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=9).compress(data)
+    if codec == CODEC_LZ4:
+        return lz4_frame.compress(data)
+    return zlib.compress(data, 6)
+
+def decompress(codec, data):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Cần cài zstandard để đọc file nén bằng zstd")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_LZ4:
+        if lz4_frame is None:
+            raise RuntimeError("Cần cài lz4 để đọc file nén bằng lz4")
+        return lz4_frame.decompress(data)
+    return zlib.decompress(data)
+
+def archive_path_for_csv(csv_path):
+    return os.path.splitext(csv_path)[0] + ARCHIVE_SUFFIX
+
+def decimals_of(step):
+    """
+    Số chữ số thập phân của tickSize/stepSize dạng chuỗi, VD: '0.0000100' -> 5
+    """
+    text = str(step).rstrip('0')
+    return len(text.split('.', 1)[1]) if '.' in text else 0
+
+def hints_from_symbol_desc(symbol_desc):
+    """
+    Số chữ số thập phân gợi ý cho từng cột từ symbolDesc (exchangeInfo)
+    """
+    hints = {}
+    if not symbol_desc:
+        return hints
+    filters = {item.get('filterType'): item for item in symbol_desc.get('filters', [])}
+    price_decimals = None
+    if 'PRICE_FILTER' in filters:
+        price_decimals = decimals_of(filters['PRICE_FILTER'].get('tickSize', ''))
+    elif 'pricePrecision' in symbol_desc:
+        price_decimals = int(symbol_desc['pricePrecision'])
+    quantity_decimals = None
+    if 'LOT_SIZE' in filters:
+        quantity_decimals = decimals_of(filters['LOT_SIZE'].get('stepSize', ''))
+    elif 'quantityPrecision' in symbol_desc:
+        quantity_decimals = int(symbol_desc['quantityPrecision'])
+    for name in PRICE_COLUMNS:
+        if price_decimals is not None:
+            hints[name] = price_decimals
+    for name in QUANTITY_COLUMNS:
+        if quantity_decimals is not None:
+            hints[name] = quantity_decimals
+    return hints
+
+def _shuffle(values):
+    # Xếp byte thứ k của mọi giá trị cạnh nhau: các byte cao (thường bằng 0) nén tốt hơn nhiều
+    return values.view(np.uint8).reshape(-1, 8).T.tobytes()
+
+def _unshuffle(data, rows, dtype):
+    return np.frombuffer(data, dtype=np.uint8).reshape(8, rows).T.copy().view(dtype).ravel()
+
+def _find_decimals(values, hint=None):
+    """
+    Số chữ số thập phân nhỏ nhất (thử hint trước) để values / 10^d giữ nguyên chính xác từng bit
+    """
+    candidates = list(range(MAX_DECIMALS + 1))
+    if hint is not None and 0 <= hint <= MAX_DECIMALS:
+        candidates.remove(hint)
+        candidates.insert(0, hint)
+    if not np.all(np.isfinite(values)):
+        return None, None
+    for decimals in candidates:
+        scale = 10.0 ** decimals
+        scaled = np.round(values * scale)
+        if np.all(np.abs(scaled) < 2 ** 53) and np.array_equal(scaled / scale, values):
+            return decimals, scaled.astype(np.int64)
+    return None, None
+
+def encode_block(columns, hints=None):
+    """
+    Mã hóa một block (dict mảng cùng độ dài) thành bytes chưa nén
+    """
+    hints = hints or {}
+    parts = []
+    open_time = columns['open_time']
+    for name in COLUMN_NAMES:
+        values = columns[name]
+        if name == 'open_time':
+            kind, param, data = KIND_DELTA, 0, np.diff(values, prepend=0)
+        elif name == 'close_time':
+            kind, param, data = KIND_OFFSET_DELTA, 0, np.diff(values - open_time, prepend=0)
+        elif np.issubdtype(values.dtype, np.integer):
+            kind, param, data = KIND_DELTA, 0, np.diff(values, prepend=0)
+        else:
+            decimals, scaled = _find_decimals(values, hints.get(name))
+            if decimals is None:
+                kind, param, data = KIND_RAW, 0, values
+            else:
+                kind, param, data = KIND_SCALED_DELTA, decimals, np.diff(scaled, prepend=0)
+        parts.append(COLUMN_HEADER.pack(kind, param))
+        parts.append(_shuffle(np.ascontiguousarray(data)))
+    return b''.join(parts)
+
+def decode_block(payload, rows, columns=None):
+    """
+    Giải mã block (đã giải nén), chỉ tính các cột được yêu cầu
+    """
+    wanted = set(columns or COLUMN_NAMES)
+    if 'close_time' in wanted:
+        wanted.add('open_time')
+    result = {}
+    payload = memoryview(payload)
+    position = 0
+    segment_size = rows * 8
+    for name in COLUMN_NAMES:
+        kind, param = COLUMN_HEADER.unpack_from(payload, position)
+        position += COLUMN_HEADER.size
+        data = payload[position:position + segment_size]
+        position += segment_size
+        if name not in wanted:
+            continue
+        dtype = COLUMN_DTYPES[name]
+        if kind == KIND_RAW:
+            result[name] = _unshuffle(data, rows, dtype)
+            continue
+        values = np.cumsum(_unshuffle(data, rows, np.int64))
+        if kind == KIND_SCALED_DELTA:
+            values = values / 10.0 ** param
+        elif kind == KIND_OFFSET_DELTA:
+            values = values + result['open_time']
+        result[name] = values.astype(dtype, copy=False)
+    return result
+
+def _pack_header(codec, block_rows, n_rows, n_blocks, index_offset):
+    header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, codec, block_rows, n_rows, n_blocks, index_offset)
+    return header.ljust(HEADER_SIZE, b'\0')
+
+def read_header(path):
+    """
+    Returns:
+    dict: codec, block_rows, n_rows, n_blocks, index_offset
+    """
+    with open(path, 'rb') as f:
+        raw = f.read(struct.calcsize(HEADER_FORMAT))
+    magic, version, codec, block_rows, n_rows, n_blocks, index_offset = struct.unpack(HEADER_FORMAT, raw)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"File {path} không đúng định dạng candle archive")
+    return {"codec": codec, "block_rows": block_rows, "n_rows": n_rows,
+            "n_blocks": n_blocks, "index_offset": index_offset}
+
+def read_index(path, header=None):
+    header = header or read_header(path)
+    with open(path, 'rb') as f:
+        f.seek(header["index_offset"])
+        data = f.read(header["n_blocks"] * INDEX_DTYPE.itemsize)
+    return np.frombuffer(data, dtype=INDEX_DTYPE)
+
+def _encode_blocks(columns, start_offset, codec, block_rows, hints):
+    """
+    Chia các cột thành block, trả về (danh sách bytes đã nén, các dòng index)
+    """
+    n_rows = len(columns['open_time'])
+    blocks = []
+    entries = []
+    offset = start_offset
+    for start in range(0, n_rows, block_rows):
+        stop = min(start + block_rows, n_rows)
+        block = {name: values[start:stop] for name, values in columns.items()}
+        data = compress(codec, encode_block(block, hints))
+        blocks.append(data)
+        entries.append((block['open_time'][0], block['open_time'][-1], offset, len(data), stop - start))
+        offset += len(data)
+    return blocks, np.array(entries, dtype=INDEX_DTYPE)
+
+def _write_columns(path, columns, codec, block_rows, hints):
+    """
+    Ghi toàn bộ archive ra file tạm rồi đổi tên (atomic)
+    """
+    n_rows = len(columns['open_time'])
+    blocks, index = _encode_blocks(columns, HEADER_SIZE, codec, block_rows, hints)
+    index_offset = HEADER_SIZE + sum(len(block) for block in blocks)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(_pack_header(codec, block_rows, n_rows, len(blocks), index_offset))
+        for block in blocks:
+            f.write(block)
+        f.write(index.tobytes())
+    os.replace(temp_path, path)
+    return n_rows
+
+def write_archive(df, path, hints=None, codec=None, block_rows=DEFAULT_BLOCK_ROWS):
+    """
+    Ghi mới toàn bộ DataFrame (định dạng của binance.py) thành file archive
+    """
+    codec = default_codec() if codec is None else codec
+    return _write_columns(path, dataframe_to_columns(df), codec, block_rows, hints)
+
+def append_archive(df, path, hints=None):
+    """
+    Ghi nối tiếp các nến mới hơn open_time cuối cùng trong archive
+
+    Returns:
+    int: Số nến đã ghi thêm
+    """
+    if not os.path.exists(path):
+        return write_archive(df, path, hints)
+
+    header = read_header(path)
+    index = read_index(path, header)
+    new_columns = dataframe_to_columns(df)
+    if len(index):
+        mask = new_columns['open_time'] > index['last_open_time'][-1]
+        new_columns = {name: values[mask] for name, values in new_columns.items()}
+    n_new = len(new_columns['open_time'])
+    if n_new == 0:
+        return 0
+
+    codec, block_rows = header["codec"], header["block_rows"]
+    keep = len(index)
+    if keep and index['rows'][-1] < block_rows:
+        # Block cuối chưa đầy: giải mã để gộp với nến mới
+        keep -= 1
+        last = _read_block(path, codec, index[-1])
+        new_columns = {name: np.concatenate([last[name], new_columns[name]]) for name in COLUMN_NAMES}
+
+    # Không ghi đè lên bảng index cũ: header hiện tại vẫn trỏ tới nó cho tới khi ghi xong
+    data_end = os.path.getsize(path)
+    blocks, entries = _encode_blocks(new_columns, data_end, codec, block_rows, hints)
+    index = np.concatenate([index[:keep], entries])
+    n_rows = header["n_rows"] + n_new
+    index_offset = data_end + sum(len(block) for block in blocks)
+
+    live = HEADER_SIZE + int(index['size'].sum())
+    if index_offset - live > MAX_DEAD_RATIO * index_offset:
+        # Quá nhiều block cũ bị bỏ lại: ghi lại toàn bộ file
+        columns = read_columns(path)
+        columns = {name: np.concatenate([columns[name], new_columns[name][-n_new:]]) for name in COLUMN_NAMES}
+        _write_columns(path, columns, codec, block_rows, hints)
+        return n_new
+
+    with open(path, 'r+b') as f:
+        # Ghi block mới và index mới sau cuối file, header được cập nhật sau cùng
+        f.seek(data_end)
+        for block in blocks:
+            f.write(block)
+        f.write(index.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+        f.seek(0)
+        f.write(_pack_header(codec, block_rows, n_rows, len(index), index_offset))
+        f.flush()
+        os.fsync(f.fileno())
+    return n_new
+
+def _read_block(path, codec, entry, columns=None, handle=None):
+    if handle is None:
+        with open(path, 'rb') as f:
+            return _read_block(path, codec, entry, columns, f)
+    handle.seek(int(entry['offset']))
+    payload = decompress(codec, handle.read(int(entry['size'])))
+    return decode_block(payload, int(entry['rows']), columns)
+
+def read_columns(path, columns=None, last=None, start_ms=None, end_ms=None):
+    """
+    Giải nén các block cần thiết và trả về dict {tên cột: mảng NumPy}
+
+    Parameters:
+    columns (list): Các cột cần lấy (mặc định: tất cả)
+    last (int): Chỉ lấy `last` nến cuối cùng
+    start_ms, end_ms (int): Chỉ lấy các nến có open_time trong [start_ms, end_ms] (bỏ qua nếu có `last`)
+    """
+    names = list(columns or COLUMN_NAMES)
+    header = read_header(path)
+    index = read_index(path, header)
+
+    first_block, stop_block = 0, len(index)
+    if last is not None:
+        rows_from_end = np.cumsum(index['rows'][::-1])
+        first_block = len(index) - int(np.searchsorted(rows_from_end, last, side='left')) - 1
+        first_block = max(0, first_block)
+    else:
+        if start_ms is not None:
+            first_block = int(np.searchsorted(index['last_open_time'], start_ms, side='left'))
+        if end_ms is not None:
+            stop_block = int(np.searchsorted(index['first_open_time'], end_ms, side='right'))
+
+    decode_names = list(names)
+    if (start_ms is not None or end_ms is not None) and last is None and 'open_time' not in names:
+        # Cần open_time để cắt theo thời gian
+        decode_names.append('open_time')
+    parts = {name: [] for name in decode_names}
+    with open(path, 'rb') as f:
+        for entry in index[first_block:max(first_block, stop_block)]:
+            block = _read_block(path, header["codec"], entry, decode_names, f)
+            for name in decode_names:
+                parts[name].append(block[name])
+    result = {name: np.concatenate(values) if values else np.empty(0, dtype=COLUMN_DTYPES[name])
+              for name, values in parts.items()}
+
+    if last is not None:
+        result = {name: values[max(0, len(values) - last):] for name, values in result.items()}
+    elif start_ms is not None or end_ms is not None:
+        open_time = result['open_time']
+        start = 0 if start_ms is None else int(np.searchsorted(open_time, start_ms, side='left'))
+        stop = len(open_time) if end_ms is None else int(np.searchsorted(open_time, end_ms, side='right'))
+        result = {name: values[start:max(start, stop)] for name, values in result.items()}
+    return {name: result[name] for name in names}
+
+def iter_blocks(path, columns=None):
+    """
+    Giải nén lần lượt từng block (dict {tên cột: mảng NumPy}), chỉ giữ một block trong bộ nhớ
+    """
+    names = list(columns or COLUMN_NAMES)
+    header = read_header(path)
+    index = read_index(path, header)
+    with open(path, 'rb') as f:
+        for entry in index:
+            yield _read_block(path, header["codec"], entry, names, f)
+
+def read_dataframe(path, columns=None, last=None, start_ms=None, end_ms=None, parse_dates=True):
+    """
+    Đọc archive thành DataFrame cùng các cột như file CSV (như candle_store.read_dataframe)
+    """
+    data = read_columns(path, columns, last, start_ms, end_ms)
+    if parse_dates:
+        for name in TIME_COLUMNS:
+            if name in data:
+                data[name] = data[name].view('datetime64[ms]')
+    return pd.DataFrame(data, copy=False)
+
+def read_range(path, start_ms=None, end_ms=None, columns=None, parse_dates=True):
+    return read_dataframe(path, columns, None, start_ms, end_ms, parse_dates)
+
+def load_hints(config_file="config.json"):
+    """
+    Gợi ý số chữ số thập phân cho mọi symbol từ symbolDesc trong config.json
+    """
+    if not os.path.exists(config_file):
+        return {}
+    with open(config_file, 'r') as f:
+        marketdata = json.load(f).get("exchange", {}).get("binance", {}).get("marketdata", {})
+    return {item.get("fullname", key.upper()): hints_from_symbol_desc(item.get("symbolDesc"))
+            for key, item in marketdata.items()}
+
+def build_all(directory="binance_futures_data", config_file="config.json", block_rows=DEFAULT_BLOCK_ROWS):
+    """
+    Tạo file archive cho mọi file CSV trong thư mục dữ liệu
+    """
+    hints = load_hints(config_file)
+    paths = sorted(glob.glob(os.path.join(directory, "*.csv")))
+    total_rows = 0
+    start = time.perf_counter()
+    for csv_path in paths:
+        symbol = os.path.basename(csv_path).split('_')[1]
+        df = pd.read_csv(csv_path, parse_dates=['open_time', 'close_time'])
+        total_rows += write_archive(df, archive_path_for_csv(csv_path), hints.get(symbol), block_rows=block_rows)
+    elapsed = time.perf_counter() - start
+    print(f"Đã tạo {len(paths)} file archive ({total_rows} nến, codec {CODEC_NAMES[default_codec()]}) "
+          f"trong {elapsed:.2f}s")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tạo candle archive nén từ các file CSV")
+    parser.add_argument('--directory', default="binance_futures_data")
+    parser.add_argument('--config', default="config.json")
+    parser.add_argument('--block-rows', type=int, default=DEFAULT_BLOCK_ROWS)
+    args = parser.parse_args()
+    build_all(args.directory, args.config, args.block_rows)
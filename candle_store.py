@@ -0,0 +1,220 @@
+"""
+Kho nến dạng nhị phân theo cột (columnar), đọc bằng memory-map
+
+Định dạng file (little-endian):
+- Header 64 byte: magic (8s), version (I), số cột (I), số dòng (Q), capacity (Q), phần còn lại để trống
+- Sau header là các cột liên tiếp, mỗi cột chiếm `capacity * 8` byte, theo thứ tự STORE_COLUMNS
+- Thời gian lưu dạng int64 (ms), giá/khối lượng float64, số giao dịch int64
+
+Vì mỗi cột có kích thước cố định, lấy N nến cuối chỉ là dịch con trỏ tới `(n_rows - N) * 8`
+trong vùng của cột, không cần parse.
+"""
+import argparse
+import glob
+import os
+import struct
+import time
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b'OHLCBIN1'
+VERSION = 1
+HEADER_FORMAT = '<8sIIQQ'
+HEADER_SIZE = 64
+STORE_SUFFIX = '.ohlc'
+MIN_CAPACITY = 1024
+
+STORE_COLUMNS = [
+    ('open_time', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+    ('close_time', '<i8'),
+    ('quote_asset_volume', '<f8'),
+    ('number_of_trades', '<i8'),
+    ('taker_buy_base_asset_volume', '<f8'),
+    ('taker_buy_quote_asset_volume', '<f8'),
+]
+COLUMN_NAMES = [name for name, _ in STORE_COLUMNS]
+COLUMN_DTYPES = dict(STORE_COLUMNS)
+TIME_COLUMNS = ('open_time', 'close_time')
+
+def store_path_for_csv(csv_path):
+    """
+    binance_futures_data/binance_BTCUSDT_15m.csv -> binance_futures_data/binance_BTCUSDT_15m.ohlc
+    """
+    return os.path.splitext(csv_path)[0] + STORE_SUFFIX
+
+def read_header(path):
+    """
+    Đọc header, trả về (số dòng, capacity)
+    """
+    with open(path, 'rb') as f:
+        raw = f.read(struct.calcsize(HEADER_FORMAT))
+    magic, version, n_columns, n_rows, capacity = struct.unpack(HEADER_FORMAT, raw)
+    if magic != MAGIC or version != VERSION or n_columns != len(STORE_COLUMNS):
+        raise ValueError(f"File {path} không đúng định dạng candle store")
+    return n_rows, capacity
+
+def _pack_header(n_rows, capacity):
+    header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, len(STORE_COLUMNS), n_rows, capacity)
+    return header.ljust(HEADER_SIZE, b'\0')
+
+def _column_offset(index, capacity):
+    return HEADER_SIZE + index * capacity * 8
+
+def dataframe_to_columns(df):
+    """
+    Chuyển DataFrame (định dạng của binance.py) thành dict các mảng NumPy đúng kiểu
+    """
+    columns = {}
+    for name, dtype in STORE_COLUMNS:
+        values = df[name]
+        if name in TIME_COLUMNS:
+            if not np.issubdtype(values.dtype, np.integer):
+                values = pd.to_datetime(values).to_numpy('datetime64[ms]').astype(np.int64)
+        columns[name] = np.ascontiguousarray(values, dtype=dtype)
+    return columns
+
+def _write_file(path, columns, n_rows, capacity):
+    """
+    Ghi toàn bộ store ra file tạm rồi đổi tên (atomic)
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(_pack_header(n_rows, capacity))
+        for name, dtype in STORE_COLUMNS:
+            column = np.zeros(capacity, dtype=dtype)
+            column[:n_rows] = columns[name][:n_rows]
+            f.write(column.tobytes())
+    os.replace(temp_path, path)
+
+def write_store(df, path):
+    """
+    Ghi mới toàn bộ DataFrame thành file store
+    """
+    columns = dataframe_to_columns(df)
+    n_rows = len(df)
+    _write_file(path, columns, n_rows, max(MIN_CAPACITY, n_rows))
+    return n_rows
+
+def append_store(df, path):
+    """
+    Ghi nối tiếp các nến mới hơn open_time cuối cùng trong store
+
+    Nếu còn đủ capacity thì ghi trực tiếp vào vùng trống của từng cột, sau đó mới cập nhật
+    số dòng trong header (nếu bị ngắt giữa chừng, dữ liệu cũ vẫn nguyên vẹn).
+    Nếu hết capacity thì ghi lại file với capacity gấp đôi.
+
+    Returns:
+    int: Số nến đã ghi thêm
+    """
+    if not os.path.exists(path):
+        return write_store(df, path)
+
+    new_columns = dataframe_to_columns(df)
+    n_rows, capacity = read_header(path)
+    if n_rows > 0:
+        last_open_time = read_columns(path, ['open_time'], last=1)['open_time'][0]
+        mask = new_columns['open_time'] > last_open_time
+        new_columns = {name: values[mask] for name, values in new_columns.items()}
+    n_new = len(new_columns['open_time'])
+    if n_new == 0:
+        return 0
+
+    total = n_rows + n_new
+    if total > capacity:
+        old_columns = read_columns(path)
+        merged = {name: np.concatenate([old_columns[name], new_columns[name]]) for name in COLUMN_NAMES}
+        _write_file(path, merged, total, max(total, capacity * 2))
+        return n_new
+
+    with open(path, 'r+b') as f:
+        for index, (name, _) in enumerate(STORE_COLUMNS):
+            f.seek(_column_offset(index, capacity) + n_rows * 8)
+            f.write(new_columns[name].tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+        f.seek(0)
+        f.write(_pack_header(total, capacity))
+    return n_new
+
+def read_columns(path, columns=None, last=None, start=None, stop=None):
+    """
+    Memory-map file store và trả về dict {tên cột: mảng NumPy}, không copy dữ liệu
+
+    Parameters:
+    path (str): Đường dẫn file store
+    columns (list): Các cột cần lấy (mặc định: tất cả)
+    last (int): Chỉ lấy `last` nến cuối cùng
+    start, stop (int): Lấy theo chỉ số dòng [start, stop) (bỏ qua nếu có `last`)
+    """
+    n_rows, capacity = read_header(path)
+    if last is not None:
+        start, stop = max(0, n_rows - last), n_rows
+    else:
+        start = 0 if start is None else max(0, min(start, n_rows))
+        stop = n_rows if stop is None else max(start, min(stop, n_rows))
+    count = stop - start
+
+    mapped = np.memmap(path, dtype=np.uint8, mode='r') if count else None
+    result = {}
+    for name in columns or COLUMN_NAMES:
+        dtype = COLUMN_DTYPES[name]
+        if count == 0:
+            result[name] = np.empty(0, dtype=dtype)
+            continue
+        offset = _column_offset(COLUMN_NAMES.index(name), capacity) + start * 8
+        result[name] = mapped[offset:offset + count * 8].view(dtype)
+    return result
+
+def read_dataframe(path, columns=None, last=None, start=None, stop=None, parse_dates=True):
+    """
+    Đọc store thành DataFrame cùng các cột như file CSV
+    parse_dates=True: chuyển open_time/close_time sang datetime như pd.read_csv của file CSV
+    """
+    data = read_columns(path, columns, last, start, stop)
+    if parse_dates:
+        for name in TIME_COLUMNS:
+            if name in data:
+                data[name] = data[name].view('datetime64[ms]')
+    return pd.DataFrame(data, copy=False)
+
+def find_range(path, start_ms=None, end_ms=None):
+    """
+    Tìm khoảng chỉ số dòng [start, stop) có open_time trong [start_ms, end_ms] bằng tìm kiếm nhị phân
+    trên cột open_time đã memory-map (chỉ chạm tới O(log n) trang của file)
+    """
+    open_time = read_columns(path, ['open_time'])['open_time']
+    start = 0 if start_ms is None else int(np.searchsorted(open_time, start_ms, side='left'))
+    stop = len(open_time) if end_ms is None else int(np.searchsorted(open_time, end_ms, side='right'))
+    return start, max(start, stop)
+
+def read_range(path, start_ms=None, end_ms=None, columns=None, parse_dates=True):
+    """
+    Đọc các nến có open_time trong [start_ms, end_ms] (ms) thành DataFrame
+    """
+    start, stop = find_range(path, start_ms, end_ms)
+    return read_dataframe(path, columns, start=start, stop=stop, parse_dates=parse_dates)
+
+def build_all(directory="binance_futures_data"):
+    """
+    Tạo file store cho mọi file CSV trong thư mục dữ liệu
+    """
+    paths = sorted(glob.glob(os.path.join(directory, "*.csv")))
+    total_rows = 0
+    start = time.perf_counter()
+    for csv_path in paths:
+        df = pd.read_csv(csv_path, parse_dates=['open_time', 'close_time'])
+        total_rows += write_store(df, store_path_for_csv(csv_path))
+    elapsed = time.perf_counter() - start
+    print(f"Đã tạo {len(paths)} file store ({total_rows} nến) trong {elapsed:.2f}s")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tạo candle store nhị phân từ các file CSV")
+    parser.add_argument('--directory', default="binance_futures_data")
+    args = parser.parse_args()
+    build_all(args.directory)
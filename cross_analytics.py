@@ -0,0 +1,400 @@
+"""
+Số liệu liên symbol được tính sẵn và lưu ra đĩa: log return, return trượt, volatility thực hiện,
+ma trận tương quan/hiệp phương sai giữa mọi symbol
+
+- Mọi symbol được căn theo một lưới thời gian chung (mỗi dòng một nến của timeframe, mỗi cột một symbol),
+  bắt đầu từ nến sớm nhất trong các symbol; symbol niêm yết muộn (VD: ENAUSDT so với METISUSDT),
+  ngừng giao dịch hoặc thiếu nến thì ô tương ứng là NaN
+- Chuỗi theo thời gian (dòng x symbol):
+  log_close; log_return = log_close[t] - log_close[t-1];
+  rolling_return = log_close[t] - log_close[t-window] (log return của `window` nến gần nhất);
+  volatility = căn bậc hai tổng log_return² trong `window` nến (thiếu nến thì quy đổi theo số nến có dữ liệu,
+  cần ít nhất một nửa cửa sổ)
+- Ma trận (symbol x symbol) trên `corr_window` log return cuối cùng, mỗi cặp chỉ dùng các nến cả hai cùng có
+  (như DataFrame.corr/cov của pandas với min_periods = nửa cửa sổ)
+- Cập nhật tăng dần: chỉ đọc các nến mới hơn nến cuối đã tính của mỗi symbol và chỉ tính lại các dòng từ
+  nến mới sớm nhất; ma trận được tính từ phần cuối của log_return đã lưu nên không phụ thuộc độ dài lịch sử
+- Lưu trong ANALYTICS_DIRECTORY/<timeframe>/ (server.py đọc bằng memory-map, các worker dùng chung page cache):
+  mỗi chuỗi một file .npy cấp phát trước theo khối (ROW_CHUNK dòng, COLUMN_CHUNK cột, ô chưa dùng là NaN),
+  mỗi lần cập nhật chỉ ghi tại chỗ các dòng được tính lại; ma trận (nhỏ) được ghi thành file mới;
+  manifest.json (số dòng, symbol, file đang dùng) được đổi sau cùng nên người đọc luôn thấy một bộ đầy đủ.
+  Chỉ khi hết chỗ, lưới mở rộng về phía trước hoặc --rebuild thì các chuỗi mới được chép sang bộ file mới.
+  Mỗi thời điểm chỉ nên có một tiến trình cập nhật (cross_analytics.py hoặc follower.py --analytics)
+
+Chạy sau khi tải dữ liệu: python cross_analytics.py --timeframe 15m (--rebuild để tính lại từ đầu)
+follower.py --analytics cập nhật sau mỗi lần ghi nến mới
+"""
+import argparse
+import json
+import glob
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from data_cache import DATA_DIRECTORY, FrameCache
+from resampler import TIMEFRAME_MS
+from scanner import config_symbols
+
+ANALYTICS_DIRECTORY = os.path.join(DATA_DIRECTORY, "analytics")
+MANIFEST_FILE = "manifest.json"
+# Cửa sổ của rolling_return/volatility (96 nến 15m = 1 ngày) và của ma trận tương quan (672 nến 15m = 7 ngày)
+DEFAULT_WINDOW = 96
+DEFAULT_CORR_WINDOW = 672
+
+# Các chuỗi theo thời gian (dòng x symbol) và kiểu lưu; log_close giữ float64 để log return không mất chính xác
+SERIES = {
+    'log_close': np.float64,
+    'log_return': np.float32,
+    'rolling_return': np.float32,
+    'volatility': np.float32,
+}
+MATRICES = ('correlation', 'covariance', 'pair_count')
+# Số cột mỗi lần khi tính volatility
+DERIVE_BLOCK_COLUMNS = 16
+# Các chuỗi được cấp phát trước theo khối: 2880 dòng (30 ngày 15m) và 32 symbol
+ROW_CHUNK = 2880
+COLUMN_CHUNK = 32
+
+def analytics_path(timeframe, directory=ANALYTICS_DIRECTORY):
+    return os.path.join(directory, timeframe)
+
+def series_file(path, name, generation):
+    return os.path.join(path, f"{name}.{generation}.npy")
+
+def matrix_file(path, name, version):
+    return os.path.join(path, f"{name}.m{version}.npy")
+
+def chunked(count, chunk):
+    return max(chunk, -(-count // chunk) * chunk)
+
+def load_state(path, mmap_mode='r'):
+    """
+    Đọc kết quả đã lưu; các chuỗi là view [rows, số symbol] trên file memory-map
+    (mmap_mode='r+' để cập nhật tại chỗ)
+
+    Returns:
+    dict: manifest kèm các mảng trong SERIES và MATRICES, hoặc None nếu chưa có / không đọc được
+    """
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), 'r') as f:
+            state = json.load(f)
+        rows, n_symbols = state["rows"], len(state["symbols"])
+        for name in SERIES:
+            values = np.load(series_file(path, name, state["generation"]), mmap_mode=mmap_mode)
+            if values.shape != tuple(state["capacity"]):
+                return None
+            state[name] = values[:rows, :n_symbols]
+        for name in MATRICES:
+            state[name] = np.load(matrix_file(path, name, state["version"]), mmap_mode=mmap_mode)
+            if state[name].shape != (n_symbols, n_symbols):
+                return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return state
+
+def allocate_series(path, generation, capacity):
+    """
+    Tạo bộ file chuỗi mới (toàn NaN) với kích thước capacity, trả về dict các mảng memory-map ghi được
+    """
+    arrays = {}
+    for name, dtype in SERIES.items():
+        arrays[name] = np.lib.format.open_memmap(series_file(path, name, generation), mode='w+',
+                                                 dtype=dtype, shape=capacity)
+        arrays[name][:] = np.nan
+    return arrays
+
+def write_manifest(path, manifest):
+    temp_path = os.path.join(path, f"{MANIFEST_FILE}.tmp")
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, os.path.join(path, MANIFEST_FILE))
+
+def remove_unused(path, manifest):
+    """
+    Xóa các file .npy không thuộc manifest hiện tại (bộ cũ; mảng đang được memory-map vẫn đọc được tới khi đóng)
+    """
+    keep = {series_file(path, name, manifest["generation"]) for name in SERIES}
+    keep |= {matrix_file(path, name, manifest["version"]) for name in MATRICES}
+    for name in glob.glob(os.path.join(path, "*.npy")):
+        if name not in keep:
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+
+def read_new_bars(cache, symbol, timeframe, since=None):
+    """
+    open_time (ms) và close của các nến có open_time > since (toàn bộ nếu since là None)
+    """
+    df = cache.get_range(symbol, timeframe, None if since is None else since + 1, None)
+    if df is None or len(df) == 0:
+        return None
+    open_time = np.asarray(df['open_time'])
+    if open_time.dtype.kind == 'M':
+        open_time = open_time.astype('datetime64[ms]').astype(np.int64)
+    return open_time, np.asarray(df['close'], dtype=np.float64)
+
+def derive_series(arrays, start, window):
+    """
+    Tính lại log_return, rolling_return, volatility cho các dòng từ `start` trở đi theo log_close
+    """
+    log_close = arrays['log_close']
+    rows = len(log_close)
+    if start >= rows:
+        return
+
+    first = max(start, 1)
+    arrays['log_return'][start:first] = np.nan
+    arrays['log_return'][first:] = log_close[first:] - log_close[first - 1:-1]
+
+    # Lưới ngắn hơn cửa sổ: chưa dòng nào có đủ `window` nến
+    first = min(max(start, window), rows)
+    arrays['rolling_return'][start:first] = np.nan
+    if first < rows:
+        arrays['rolling_return'][first:] = log_close[first:] - log_close[first - window:rows - window]
+
+    # Tổng bình phương trong cửa sổ bằng tổng tích lũy, tính trên log_return đã lưu (float32),
+    # từng nhóm cột để bộ nhớ tạm không tăng theo số symbol khi tính lại từ đầu
+    base = max(0, start - window + 1)
+    stop = np.arange(start, rows) - base + 1
+    begin = np.maximum(np.arange(start, rows) - window + 1, base) - base
+    for column in range(0, log_close.shape[1], DERIVE_BLOCK_COLUMNS):
+        block = slice(column, column + DERIVE_BLOCK_COLUMNS)
+        returns = arrays['log_return'][base:, block].astype(np.float64)
+        valid = ~np.isnan(returns)
+        squared = np.zeros((len(returns) + 1, returns.shape[1]))
+        np.cumsum(np.where(valid, returns * returns, 0.0), axis=0, out=squared[1:])
+        counts = np.zeros(squared.shape, dtype=np.int64)
+        np.cumsum(valid, axis=0, out=counts[1:])
+        total = squared[stop] - squared[begin]
+        count = counts[stop] - counts[begin]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            volatility = np.sqrt(np.maximum(total, 0.0) * window / count)
+        arrays['volatility'][start:, block] = np.where(count >= max(2, window // 2), volatility, np.nan)
+
+def pairwise_moments(returns, min_periods):
+    """
+    Hiệp phương sai và tương quan từng cặp cột, chỉ dùng các dòng cả hai cột cùng có giá trị
+
+    Returns:
+    tuple: (covariance, correlation, số dòng chung của từng cặp)
+    """
+    values = returns.astype(np.float64)
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    mask = valid.astype(np.float64)
+    count = mask.T @ mask
+    # sums[i, j]: tổng cột i trên các dòng mà cả i và j cùng có
+    sums = filled.T @ mask
+    squares = (filled * filled).T @ mask
+    products = filled.T @ filled
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = (products - sums * sums.T / count) / (count - 1)
+        variance = (squares - sums * sums / count) / (count - 1)
+        correlation = covariance / np.sqrt(variance * variance.T)
+    enough = count >= max(2, min_periods)
+    covariance = np.where(enough, covariance, np.nan)
+    correlation = np.where(enough, np.clip(correlation, -1.0, 1.0), np.nan)
+    return covariance, correlation, count.astype(np.int32)
+
+def update(timeframe='15m', symbols=None, window=DEFAULT_WINDOW, corr_window=DEFAULT_CORR_WINDOW,
+           directory=ANALYTICS_DIRECTORY, data_directory=DATA_DIRECTORY, rebuild=False):
+    """
+    Cập nhật (hoặc tạo mới) kết quả của timeframe từ các nến mới trong thư mục dữ liệu
+
+    Parameters:
+    symbols (list): Các symbol cần đọc nến mới (mặc định: mọi symbol trong config.json);
+                    symbol đã có trong kết quả mà không nằm trong danh sách thì giữ nguyên
+    rebuild (bool): Bỏ kết quả cũ, tính lại từ đầu (khi dữ liệu cũ bị sửa)
+
+    Returns:
+    dict: Tóm tắt lần cập nhật (số nến đọc, dòng bắt đầu tính lại, thời gian...)
+    """
+    started = time.perf_counter()
+    interval = TIMEFRAME_MS[timeframe]
+    path = analytics_path(timeframe, directory)
+    state = None if rebuild else load_state(path, mmap_mode='r+')
+    if state is not None and (state["window"], state["corr_window"]) != (window, corr_window):
+        state = None
+
+    known = list(state["symbols"]) if state is not None else []
+    last_time = dict(state["last_time"]) if state is not None else {}
+    cache = FrameCache(directory=data_directory)
+    updates = {}
+    for symbol in symbols if symbols is not None else config_symbols():
+        bars = read_new_bars(cache, symbol, timeframe, last_time.get(symbol))
+        if bars is not None:
+            updates[symbol] = bars
+
+    summary = {"timeframe": timeframe, "path": path, "rebuild": state is None,
+               "symbols_updated": len(updates), "bars_read": int(sum(len(bars[0]) for bars in updates.values()))}
+    if not updates and state is not None:
+        summary.update({"rows": state["rows"], "recomputed_from": None,
+                        "seconds": round(time.perf_counter() - started, 3)})
+        return summary
+    if not updates:
+        raise ValueError(f"Không có dữ liệu {timeframe} trong {data_directory}")
+
+    # Lưới thời gian chung: mở rộng về hai phía để chứa mọi nến mới
+    old_rows = state["rows"] if state is not None else 0
+    bounds = [(int(open_time[0]), int(open_time[-1])) for open_time, _ in updates.values()]
+    start = min(first for first, _ in bounds) // interval * interval
+    end = max(last for _, last in bounds)
+    if state is not None:
+        start = min(start, state["start"])
+        end = max(end, state["start"] + (old_rows - 1) * interval)
+    rows = (end - start) // interval + 1
+    offset = (state["start"] - start) // interval if state is not None else 0
+    columns = known + [symbol for symbol in updates if symbol not in known]
+    position = {symbol: index for index, symbol in enumerate(columns)}
+
+    os.makedirs(path, exist_ok=True)
+    capacity = tuple(state["capacity"]) if state is not None else (0, 0)
+    generation = state["generation"] if state is not None else 0
+    relayout = state is None or offset > 0 or rows > capacity[0] or len(columns) > capacity[1]
+    if relayout:
+        # Hết chỗ hoặc lưới bắt đầu sớm hơn: chép sang bộ file mới lớn hơn (chỉ xảy ra sau mỗi khối)
+        capacity = (chunked(rows, ROW_CHUNK), chunked(len(columns), COLUMN_CHUNK))
+        generation += 1
+        full = allocate_series(path, generation, capacity)
+        if state is not None:
+            for name in SERIES:
+                full[name][offset:offset + old_rows, :len(known)] = state[name]
+    else:
+        full = {name: np.load(series_file(path, name, generation), mmap_mode='r+') for name in SERIES}
+    arrays = {name: values[:rows, :len(columns)] for name, values in full.items()}
+
+    # Dòng sớm nhất có nến mới: mọi chuỗi được tính lại từ dòng đó
+    recompute_from = 0 if offset else rows
+    for symbol, (open_time, close) in updates.items():
+        steps = open_time - start
+        on_grid = steps % interval == 0
+        index = steps[on_grid] // interval
+        if not len(index):
+            continue
+        with np.errstate(divide='ignore', invalid='ignore'):
+            arrays['log_close'][index, position[symbol]] = np.log(close[on_grid])
+        recompute_from = min(recompute_from, int(index[0]))
+        last_time[symbol] = int(open_time[-1])
+    derive_series(arrays, recompute_from, window)
+
+    for values in full.values():
+        values.flush()
+
+    covariance, correlation, pair_count = pairwise_moments(arrays['log_return'][-corr_window:], corr_window // 2)
+    version = state["version"] + 1 if state is not None else 1
+    for name, values in (('correlation', correlation), ('covariance', covariance), ('pair_count', pair_count)):
+        with open(matrix_file(path, name, version), 'wb') as f:
+            np.save(f, values)
+            f.flush()
+            os.fsync(f.fileno())
+
+    manifest = {
+        "timeframe": timeframe,
+        "interval": interval,
+        "start": int(start),
+        "rows": int(rows),
+        "symbols": columns,
+        "last_time": last_time,
+        "window": window,
+        "corr_window": corr_window,
+        "capacity": list(capacity),
+        "generation": generation,
+        "version": version,
+        "updated_at": int(time.time() * 1000),
+    }
+    write_manifest(path, manifest)
+    remove_unused(path, manifest)
+    summary.update({"rows": int(rows), "recomputed_from": int(recompute_from), "relayout": relayout,
+                    "seconds": round(time.perf_counter() - started, 3)})
+    return summary
+
+class AnalyticsCache:
+    """
+    Giữ kết quả đã lưu (memory-map) cho server.py, đọc lại khi manifest của timeframe thay đổi
+    """
+
+    def __init__(self, directory=ANALYTICS_DIRECTORY):
+        self.directory = directory
+        self.states = {}
+        self.lock = threading.Lock()
+
+    def get(self, timeframe):
+        path = analytics_path(timeframe, self.directory)
+        try:
+            mtime = os.stat(os.path.join(path, MANIFEST_FILE)).st_mtime_ns
+        except OSError:
+            # Đang đổi thư mục giữa hai lần cập nhật: dùng tạm bản đã đọc
+            with self.lock:
+                entry = self.states.get(timeframe)
+            return entry[1] if entry is not None else None
+        with self.lock:
+            entry = self.states.get(timeframe)
+            if entry is not None and entry[0] == mtime:
+                return entry[1]
+        state = load_state(path)
+        if state is None:
+            return entry[1] if entry is not None else None
+        with self.lock:
+            self.states[timeframe] = (mtime, state)
+        return state
+
+def time_axis(state, start_row=0):
+    """
+    open_time (Unix giây) của các dòng từ start_row
+    """
+    rows = np.arange(start_row, state["rows"], dtype=np.int64)
+    return (state["start"] + rows * state["interval"]) // 1000
+
+def to_json_values(values):
+    """
+    Mảng số thành list lồng nhau cho JSON, NaN thành None
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = values.astype(object)
+    result[np.isnan(values)] = None
+    return result.tolist()
+
+def format_time(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M')
+
+def top_pairs(state, count=10):
+    """
+    Các cặp symbol có tương quan cao nhất trong cửa sổ cuối: list (symbol, symbol, tương quan)
+    """
+    correlation = np.asarray(state["correlation"])
+    upper = np.triu(np.ones(correlation.shape, dtype=bool), k=1) & ~np.isnan(correlation)
+    rows, cols = np.nonzero(upper)
+    order = np.argsort(correlation[rows, cols])[::-1][:count]
+    return [(state["symbols"][rows[i]], state["symbols"][cols[i]], float(correlation[rows[i], cols[i]]))
+            for i in order]
+
+def main():
+    parser = argparse.ArgumentParser(description="Tính và lưu return, volatility, tương quan giữa các symbol")
+    parser.add_argument('--timeframe', default='15m')
+    parser.add_argument('--symbols', help="Danh sách symbol, cách nhau bởi dấu phẩy (mặc định: mọi symbol trong config)")
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW, help="Số nến của rolling return/volatility")
+    parser.add_argument('--corr-window', type=int, default=DEFAULT_CORR_WINDOW, help="Số nến của ma trận tương quan")
+    parser.add_argument('--rebuild', action='store_true', help="Tính lại từ đầu")
+    parser.add_argument('--top', type=int, default=10, help="In các cặp tương quan cao nhất")
+    args = parser.parse_args()
+
+    symbols = [symbol.strip().upper() for symbol in args.symbols.split(',')] if args.symbols else None
+    summary = update(args.timeframe, symbols, args.window, args.corr_window, rebuild=args.rebuild)
+    print(f"{'Tính lại từ đầu' if summary['rebuild'] else 'Cập nhật'}: {summary['symbols_updated']} symbol, "
+          f"{summary['bars_read']} nến mới, {summary['rows']} dòng, tính lại từ dòng {summary['recomputed_from']}, "
+          f"{summary['seconds']}s -> {summary['path']}")
+
+    state = load_state(summary["path"])
+    last = state["start"] + (state["rows"] - 1) * state["interval"]
+    print(f"{len(state['symbols'])} symbol, đến {format_time(last)} UTC, tương quan trên {state['corr_window']} nến cuối")
+    for first, second, value in top_pairs(state, args.top):
+        print(f"  {first:<16} {second:<16} {value:+.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+"""
+Đọc dữ liệu nến từ thư mục cục bộ kèm cache trong bộ nhớ cho server.py
+
+- ConfigCache: parse config.json một lần, tự đọc lại khi mtime của file thay đổi
+- FrameCache: LRU giới hạn theo dung lượng, key (symbol, timeframe, limit), tự hết hạn khi mtime file dữ liệu đổi;
+  append() ghi thêm nến mới (do follower báo) vào các entry đang có mà không đọc lại file;
+  các lần miss đồng thời cùng key chỉ đọc file một lần (SingleFlight)
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import candle_archive
+import candle_store
+import tail_reader
+from resampler import TIMEFRAME_MS
+from single_flight import SingleFlight
+
+DATA_DIRECTORY = os.environ.get('DATA_DIRECTORY', "binance_futures_data")
+CONFIG_FILE = os.environ.get('CONFIG_FILE', "config.json")
+# Dung lượng tối đa của cache (MB)
+CACHE_MAX_MB = int(os.environ.get('CACHE_MAX_MB', 512))
+
+def csv_path(symbol, timeframe, directory=DATA_DIRECTORY):
+    return os.path.join(directory, f"binance_{symbol}_{timeframe}.csv")
+
+def store_path(symbol, timeframe, directory=DATA_DIRECTORY):
+    return os.path.join(directory, f"binance_{symbol}_{timeframe}{candle_store.STORE_SUFFIX}")
+
+def archive_path(symbol, timeframe, directory=DATA_DIRECTORY):
+    return os.path.join(directory, f"binance_{symbol}_{timeframe}{candle_archive.ARCHIVE_SUFFIX}")
+
+def resolve_source(symbol, timeframe, directory=DATA_DIRECTORY):
+    """
+    Chọn nguồn dữ liệu theo thứ tự: candle store nhị phân, archive nén, CSV
+    Store/archive chỉ được dùng khi không cũ hơn CSV (CSV là nguồn gốc)
+
+    Returns:
+    tuple: (đường dẫn, mtime) hoặc (None, None) nếu không có dữ liệu
+    """
+    candidates = []
+    for path in (store_path(symbol, timeframe, directory), archive_path(symbol, timeframe, directory),
+                 csv_path(symbol, timeframe, directory)):
+        try:
+            candidates.append((path, os.stat(path).st_mtime_ns))
+        except OSError:
+            candidates.append((path, None))
+    csv_mtime = candidates[-1][1]
+    for path, mtime in candidates:
+        if mtime is not None and (csv_mtime is None or mtime >= csv_mtime):
+            return path, mtime
+    return None, None
+
+def load_frame(path, limit=None):
+    """
+    Đọc file dữ liệu thành DataFrame (open_time/close_time dạng datetime)
+    limit: chỉ đọc `limit` nến cuối (store: dịch con trỏ, archive: chỉ giải nén các block cuối,
+    CSV: đọc ngược từ cuối file)
+    """
+    if path.endswith(candle_store.STORE_SUFFIX):
+        return candle_store.read_dataframe(path, last=limit)
+    if path.endswith(candle_archive.ARCHIVE_SUFFIX):
+        return candle_archive.read_dataframe(path, last=limit)
+    if limit is not None:
+        return tail_reader.read_tail(path, limit)
+    return pd.read_csv(path, parse_dates=['open_time', 'close_time'])
+
+def parse_time_param(value):
+    """
+    Chuyển tham số thời gian của request sang Unix ms
+    Chấp nhận Unix giây, Unix ms (>= 1e11) hoặc chuỗi ngày giờ như '2024-01-01' / '2024-01-01T12:00'
+    """
+    if value is None or value == '':
+        return None
+    try:
+        number = int(value)
+        return number if abs(number) >= 10 ** 11 else number * 1000
+    except ValueError:
+        return int(pd.Timestamp(value).value // 10 ** 6)
+
+def slice_by_time(df, start_ms=None, end_ms=None):
+    """
+    Cắt DataFrame (đã sắp xếp theo open_time) theo [start_ms, end_ms] bằng tìm kiếm nhị phân
+    """
+    open_time = df['open_time'].to_numpy('datetime64[ms]').astype(np.int64)
+    start = 0 if start_ms is None else int(np.searchsorted(open_time, start_ms, side='left'))
+    stop = len(df) if end_ms is None else int(np.searchsorted(open_time, end_ms, side='right'))
+    return df.iloc[start:max(start, stop)]
+
+class ConfigCache:
+    """
+    Giữ config.json đã parse, chỉ đọc lại khi mtime của file thay đổi
+    """
+
+    def __init__(self, path=CONFIG_FILE):
+        self.path = path
+        self.mtime = None
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return self.data
+        if mtime != self.mtime:
+            with self.lock:
+                if mtime != self.mtime:
+                    with open(self.path, 'r') as f:
+                        self.data = json.load(f)
+                    self.mtime = mtime
+        return self.data
+
+    def marketdata(self):
+        """
+        Trả về dict marketdata (key: symbol viết thường)
+        """
+        return self.get().get("exchange", {}).get("binance", {}).get("marketdata", {})
+
+class FrameCache:
+    """
+    LRU cache các DataFrame đã parse, giới hạn theo tổng dung lượng bộ nhớ
+    Mỗi entry lưu kèm mtime của file nguồn; file đổi thì entry bị đọc lại
+
+    Key là (symbol, timeframe, limit): limit=None là toàn bộ file, còn lại là `limit` nến cuối
+    được đọc bằng tail reader (không parse cả file).
+    Các request cùng key bị miss đồng thời được gộp thành một lần đọc (SingleFlight).
+    Dữ liệu đọc từ candle store là view trên memory-map chỉ đọc, nên nhiều tiến trình worker
+    dùng chung page cache của hệ điều hành thay vì mỗi tiến trình giữ một bản copy.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_MB * 1024 * 1024, directory=DATA_DIRECTORY):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.indexes = {}
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.flights = SingleFlight()
+
+    def get(self, symbol, timeframe, limit=None):
+        """
+        Lấy DataFrame của symbol/timeframe (hoặc `limit` nến cuối), trả về None nếu không có dữ liệu
+        """
+        key = (symbol, timeframe, limit)
+        path, mtime = resolve_source(symbol, timeframe, self.directory)
+        if path is None:
+            self.invalidate(symbol, timeframe)
+            return None
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == (path, mtime):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            # Đã có toàn bộ file trong cache: cắt phần cuối, không cần đọc lại
+            full = self.entries.get((symbol, timeframe, None))
+            if limit is not None and full is not None and full[0] == (path, mtime):
+                self.entries.move_to_end((symbol, timeframe, None))
+                self.hits += 1
+                return full[1].tail(limit)
+            self.misses += 1
+
+        return self.flights.do(('get', key, path, mtime), self._load, key, path, mtime)
+
+    def _load(self, key, path, mtime):
+        df = load_frame(path, key[2])
+        self.put(key, (path, mtime), df)
+        return df
+
+    def get_range(self, symbol, timeframe, start_ms=None, end_ms=None):
+        """
+        Lấy các nến có open_time trong [start_ms, end_ms] (ms), trả về None nếu không có dữ liệu
+
+        - Toàn bộ file đã có trong cache: tìm kiếm nhị phân trên cột open_time trong bộ nhớ
+        - Store nhị phân: tìm kiếm nhị phân trên cột open_time đã memory-map
+        - Archive nén: tìm kiếm nhị phân trên index các block, chỉ giải nén các block chứa khoảng cần đọc
+        - CSV: tìm kiếm nhị phân trên sparse index (.idx) rồi chỉ đọc đoạn byte cần thiết
+        Kết quả không được đưa vào cache vì mỗi khoảng thời gian là khác nhau
+        """
+        path, mtime = resolve_source(symbol, timeframe, self.directory)
+        if path is None:
+            self.invalidate(symbol, timeframe)
+            return None
+
+        with self.lock:
+            full = self.entries.get((symbol, timeframe, None))
+            if full is not None and full[0] == (path, mtime):
+                self.entries.move_to_end((symbol, timeframe, None))
+                self.hits += 1
+                return slice_by_time(full[1], start_ms, end_ms)
+            self.misses += 1
+
+        return self.flights.do(('range', symbol, timeframe, start_ms, end_ms, path, mtime),
+                               self._load_range, path, start_ms, end_ms)
+
+    def _load_range(self, path, start_ms, end_ms):
+        if path.endswith(candle_store.STORE_SUFFIX):
+            return candle_store.read_range(path, start_ms, end_ms)
+        if path.endswith(candle_archive.ARCHIVE_SUFFIX):
+            return candle_archive.read_range(path, start_ms, end_ms)
+        return tail_reader.read_range(path, start_ms, end_ms, self.get_index(path))
+
+    def get_index(self, path):
+        """
+        Lấy sparse index của file CSV (giữ trong bộ nhớ, cập nhật khi file được ghi thêm)
+        """
+        with self.lock:
+            index = self.indexes.get(path)
+        if index is None or os.path.getsize(path) != index.file_size:
+            index = tail_reader.refresh_index(path)
+            with self.lock:
+                self.indexes[path] = index
+        return index
+
+    def put(self, key, version, df):
+        size = int(df.memory_usage(index=True, deep=False).sum())
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+            self.entries[key] = (version, df, size)
+            self.total_bytes += size
+            # Loại các entry ít dùng nhất cho tới khi nằm trong giới hạn (luôn giữ entry vừa thêm)
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def append(self, symbol, timeframe, rows):
+        """
+        Ghi thêm các nến mới (đã được ghi vào file) vào mọi entry của symbol/timeframe đang có trong cache
+
+        Entry được cập nhật theo mtime hiện tại của file nên lần get() sau vẫn là cache hit.
+        Entry không nối tiếp được (thiếu nến ở giữa, nguồn dữ liệu đổi) thì bị bỏ để đọc lại khi cần.
+
+        Returns:
+        int: Số entry đã cập nhật
+        """
+        path, mtime = resolve_source(symbol, timeframe, self.directory)
+        if path is None or len(rows) == 0:
+            return 0
+        new_open_time = rows['open_time'].to_numpy('datetime64[ms]').astype(np.int64)
+        interval = TIMEFRAME_MS.get(timeframe)
+        with self.lock:
+            entries = [(key, entry) for key, entry in self.entries.items() if key[:2] == (symbol, timeframe)]
+
+        updated = 0
+        for key, (version, df, _) in entries:
+            last = df['open_time'].to_numpy('datetime64[ms]').astype(np.int64)[-1] if len(df) else None
+            fresh = new_open_time > last if last is not None else np.ones(len(rows), dtype=bool)
+            if version[0] != path or interval is None or last is None or \
+                    (fresh.any() and new_open_time[fresh][0] != last + interval):
+                with self.lock:
+                    if self.entries.get(key, (None,))[0] == version:
+                        self.total_bytes -= self.entries.pop(key)[2]
+                continue
+            if fresh.any():
+                df = pd.concat([df, rows.loc[fresh, df.columns]], ignore_index=True)
+                if key[2] is not None:
+                    df = df.tail(key[2])
+            self.put(key, (path, mtime), df)
+            updated += 1
+        return updated
+
+    def invalidate(self, symbol, timeframe):
+        with self.lock:
+            for key in [key for key in self.entries if key[:2] == (symbol, timeframe)]:
+                self.total_bytes -= self.entries.pop(key)[2]
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "coalesced": self.flights.coalesced,
+            }
@@ -0,0 +1,147 @@
+"""
+Lập kế hoạch tải chính xác đến từng mili giây cho binance.py
+
+- exchangeInfo được lưu cache vào EXCHANGE_INFO_CACHE, chỉ gọi lại API khi cache cũ hơn EXCHANGE_INFO_TTL giây
+  (hoặc khi đổi địa chỉ API); nếu gọi lỗi thì dùng tạm bản cache cũ
+- Khoảng còn thiếu của một (symbol, timeframe) là [open_time cuối đã lưu + interval, nến đã đóng gần nhất]
+- Symbol chưa có dữ liệu bắt đầu từ slot chứa symbolDesc.onboardDate,
+  không cần hỏi API nến đầu tiên
+- Khoảng được chia thành các trang có số nến đều nhau; tham số limit của mỗi trang bằng đúng số nến cần,
+  nên các lần cập nhật ngắn dùng được bậc weight thấp của /fapi/v1/klines
+"""
+import json
+import os
+import time
+
+import requests
+
+from metrics import registry as metrics
+from rate_limiter import get_klines_weight
+
+# File cache của exchangeInfo và thời gian sống (giây)
+EXCHANGE_INFO_CACHE = "exchange_info.json"
+EXCHANGE_INFO_TTL = int(os.environ.get('BINANCE_EXCHANGE_INFO_TTL', 3600))
+# Chỉ coi một nến là đã đóng sau khi qua close_time thêm một khoảng này (ms), phòng lệch đồng hồ với server
+CLOSE_GRACE_MS = int(os.environ.get('BINANCE_CLOSE_GRACE_MS', 5000))
+
+def current_time_ms():
+    return int(time.time() * 1000)
+
+def read_exchange_info_cache(path=EXCHANGE_INFO_CACHE):
+    """
+    Returns:
+    dict: {"url", "fetched_at" (giây), "data"}, hoặc None nếu chưa có hoặc file hỏng
+    """
+    try:
+        with open(path, 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or "data" not in cached:
+        return None
+    return cached
+
+def write_exchange_info_cache(data, base_url, path=EXCHANGE_INFO_CACHE):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump({"url": base_url, "fetched_at": time.time(), "data": data}, f)
+    os.replace(temp_path, path)
+
+def load_exchange_info(base_url, path=EXCHANGE_INFO_CACHE, ttl=EXCHANGE_INFO_TTL, refresh=False, session=None):
+    """
+    exchangeInfo của base_url, lấy từ cache nếu còn hạn
+
+    Parameters:
+    base_url (str): Địa chỉ API (cache của địa chỉ khác không được dùng)
+    path (str): File cache (None để không dùng cache)
+    ttl (float): Thời gian sống của cache (giây)
+    refresh (bool): Bỏ qua cache còn hạn, luôn gọi API
+
+    Returns:
+    tuple: (data, nguồn "cache" | "api" | "stale")
+    """
+    cached = read_exchange_info_cache(path) if path else None
+    if cached is not None and cached.get("url") != base_url:
+        cached = None
+    if cached is not None and not refresh and time.time() - cached.get("fetched_at", 0) < ttl:
+        metrics.inc('exchange_info', source='cache')
+        return cached["data"], "cache"
+
+    try:
+        with metrics.timer('stage', stage='exchange_info'):
+            response = (session or requests).get(f'{base_url}/fapi/v1/exchangeInfo', timeout=30)
+            response.raise_for_status()
+            data = response.json()
+    except (requests.RequestException, ValueError):
+        if cached is None:
+            raise
+        # API lỗi: dùng bản cache đã hết hạn còn hơn dừng cả lần chạy
+        metrics.inc('exchange_info', source='stale')
+        return cached["data"], "stale"
+
+    metrics.inc('exchange_info', source='api')
+    if path:
+        try:
+            write_exchange_info_cache(data, base_url, path)
+        except OSError:
+            pass
+    return data, "api"
+
+def first_open_slot(onboard_time, interval_ms):
+    """
+    open_time của nến đầu tiên trên sàn: slot chứa onboardDate (ms), vì symbol có thể niêm yết giữa một nến
+    """
+    return int(onboard_time) // interval_ms * interval_ms
+
+def last_closed_time(now, interval_ms, grace_ms=CLOSE_GRACE_MS):
+    """
+    close_time (ms) của nến đã đóng gần nhất tại thời điểm `now`
+    """
+    return (now - grace_ms) // interval_ms * interval_ms - 1
+
+def missing_range(last_open_time, onboard_time, interval_ms, now, grace_ms=CLOSE_GRACE_MS):
+    """
+    Khoảng [start, end] (ms) còn thiếu của một (symbol, timeframe)
+
+    Parameters:
+    last_open_time (int): open_time cuối đã lưu, None nếu chưa có dữ liệu
+    onboard_time (int): onboardDate của symbol, None nếu không biết
+
+    Returns:
+    tuple: (start, end); start là None nếu phải hỏi API nến đầu tiên; None nếu không còn nến đã đóng nào để tải
+    """
+    end = last_closed_time(now, interval_ms, grace_ms)
+    if last_open_time is not None:
+        start = int(last_open_time) + interval_ms
+    elif onboard_time is not None:
+        start = first_open_slot(onboard_time, interval_ms)
+    else:
+        return None, end
+    if start > end:
+        return None
+    return start, end
+
+def split_pages(start_time, end_time, interval_ms, limit):
+    """
+    Chia các nến có open_time trong [start_time, end_time] thành ít trang nhất (mỗi trang tối đa `limit` nến),
+    số nến giữa các trang chênh nhau không quá một
+
+    Returns:
+    list: (page_start, page_end, page_limit)
+    """
+    count = (end_time - start_time) // interval_ms + 1
+    if count <= 0:
+        return []
+    pages = -(-count // limit)
+    base, extra = divmod(count, pages)
+    windows = []
+    page_start = start_time
+    for index in range(pages):
+        size = base + (1 if index < extra else 0)
+        page_end = min(page_start + size * interval_ms - 1, end_time)
+        windows.append((page_start, page_end, size))
+        page_start += size * interval_ms
+    return windows
+
+def pages_weight(windows):
+    return sum(get_klines_weight(size) for _, _, size in windows)
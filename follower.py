@@ -0,0 +1,377 @@
+"""
+Chế độ chạy liên tục: giữ dữ liệu luôn mới bằng stream kline của Binance Futures thay vì chạy lại binance.py
+
+1. Bắt kịp một lần qua REST (download_many) từ open_time cuối cùng của mỗi symbol tới thời gian hiện tại
+   của server (/fapi/v1/time), chỉ lấy các nến đã đóng
+2. Đăng ký combined stream <symbol>@kline_<timeframe> cho mọi symbol đang theo dõi (tối đa
+   MAX_STREAMS_PER_CONNECTION stream mỗi kết nối). Các nến đã đóng (x=true) đến cùng lúc được gom trong
+   FLUSH_DELAY giây rồi ghi một lần: CSV, candle store (và archive nếu bật), metadata trong một transaction,
+   sau đó xuất lại config.json
+3. Báo cho server (POST /api/bars) các nến vừa ghi để cache cập nhật tại chỗ, không phải đọc lại file
+4. Với --analytics: cập nhật số liệu liên symbol (cross_analytics.py) cho các nến vừa ghi
+
+Nếu nến nhận được không nối tiếp nến cuối đã lưu (mất kết nối, khởi động lại) thì đoạn thiếu được tải bù
+qua REST trước khi ghi. Stream bị ngắt (Binance đóng mỗi kết nối sau 24 giờ) thì tự kết nối lại.
+
+Chạy: python follower.py --notify http://127.0.0.1:5000
+Offline: python replay_stream.py --seed /tmp/follower_run, rồi trong /tmp/follower_run (dữ liệu của follower
+         phải kết thúc trước đồng hồ phát lại, xem replay_stream.py):
+         BINANCE_FAPI_URL=http://127.0.0.1:8081 BINANCE_FSTREAM_URL=ws://127.0.0.1:8765 python <repo>/follower.py
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+import binance
+import cross_analytics
+from kline_ingest import dataframe_to_page, pages_to_dataframe
+from metadata_store import METADATA_DB, open_store
+from rate_limiter import WeightRateLimiter
+from websocket_io import WebSocketError, connect
+
+BINANCE_FSTREAM_URL = os.environ.get('BINANCE_FSTREAM_URL', 'wss://fstream.binance.com')
+# Binance cho phép tối đa 200 stream trên một kết nối
+MAX_STREAMS_PER_CONNECTION = 200
+# Thời gian gom các nến đóng cùng lúc của nhiều symbol trước khi ghi (giây)
+FLUSH_DELAY = 1.0
+# Không nhận được gì trong khoảng này thì coi như kết nối đã chết (giây)
+RECV_TIMEOUT = 120
+MAX_RECONNECT_DELAY = 60
+NOTIFY_TIMEOUT = 5
+# Số lần liên tiếp tải bù thất bại (không phủ hết khoảng thiếu) trước khi chấp nhận khoảng trống
+MAX_BACKFILL_ATTEMPTS = 5
+
+def get_server_time(session):
+    """
+    Thời gian hiện tại của server (ms), dùng giờ máy nếu không hỏi được
+    """
+    try:
+        response = session.get(f"{binance.BINANCE_FAPI_URL}/fapi/v1/time", timeout=10)
+        response.raise_for_status()
+        return int(response.json()["serverTime"])
+    except (requests.RequestException, ValueError, KeyError):
+        return int(time.time() * 1000)
+
+def kline_to_row(kline):
+    """
+    Đổi phần "k" của message kline thành một dòng theo thứ tự cột của API klines
+    """
+    return [kline["t"], float(kline["o"]), float(kline["h"]), float(kline["l"]), float(kline["c"]),
+            float(kline["v"]), kline["T"], float(kline["q"]), kline["n"], float(kline["V"]),
+            float(kline["Q"]), float(kline.get("B", 0))]
+
+def stream_url(symbols, timeframe, base_url=BINANCE_FSTREAM_URL):
+    streams = '/'.join(f"{symbol.lower()}@kline_{timeframe}" for symbol in symbols)
+    return f"{base_url}/stream?streams={streams}"
+
+class KlineFollower:
+    """
+    Theo dõi các symbol qua stream kline và ghi nến mới vào thư mục dữ liệu
+
+    Chỉ luồng chính (run) ghi file và metadata; các luồng stream chỉ đưa nến đã đóng vào hàng đợi.
+    """
+
+    def __init__(self, metadata, timeframe='15m', symbols=None, notify_url=None, archive=False,
+                 stream_base=BINANCE_FSTREAM_URL, workers=binance.DOWNLOAD_WORKERS, analytics=False):
+        self.metadata = metadata
+        self.timeframe = timeframe
+        self.symbols = list(symbols or metadata.tracked_symbols(timeframe))
+        self.notify_url = notify_url
+        self.archive = archive
+        self.stream_base = stream_base
+        self.workers = workers
+        self.analytics = analytics
+        self.interval = binance.get_interval_ms(timeframe)
+        self.session = binance.create_session(workers)
+        self.limiter = WeightRateLimiter()
+        self.last_open = {symbol: self.load_last_open_time(symbol) for symbol in self.symbols}
+        self.queue = queue.Queue()
+        # Nến stream chưa ghi được vì khoảng thiếu phía trước chưa tải bù xong: {symbol: [row, ...]}
+        self.pending = {}
+        self.backfill_failures = {}
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.sockets = set()
+        self.stats = {"bars": 0, "flushes": 0, "backfilled": 0, "reconnects": 0, "notified": 0,
+                      "analytics": 0, "backfill_retries": 0}
+
+    def load_last_open_time(self, symbol):
+        """
+        open_time (ms) của nến cuối đã lưu: lấy từ metadata, nếu chưa có thì đọc cuối file CSV
+        """
+        coverage = self.metadata.get_coverage(symbol, self.timeframe)
+        if coverage is not None and coverage.get("last_open_time") is not None:
+            return int(coverage["last_open_time"])
+        filename = f"{binance.DATA_DIRECTORY}/binance_{symbol}_{self.timeframe}.csv"
+        if os.path.exists(filename):
+            last = binance.get_last_open_time(filename)
+            if last is not None:
+                return int(last.value // 10 ** 6)
+        return None
+
+    def download(self, tasks, now):
+        """
+        Tải các đoạn (symbol, timeframe, start, end, info) qua REST, chỉ giữ nến đã đóng trước `now`
+
+        Returns:
+        dict: {symbol: DataFrame}
+        """
+        frames = {}
+        if not tasks:
+            return frames
+        for task, df in binance.download_many(tasks, self.workers, self.limiter, self.session):
+            if df is None:
+                continue
+            df = df[df['close_time'] < pd.Timestamp(now, unit='ms')]
+            if len(df):
+                frames[task[0]] = df
+        return frames
+
+    def catch_up(self):
+        """
+        Tải qua REST các nến đã đóng từ nến cuối đã lưu tới hiện tại
+        """
+        now = get_server_time(self.session)
+        tasks = []
+        for symbol in self.symbols:
+            last = self.last_open[symbol]
+            start = None if last is None else last + self.interval
+            # Nến kế tiếp chưa đóng thì không cần tải
+            if start is not None and start + self.interval > now:
+                continue
+            tasks.append((symbol, self.timeframe, start, now, self.metadata.get_symbol_desc(symbol)))
+        print(f"Bắt kịp qua REST: {len(tasks)}/{len(self.symbols)} symbol cần tải thêm")
+        frames = self.download(tasks, now)
+        self.stats["backfilled"] += sum(len(df) for df in frames.values())
+        self.write(frames)
+
+    def write(self, frames):
+        """
+        Ghi các nến mới hơn nến cuối đã lưu vào file và metadata (một transaction), rồi báo cho server
+        """
+        written = {}
+        with self.metadata.batch():
+            for symbol, df in frames.items():
+                last = self.last_open.get(symbol)
+                open_time = df['open_time'].to_numpy('datetime64[ms]').astype(np.int64)
+                if last is not None:
+                    df = df[open_time > last]
+                    open_time = open_time[open_time > last]
+                if df.empty:
+                    continue
+                binance.save_downloaded_data(df, symbol, self.timeframe, self.metadata.get_symbol_desc(symbol),
+                                             self.metadata, self.archive)
+                self.last_open[symbol] = int(open_time[-1])
+                written[symbol] = df
+        if not written:
+            return written
+        binance.export_config(self.metadata)
+        self.stats["bars"] += sum(len(df) for df in written.values())
+        self.stats["flushes"] += 1
+        self.notify(written)
+        self.update_analytics(list(written))
+        return written
+
+    def update_analytics(self, symbols):
+        """
+        Cập nhật số liệu liên symbol từ các nến vừa ghi (chỉ tính lại phần đuôi mới)
+        """
+        if not self.analytics:
+            return
+        try:
+            cross_analytics.update(self.timeframe, symbols)
+            self.stats["analytics"] += 1
+        except (OSError, ValueError) as e:
+            # Lần ghi sau sẽ tính lại từ dòng cuối đã lưu, nên chỉ cần báo lỗi
+            print(f"Không cập nhật được số liệu liên symbol: {e}")
+
+    def notify(self, written):
+        """
+        Gửi các nến vừa ghi tới server (POST /api/bars) để cache cập nhật tại chỗ
+        """
+        if not self.notify_url:
+            return
+        payload = {
+            "timeframe": self.timeframe,
+            "bars": {symbol: dataframe_to_page(df).tolist() for symbol, df in written.items()},
+        }
+        try:
+            response = requests.post(f"{self.notify_url}/api/bars", json=payload, timeout=NOTIFY_TIMEOUT)
+            response.raise_for_status()
+            self.stats["notified"] += 1
+        except requests.RequestException as e:
+            # Server sẽ tự đọc lại file khi thấy mtime đổi, nên chỉ cần báo lỗi
+            print(f"Không báo được cho server {self.notify_url}: {e}")
+
+    def flush(self, batch):
+        """
+        Ghi một lô nến đã đóng từ stream, tải bù qua REST nếu có symbol bị thiếu nến ở giữa
+        """
+        rows_by_symbol = {symbol: rows for symbol, rows in self.pending.items()}
+        self.pending = {}
+        for symbol, row in batch:
+            if symbol in self.last_open:
+                rows_by_symbol.setdefault(symbol, []).append(row)
+
+        pages = {}
+        gaps = []
+        for symbol, rows in rows_by_symbol.items():
+            # Nến chờ từ lần trước có thể trùng nến vừa nhận
+            rows = list({row[0]: row for row in rows}.values())
+            page = np.array(sorted(rows, key=lambda row: row[0]), dtype=np.float64)
+            first = int(page[0][0])
+            last = self.last_open[symbol]
+            if last is not None and first > last + self.interval:
+                gaps.append((symbol, self.timeframe, last + self.interval, first - 1,
+                             self.metadata.get_symbol_desc(symbol)))
+            pages[symbol] = page
+
+        backfill = self.download(gaps, get_server_time(self.session)) if gaps else {}
+        if gaps:
+            self.stats["backfilled"] += sum(len(df) for df in backfill.values())
+            print(f"Tải bù {sum(len(df) for df in backfill.values())} nến bị thiếu của {len(gaps)} symbol")
+        frames = {}
+        for symbol, _, start, end, _ in gaps:
+            if self.backfill_covers(backfill.get(symbol), end):
+                self.backfill_failures.pop(symbol, None)
+                continue
+            failures = self.backfill_failures.get(symbol, 0) + 1
+            if failures < MAX_BACKFILL_ATTEMPTS:
+                # Chỉ ghi phần tải bù liên tục (nếu có), giữ nến stream lại để tải bù tiếp ở lần ghi sau
+                self.backfill_failures[symbol] = failures
+                self.pending[symbol] = [row.tolist() for row in pages.pop(symbol)]
+                if symbol in backfill:
+                    frames[symbol] = backfill.pop(symbol)
+                self.stats["backfill_retries"] += 1
+                print(f"{symbol}: chưa tải bù đủ khoảng thiếu, thử lại ở lần ghi sau ({failures}/{MAX_BACKFILL_ATTEMPTS})")
+                continue
+            self.backfill_failures.pop(symbol, None)
+            print(f"{symbol}: không tải bù được khoảng thiếu sau {MAX_BACKFILL_ATTEMPTS} lần, "
+                  f"ghi tiếp nến mới (chạy integrity.py để sửa khoảng trống)")
+        for symbol, page in pages.items():
+            df = pages_to_dataframe([page])
+            if symbol in backfill:
+                df = pd.concat([backfill[symbol], df], ignore_index=True)
+            frames[symbol] = df
+        return self.write(frames)
+
+    def backfill_covers(self, df, end):
+        """
+        Đoạn tải bù có tới nến cuối cùng trước nến stream đầu tiên không (open_time = end + 1 - interval)
+        """
+        if df is None or df.empty:
+            return False
+        last = int(df['open_time'].to_numpy('datetime64[ms]').astype(np.int64)[-1])
+        return last >= end + 1 - self.interval
+
+    def stream_loop(self, symbols):
+        """
+        Nhận stream của một nhóm symbol, tự kết nối lại khi bị ngắt
+        """
+        url = stream_url(symbols, self.timeframe, self.stream_base)
+        delay = 1
+        while not self.stop_event.is_set():
+            try:
+                ws = connect(url, timeout=RECV_TIMEOUT)
+            except (OSError, WebSocketError) as e:
+                print(f"Không kết nối được stream: {e}, thử lại sau {delay}s")
+                self.stop_event.wait(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                continue
+            delay = 1
+            self.sockets.add(ws)
+            try:
+                while not self.stop_event.is_set():
+                    message = ws.recv()
+                    if message is None:
+                        break
+                    data = json.loads(message).get("data", {})
+                    kline = data.get("k")
+                    if data.get("e") == "kline" and kline and kline.get("x"):
+                        self.queue.put((kline["s"], kline_to_row(kline)))
+            except (OSError, WebSocketError, ValueError) as e:
+                if not self.stop_event.is_set():
+                    print(f"Stream bị ngắt: {e}")
+            finally:
+                self.sockets.discard(ws)
+                ws.close()
+            if not self.stop_event.is_set():
+                self.stats["reconnects"] += 1
+                self.stop_event.wait(delay)
+
+    def start_streams(self):
+        for start in range(0, len(self.symbols), MAX_STREAMS_PER_CONNECTION):
+            chunk = self.symbols[start:start + MAX_STREAMS_PER_CONNECTION]
+            thread = threading.Thread(target=self.stream_loop, args=(chunk,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def run(self, duration=None):
+        """
+        Bắt kịp qua REST rồi theo stream cho tới khi bị dừng (Ctrl+C, stop() hoặc hết `duration` giây)
+        """
+        self.catch_up()
+        self.start_streams()
+        print(f"Đang theo dõi {len(self.symbols)} symbol ({self.timeframe}) qua {len(self.threads)} kết nối stream")
+        deadline = time.monotonic() + duration if duration else None
+        try:
+            while not self.stop_event.is_set() and (deadline is None or time.monotonic() < deadline):
+                try:
+                    batch = [self.queue.get(timeout=1.0)]
+                except queue.Empty:
+                    continue
+                # Gom các nến đóng cùng thời điểm của các symbol khác
+                flush_at = time.monotonic() + FLUSH_DELAY
+                while (remaining := flush_at - time.monotonic()) > 0:
+                    try:
+                        batch.append(self.queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                written = self.flush(batch)
+                print(f"Đã ghi {sum(len(df) for df in written.values())} nến của {len(written)} symbol")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.stop_event.set()
+        for ws in list(self.sockets):
+            ws.close()
+        for thread in self.threads:
+            thread.join(timeout=5)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Theo dõi stream kline và ghi nến mới liên tục")
+    parser.add_argument('--timeframe', default='15m')
+    parser.add_argument('--symbols', help="Danh sách symbol, cách nhau bởi dấu phẩy (mặc định: mọi symbol đã có dữ liệu)")
+    parser.add_argument('--notify', help="URL của server.py để báo nến mới, VD: http://127.0.0.1:5000")
+    parser.add_argument('--archive', action='store_true', default=binance.ARCHIVE_ENABLED,
+                        help="Ghi thêm archive nén (.ohlcz)")
+    parser.add_argument('--workers', type=int, default=binance.DOWNLOAD_WORKERS, help="Số luồng tải REST")
+    parser.add_argument('--duration', type=float, help="Dừng sau số giây này (mặc định chạy mãi)")
+    parser.add_argument('--analytics', action='store_true',
+                        help="Cập nhật số liệu liên symbol (cross_analytics.py) sau mỗi lần ghi")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    metadata = open_store(METADATA_DB, binance.CONFIG_FILE)
+    symbols = [symbol.strip().upper() for symbol in args.symbols.split(',')] if args.symbols else None
+    follower = KlineFollower(metadata, args.timeframe, symbols, args.notify, args.archive, workers=args.workers,
+                             analytics=args.analytics)
+    try:
+        follower.run(args.duration)
+    finally:
+        metadata.close()
+    print(f"Kết thúc: {follower.stats}")
+
+if __name__ == '__main__':
+    main()
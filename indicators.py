@@ -0,0 +1,264 @@
+"""
+Các chỉ báo kỹ thuật tính trên mảng NumPy, cho kết quả giống hệt các hàm trong backtest.html
+(calculateSMA, calculateEMA, calculateLWMA, calculateCustomLWMA, calculateDonchian)
+
+Các phép cộng được thực hiện đúng thứ tự như bản JavaScript để kết quả trùng khớp tới từng bit.
+Mỗi hàm trả về mảng cùng độ dài với dữ liệu vào, các vị trí chưa đủ dữ liệu là NaN.
+
+Phía dưới là các lớp tính tăng dần (SMA, EMA, LWMA, Donchian): nhận từng nến một và cập nhật
+giá trị trong O(1) (khấu hao), dùng cho server hoặc tiến trình chạy liên tục khi có nến 15m mới
+mà không phải tính lại toàn bộ lịch sử. Gọi update() lần lượt trên cả chuỗi cho ra đúng mảng
+của hàm batch tương ứng (LWMA trọng số tuyến tính khớp tới sai số làm tròn, xem lớp LWMA).
+"""
+from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def sma(values, period):
+    """
+    Trung bình cộng trượt (cộng dồn rồi trừ phần tử rơi khỏi cửa sổ như calculateSMA)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if period < 1 or len(values) < period:
+        return out
+
+    data = values.tolist()
+    total = 0.0
+    for i in range(period):
+        total += data[i]
+    out[period - 1] = total / period
+    for i in range(period, len(data)):
+        total = total - data[i - period] + data[i]
+        out[i] = total / period
+    return out
+
+def ema(values, period):
+    """
+    EMA khởi tạo bằng SMA của `period` giá trị đầu (như calculateEMA)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if period < 2 or len(values) < period:
+        return out
+
+    k = 2 / (period + 1)
+    data = values.tolist()
+    total = 0.0
+    for i in range(period):
+        total += data[i]
+    last = total / period
+    result = [last]
+    for i in range(period, len(data)):
+        last = data[i] * k + last * (1 - k)
+        result.append(last)
+    out[period - 1:] = result
+    return out
+
+def weighted_ma(values, weights):
+    """
+    Trung bình có trọng số: weights[0] áp dụng cho giá trị hiện tại, weights[1] cho giá trị trước đó...
+    (như calculateCustomLWMA)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    weights = [float(w) for w in weights]
+    period = len(weights)
+    out = np.full(len(values), np.nan)
+    weight_sum = 0.0
+    for w in weights:
+        weight_sum += w
+    if period < 2 or len(values) < period or weight_sum == 0:
+        return out
+
+    n = len(values)
+    # Cộng theo đúng thứ tự j = 0..period-1 cho mọi vị trí cùng lúc
+    total = np.zeros(n - period + 1)
+    for j, w in enumerate(weights):
+        total = total + values[period - 1 - j:n - j] * w
+    out[period - 1:] = total / weight_sum
+    return out
+
+def lwma(values, period):
+    """
+    LWMA với trọng số period, period-1, ..., 1 (như calculateLWMA)
+    """
+    if period < 2:
+        return np.full(len(values), np.nan)
+    # Tổng trọng số bằng period * (period + 1) / 2 như calculateLWMA
+    return weighted_ma(values, [period - j for j in range(period)])
+
+def donchian(high, low, period):
+    """
+    Kênh Donchian gồm cả nến hiện tại (như calculateDonchian)
+
+    Returns:
+    tuple: (upper, middle, lower)
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    n = len(high)
+    upper = np.full(n, np.nan)
+    lower = np.full(n, np.nan)
+    if period < 2 or n < period:
+        return upper, upper.copy(), lower
+
+    upper[period - 1:] = sliding_window_view(high, period).max(axis=1)
+    lower[period - 1:] = sliding_window_view(low, period).min(axis=1)
+    middle = (upper + lower) / 2
+    return upper, middle, lower
+
+def parse_weights(text):
+    """
+    Đọc chuỗi trọng số 'a,b,c' như ô lwmaWeightsInput (bỏ qua phần tử không phải số)
+    """
+    weights = []
+    for part in (text or '').split(','):
+        try:
+            weights.append(float(part.strip()))
+        except ValueError:
+            continue
+    return weights
+
+class SMA:
+    """
+    SMA tăng dần: cộng giá trị mới, trừ giá trị rơi khỏi cửa sổ (cùng thứ tự phép tính với sma())
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+        self.value = np.nan
+
+    def update(self, value):
+        value = float(value)
+        self.window.append(value)
+        if len(self.window) <= self.period:
+            self.total += value
+            if len(self.window) == self.period:
+                self.value = self.total / self.period
+            return self.value
+
+        self.total = self.total - self.window.popleft() + value
+        self.value = self.total / self.period
+        return self.value
+
+class EMA:
+    """
+    EMA tăng dần, khởi tạo bằng SMA của `period` giá trị đầu (như ema())
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.k = 2 / (period + 1)
+        self.count = 0
+        self.total = 0.0
+        self.value = np.nan
+
+    def update(self, value):
+        value = float(value)
+        self.count += 1
+        if self.count < self.period:
+            self.total += value
+        elif self.count == self.period:
+            self.total += value
+            self.value = self.total / self.period
+        else:
+            self.value = value * self.k + self.value * (1 - self.k)
+        return self.value
+
+class LWMA:
+    """
+    Trung bình có trọng số tăng dần
+
+    - Trọng số tuyến tính (chỉ truyền period): O(1) mỗi nến nhờ công thức truy hồi
+      tử số mới = tử số cũ + period * x_mới - tổng cửa sổ cũ. Kết quả khớp lwma() tới sai số làm tròn;
+      tử số được tính lại chính xác mỗi RESYNC_EVERY nến để sai số không tích lũy.
+    - Trọng số tùy chỉnh (weights[0] cho nến hiện tại): không có công thức truy hồi,
+      mỗi nến tốn O(len(weights)) và cho kết quả giống hệt weighted_ma().
+    """
+
+    RESYNC_EVERY = 1024
+
+    def __init__(self, period=None, weights=None):
+        if weights is not None and len(weights) > 1:
+            self.weights = [float(w) for w in weights]
+            self.linear = False
+        else:
+            self.weights = [float(period - j) for j in range(period)]
+            self.linear = True
+        self.period = len(self.weights)
+        self.weight_sum = 0.0
+        for w in self.weights:
+            self.weight_sum += w
+        self.window = deque(maxlen=self.period)
+        self.numerator = 0.0
+        self.window_sum = 0.0
+        self.since_resync = 0
+        self.value = np.nan
+
+    def _exact_numerator(self):
+        # Cộng theo thứ tự từ nến mới nhất như weighted_ma()
+        total = 0.0
+        for j, w in enumerate(self.weights):
+            total += self.window[-1 - j] * w
+        return total
+
+    def update(self, value):
+        value = float(value)
+        full_before = len(self.window) == self.period
+        oldest = self.window[0] if full_before else 0.0
+        self.window.append(value)
+        if len(self.window) < self.period or self.weight_sum == 0:
+            return self.value
+
+        if not self.linear or not full_before or self.since_resync >= self.RESYNC_EVERY:
+            self.numerator = self._exact_numerator()
+            self.window_sum = sum(self.window)
+            self.since_resync = 0
+        else:
+            self.numerator = self.numerator + self.period * value - self.window_sum
+            self.window_sum = self.window_sum + value - oldest
+            self.since_resync += 1
+        self.value = self.numerator / self.weight_sum
+        return self.value
+
+class Donchian:
+    """
+    Kênh Donchian tăng dần bằng hai deque đơn điệu (max của high, min của low), O(1) khấu hao mỗi nến
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.index = -1
+        self.highs = deque()
+        self.lows = deque()
+        self.upper = np.nan
+        self.middle = np.nan
+        self.lower = np.nan
+
+    def update(self, high, low):
+        high = float(high)
+        low = float(low)
+        self.index += 1
+
+        while self.highs and self.highs[-1][1] <= high:
+            self.highs.pop()
+        self.highs.append((self.index, high))
+        while self.lows and self.lows[-1][1] >= low:
+            self.lows.pop()
+        self.lows.append((self.index, low))
+
+        # Bỏ các phần tử đã rơi khỏi cửa sổ
+        window_start = self.index - self.period + 1
+        if self.highs[0][0] < window_start:
+            self.highs.popleft()
+        if self.lows[0][0] < window_start:
+            self.lows.popleft()
+
+        if self.period >= 2 and self.index >= self.period - 1:
+            self.upper = self.highs[0][1]
+            self.lower = self.lows[0][1]
+            self.middle = (self.upper + self.lower) / 2
+        return self.upper, self.middle, self.lower
@@ -0,0 +1,294 @@
+"""
+Kiểm tra tính liên tục của các file nến trong binance_futures_data và sửa các đoạn bị thiếu
+
+- Quét: đọc cột open_time của mọi file CSV (parse trực tiếp các chữ số bằng NumPy, không qua pandas),
+  dùng np.diff để tìm các khe bị thiếu, nến trùng, nến sai thứ tự và nến không thẳng hàng với timeframe;
+  nếu metadata có onboardDate thì kiểm tra cả phần lịch sử bị cắt ở đầu file
+- Báo cáo: ghi ra file JSON (mặc định gap_report.json)
+- Sửa (--repair): chỉ tải lại đúng các khoảng bị thiếu bằng engine tải đồng thời, ghép vào file,
+  bỏ nến trùng, sắp xếp lại rồi ghi lại CSV, candle store, archive (nếu có), sparse index và metadata
+
+Các khe vẫn còn sau khi sửa thường là khoảng sàn không có dữ liệu (bảo trì).
+
+Chạy: python integrity.py                  (quét và ghi báo cáo)
+      python integrity.py --repair --workers 8
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import binance
+from candle_archive import ARCHIVE_SUFFIX, hints_from_symbol_desc, write_archive
+from candle_store import STORE_SUFFIX, write_store
+from download_planner import first_open_slot
+from metadata_store import METADATA_DB, open_store
+from rate_limiter import WeightRateLimiter
+from tail_reader import build_sparse_index, index_path_for_csv, save_sparse_index
+
+DATA_DIRECTORY = binance.DATA_DIRECTORY
+REPORT_FILE = "gap_report.json"
+# 'YYYY-mm-dd HH:MM:SS'
+TIMESTAMP_WIDTH = 19
+
+def _days_from_civil(year, month, day):
+    # Số ngày kể từ 1970-01-01 của lịch Gregory (thuật toán days_from_civil), tính trên cả mảng
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+def parse_open_times(data):
+    """
+    Lấy open_time (ms) ở đầu mỗi dòng dữ liệu CSV (bytes, không gồm header)
+
+    Returns:
+    tuple: (mảng open_time int64, số dòng không đọc được)
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    row_starts = np.concatenate([[0], np.flatnonzero(buffer == ord('\n')) + 1])
+    row_starts = row_starts[row_starts + TIMESTAMP_WIDTH <= len(buffer)]
+    if len(row_starts) == 0:
+        return np.empty(0, dtype=np.int64), 0
+
+    chars = buffer[row_starts[:, None] + np.arange(TIMESTAMP_WIDTH)]
+    # Chỉ nhận các dòng đúng dạng 'YYYY-mm-dd HH:MM:SS'
+    valid = (chars[:, 4] == ord('-')) & (chars[:, 7] == ord('-')) & (chars[:, 10] == ord(' ')) \
+        & (chars[:, 13] == ord(':')) & (chars[:, 16] == ord(':'))
+    digits = chars[valid].astype(np.int64) - ord('0')
+
+    def number(*positions):
+        value = np.zeros(len(digits), dtype=np.int64)
+        for position in positions:
+            value = value * 10 + digits[:, position]
+        return value
+
+    days = _days_from_civil(number(0, 1, 2, 3), number(5, 6), number(8, 9))
+    seconds = ((days * 24 + number(11, 12)) * 60 + number(14, 15)) * 60 + number(17, 18)
+    return seconds * 1000, int((~valid).sum())
+
+def read_open_times(path):
+    with open(path, 'rb') as f:
+        f.readline()
+        return parse_open_times(f.read())
+
+def find_gaps(open_time, interval_ms):
+    """
+    Tìm các khe bị thiếu giữa hai nến liên tiếp
+
+    Returns:
+    list: Các dict {start, end, missing}, start/end là open_time (ms) của nến thiếu đầu tiên/cuối cùng
+    """
+    if len(open_time) < 2:
+        return []
+    diffs = np.diff(open_time)
+    positions = np.flatnonzero(diffs > interval_ms)
+    starts = open_time[positions] + interval_ms
+    ends = open_time[positions + 1] - interval_ms
+    missing = diffs[positions] // interval_ms - 1
+    return [{"start": int(start), "end": int(end), "missing": int(count)}
+            for start, end, count in zip(starts, ends, missing) if count > 0]
+
+def scan_file(path, interval, onboard_time=None):
+    """
+    Kiểm tra một file CSV
+
+    Parameters:
+    path (str): Đường dẫn file CSV
+    interval (str): Timeframe của file
+    onboard_time (int): onboardDate (ms) của symbol nếu có, để phát hiện lịch sử bị cắt ở đầu
+    """
+    interval_ms = binance.get_interval_ms(interval)
+    open_time, malformed = read_open_times(path)
+    diffs = np.diff(open_time)
+    ordered = np.sort(open_time) if (diffs < 0).any() else open_time
+    gaps = find_gaps(np.unique(ordered), interval_ms)
+
+    if onboard_time is not None and len(open_time):
+        # Nến đầu tiên trên sàn là slot chứa onboardDate (cùng cách tính với download_planner)
+        first_slot = first_open_slot(onboard_time, interval_ms)
+        head_missing = (int(ordered[0]) - first_slot) // interval_ms
+        if head_missing > 0:
+            gaps.insert(0, {"start": first_slot, "end": int(ordered[0]) - interval_ms, "missing": int(head_missing)})
+
+    return {
+        "path": path,
+        "rows": int(len(open_time)),
+        "first_open_time": int(ordered[0]) if len(ordered) else None,
+        "last_open_time": int(ordered[-1]) if len(ordered) else None,
+        "missing": int(sum(gap["missing"] for gap in gaps)),
+        "duplicates": int((np.diff(ordered) == 0).sum()),
+        "out_of_order": int((diffs < 0).sum()),
+        "misaligned": int((open_time % interval_ms != 0).sum()),
+        "malformed": malformed,
+        "gaps": gaps,
+    }
+
+def needs_repair(result):
+    return bool(result["gaps"] or result["duplicates"] or result["out_of_order"])
+
+def symbol_from_path(path, interval):
+    name = os.path.basename(path)
+    return name[len("binance_"):-len(f"_{interval}.csv")]
+
+def scan_directory(directory=DATA_DIRECTORY, interval='15m', metadata=None):
+    """
+    Quét mọi file CSV của timeframe trong thư mục
+
+    Returns:
+    dict: {symbol: kết quả scan_file}
+    """
+    results = {}
+    for path in sorted(glob.glob(os.path.join(directory, f"binance_*_{interval}.csv"))):
+        symbol = symbol_from_path(path, interval)
+        onboard_time = None
+        if metadata is not None:
+            symbol_desc = metadata.get_symbol_desc(symbol)
+            if symbol_desc:
+                onboard_time = symbol_desc.get("onboardDate")
+        results[symbol] = scan_file(path, interval, onboard_time)
+    return results
+
+def format_time(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M')
+
+def write_report(results, interval, path=REPORT_FILE):
+    """
+    Ghi báo cáo JSON (ghi file tạm rồi đổi tên)
+    """
+    report = {
+        "interval": interval,
+        "generated_at": int(time.time() * 1000),
+        "files": len(results),
+        "files_with_issues": sum(1 for result in results.values() if needs_repair(result)),
+        "symbols": {},
+    }
+    for symbol, result in results.items():
+        entry = dict(result)
+        entry["gaps"] = [dict(gap, start_time=format_time(gap["start"]), end_time=format_time(gap["end"]))
+                         for gap in result["gaps"]]
+        report["symbols"][symbol] = entry
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(temp_path, path)
+    return path
+
+def plan_repair_windows(gaps, interval_ms, limit=binance.KLINES_LIMIT):
+    """
+    Gộp các khe nằm gần nhau thành một cửa sổ tải nếu cả cửa sổ vẫn vừa một trang
+    (tránh tốn một request cho mỗi khe nhỏ)
+    """
+    windows = []
+    for gap in sorted(gaps, key=lambda gap: gap["start"]):
+        if windows and (gap["end"] - windows[-1][0]) // interval_ms < limit:
+            windows[-1][1] = max(windows[-1][1], gap["end"])
+        else:
+            windows.append([gap["start"], gap["end"]])
+    return [tuple(window) for window in windows]
+
+def merge_into_file(path, frames, hints=None):
+    """
+    Ghép các nến vừa tải vào file CSV, bỏ nến trùng, sắp xếp lại, rồi ghi lại CSV, store, archive (nếu đã có)
+    và sparse index
+
+    hints: gợi ý số chữ số thập phân cho archive (hints_from_symbol_desc)
+    """
+    df = pd.read_csv(path, parse_dates=['open_time', 'close_time'])
+    df = pd.concat([df] + frames, ignore_index=True)
+    df = df.drop_duplicates(subset='open_time', keep='last').sort_values('open_time').reset_index(drop=True)
+    binance.write_csv_atomic(df, path)
+    base = os.path.splitext(path)[0]
+    write_store(df, base + STORE_SUFFIX)
+    # Archive chỉ ghi nối tiếp được sau nến cuối, nên phải ghi lại toàn bộ để lấp các khe ở giữa
+    if os.path.exists(base + ARCHIVE_SUFFIX):
+        write_archive(df, base + ARCHIVE_SUFFIX, hints)
+    # Ghi lại giữa file nên không cập nhật tăng dần được, tạo lại index từ đầu
+    save_sparse_index(build_sparse_index(path), index_path_for_csv(path))
+    return len(df)
+
+def repair(results, interval='15m', workers=binance.DOWNLOAD_WORKERS, metadata=None, limiter=None):
+    """
+    Tải lại các khoảng bị thiếu của những file có vấn đề và ghép vào file
+
+    Returns:
+    dict: {symbol: số nến đã thêm}
+    """
+    interval_ms = binance.get_interval_ms(interval)
+    tasks = []
+    for symbol, result in results.items():
+        for start, end in plan_repair_windows(result["gaps"], interval_ms):
+            tasks.append((symbol, interval, start, end, None))
+
+    fetched = {symbol: [] for symbol, result in results.items() if needs_repair(result)}
+    if tasks:
+        limiter = limiter or WeightRateLimiter()
+        for (symbol, *_), df in binance.download_many(tasks, workers, limiter):
+            if df is not None and not df.empty:
+                fetched[symbol].append(df)
+
+    added = {}
+    for symbol, frames in fetched.items():
+        result = results[symbol]
+        if not frames and not result["duplicates"] and not result["out_of_order"]:
+            print(f"{symbol}: sàn không trả về nến nào cho các khoảng bị thiếu")
+            continue
+        path = result["path"]
+        hints = hints_from_symbol_desc(metadata.get_symbol_desc(symbol)) if metadata is not None else None
+        rows = merge_into_file(path, frames, hints)
+        added[symbol] = rows - (result["rows"] - result["duplicates"])
+        if metadata is not None:
+            binance.record_coverage(metadata, symbol, interval, path)
+        print(f"{symbol}: thêm {added[symbol]} nến, bỏ {result['duplicates']} nến trùng")
+    return added
+
+def print_summary(results):
+    issues = {symbol: result for symbol, result in results.items() if needs_repair(result)}
+    total_missing = sum(result["missing"] for result in issues.values())
+    total_duplicates = sum(result["duplicates"] for result in issues.values())
+    print(f"{len(results)} file, {len(issues)} file có vấn đề: thiếu {total_missing} nến, trùng {total_duplicates} nến")
+    for symbol, result in issues.items():
+        print(f"  {symbol}: {len(result['gaps'])} khe, thiếu {result['missing']}, trùng {result['duplicates']}, "
+              f"sai thứ tự {result['out_of_order']}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Kiểm tra và sửa khe/trùng lặp trong các file nến")
+    parser.add_argument('--directory', default=DATA_DIRECTORY)
+    parser.add_argument('--interval', default='15m')
+    parser.add_argument('--report', default=REPORT_FILE)
+    parser.add_argument('--repair', action='store_true', help="Tải lại các khoảng bị thiếu")
+    parser.add_argument('--workers', type=int, default=binance.DOWNLOAD_WORKERS)
+    parser.add_argument('--no-onboard', action='store_true',
+                        help="Không kiểm tra phần lịch sử bị cắt ở đầu theo onboardDate")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    metadata = open_store(METADATA_DB, binance.CONFIG_FILE)
+
+    start = time.perf_counter()
+    results = scan_directory(args.directory, args.interval, None if args.no_onboard else metadata)
+    print(f"Đã quét {len(results)} file trong {time.perf_counter() - start:.2f}s")
+    print_summary(results)
+    print(f"Đã ghi báo cáo {write_report(results, args.interval, args.report)}")
+
+    if args.repair:
+        with metadata.batch():
+            repair(results, args.interval, args.workers, metadata)
+        binance.export_config(metadata)
+        # Quét lại để ghi báo cáo sau khi sửa
+        results = scan_directory(args.directory, args.interval, None if args.no_onboard else metadata)
+        print_summary(results)
+        write_report(results, args.interval, args.report)
+    metadata.close()
+
+if __name__ == '__main__':
+    main()
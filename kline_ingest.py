@@ -0,0 +1,128 @@
+"""
+Đọc response /fapi/v1/klines thẳng vào các mảng NumPy có kiểu, không tạo list Python cho từng dòng
+
+- parse_klines_page: bỏ các ký tự [ ] " của JSON rồi để NumPy parse toàn bộ số trong một lần
+  (mỗi trang 1500 nến thành một mảng float64 (n, 12)), không qua json.loads
+- KlineBuffer: các cột đã cấp phát sẵn theo kiểu dữ liệu cuối cùng (int64/float64), các trang được
+  chép nối tiếp vào; khi đầy thì tăng gấp đôi. Bộ nhớ đỉnh xấp xỉ kích thước dữ liệu cuối cùng
+  thay vì list các list chuỗi của mọi nến như trước.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+KLINE_COLUMNS = [
+    'open_time', 'open', 'high', 'low', 'close', 'volume',
+    'close_time', 'quote_asset_volume', 'number_of_trades',
+    'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
+]
+KLINE_FIELDS = len(KLINE_COLUMNS)
+INTEGER_COLUMNS = ('open_time', 'close_time', 'number_of_trades', 'ignore')
+TIME_COLUMNS = ('open_time', 'close_time')
+COLUMN_DTYPES = {name: np.int64 if name in INTEGER_COLUMNS else np.float64 for name in KLINE_COLUMNS}
+
+# Các ký tự JSON cần bỏ để còn lại chuỗi số ngăn cách bởi dấu phẩy
+JSON_DELETE = b'[]" \r\n'
+
+def parse_klines_page(content):
+    """
+    Parse nội dung response klines (bytes) thành mảng float64 (số nến, 12)
+
+    Thời gian (ms) và số giao dịch nhỏ hơn 2^53 nên giữ chính xác khi qua float64.
+    """
+    text = content.translate(None, JSON_DELETE)
+    if not text:
+        return np.empty((0, KLINE_FIELDS))
+    with warnings.catch_warnings():
+        # Dữ liệu sai định dạng được báo lỗi ngay bên dưới
+        warnings.simplefilter('ignore', DeprecationWarning)
+        values = np.fromstring(text, dtype=np.float64, sep=',')
+    if values.size % KLINE_FIELDS or values.size != text.count(b',') + 1:
+        raise ValueError("Response klines không đúng định dạng")
+    return values.reshape(-1, KLINE_FIELDS)
+
+def is_integral(values):
+    return len(values) > 0 and bool(np.all(np.abs(values) < 2 ** 53)) and bool(np.all(values == np.floor(values)))
+
+class KlineBuffer:
+    """
+    Bộ đệm theo cột cho các trang kline, cấp phát trước `capacity` nến
+    """
+
+    def __init__(self, capacity=1500):
+        capacity = max(1, int(capacity))
+        self.columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+        self.capacity = capacity
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for name, values in self.columns.items():
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[:self.size] = values[:self.size]
+            self.columns[name] = grown
+        self.capacity = capacity
+
+    def extend(self, page):
+        """
+        Chép một trang (mảng (n, 12) từ parse_klines_page) vào cuối bộ đệm
+        """
+        count = len(page)
+        if count == 0:
+            return
+        if self.size + count > self.capacity:
+            self._grow(self.size + count)
+        end = self.size + count
+        for index, name in enumerate(KLINE_COLUMNS):
+            # Gán vào mảng int64 sẽ tự ép kiểu từ float64
+            self.columns[name][self.size:end] = page[:, index]
+        self.size = end
+
+    def last_open_time(self):
+        return int(self.columns['open_time'][self.size - 1]) if self.size else None
+
+    def to_dataframe(self):
+        """
+        DataFrame cùng cột và kiểu như trước đây (open_time/close_time dạng datetime)
+        """
+        data = {}
+        for name in KLINE_COLUMNS:
+            values = self.columns[name][:self.size]
+            if name in TIME_COLUMNS:
+                values = values.view('datetime64[ms]')
+            elif values.dtype == np.float64 and is_integral(values):
+                # pd.to_numeric trước đây cho cột int64 khi mọi giá trị là số nguyên
+                # (VD: volume của symbol có quantityPrecision = 0), giữ nguyên để CSV ghi ra không đổi
+                values = values.astype(np.int64)
+            data[name] = values
+        return pd.DataFrame(data)
+
+def pages_to_dataframe(pages):
+    """
+    Ghép các trang đã parse thành DataFrame
+    """
+    buffer = KlineBuffer(sum(len(page) for page in pages))
+    for page in pages:
+        buffer.extend(page)
+    return buffer.to_dataframe()
+
+def dataframe_to_page(df):
+    """
+    Ngược lại của pages_to_dataframe: mảng float64 (số nến, 12) theo thứ tự cột của API klines
+    (thời gian tính bằng ms), VD để gửi nến qua JSON rồi dựng lại bằng pages_to_dataframe
+    """
+    page = np.zeros((len(df), KLINE_FIELDS))
+    for index, name in enumerate(KLINE_COLUMNS):
+        if name not in df:
+            continue
+        values = df[name]
+        if name in TIME_COLUMNS:
+            values = pd.to_datetime(values).to_numpy('datetime64[ms]').astype(np.int64)
+        page[:, index] = values
+    return page
@@ -0,0 +1,259 @@
+"""
+Lưu metadata của dữ liệu đã tải (symbol, timeframe, khoảng thời gian đã có) trong SQLite
+thay cho việc ghi lại toàn bộ config.json sau mỗi symbol
+
+- Bảng symbols: thông tin hiển thị và symbolDesc (JSON từ exchangeInfo) của mỗi symbol
+- Bảng coverage: mỗi cặp (symbol, timeframe) một dòng, khóa chính là (symbol_key, timeframe)
+  nên tra cứu theo index thay vì duyệt danh sách; lưu ngày bắt đầu/kết thúc như config.json
+  cùng open_time đầu/cuối (ms), số dòng và offset byte của file CSV
+- Ghi theo lô: các thay đổi trong batch() được commit một lần (hoặc bỏ toàn bộ nếu lỗi)
+- config.json chỉ được xuất ra khi cần (export_config) cho các trang JS đang đọc file này
+
+Chạy: python metadata_store.py export   (xuất config.json từ metadata.db)
+      python metadata_store.py import   (nạp config.json có sẵn vào metadata.db)
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+METADATA_DB = os.environ.get('METADATA_DB', "metadata.db")
+CONFIG_FILE = os.environ.get('CONFIG_FILE', "config.json")
+
+# Các khóa ở cấp exchange.binance của config.json (ngoài marketdata)
+EXCHANGE_NAME = "binance"
+EXCHANGE_INFO = {
+    "datatype": "crypto",
+    "markettype": "future",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS symbols (
+    symbol_key TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    pair TEXT NOT NULL,
+    fullname TEXT NOT NULL,
+    icon TEXT NOT NULL,
+    symbol_desc TEXT
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    symbol_key TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    datalink TEXT NOT NULL,
+    fromdate TEXT NOT NULL DEFAULT '',
+    enddate TEXT NOT NULL DEFAULT '',
+    first_open_time INTEGER,
+    last_open_time INTEGER,
+    row_count INTEGER,
+    data_start INTEGER,
+    file_size INTEGER,
+    updated_at INTEGER,
+    PRIMARY KEY (symbol_key, timeframe)
+);
+"""
+
+class MetadataStore:
+    """
+    Metadata trong một file SQLite
+
+    Mỗi lệnh ghi ngoài batch() được commit ngay; trong batch() chỉ commit khi thoát khối
+    (hoặc khi gọi commit() giữa chừng để chia lô).
+    """
+
+    def __init__(self, path=METADATA_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.batch_depth = 0
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def batch(self):
+        """
+        Gom các thay đổi thành một transaction, rollback toàn bộ nếu có lỗi
+        """
+        self.batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.batch_depth -= 1
+            if self.batch_depth == 0:
+                self.conn.rollback()
+            raise
+        self.batch_depth -= 1
+        if self.batch_depth == 0:
+            self.conn.commit()
+
+    def commit(self):
+        self.conn.commit()
+
+    def _changed(self):
+        if self.batch_depth == 0:
+            self.conn.commit()
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM symbols LIMIT 1").fetchone() is None
+
+    def has_symbol(self, symbol):
+        row = self.conn.execute("SELECT 1 FROM symbols WHERE symbol_key = ?", (symbol.lower(),)).fetchone()
+        return row is not None
+
+    def add_symbol(self, fullname, symbol, pair, icon, symbol_desc=None):
+        """
+        Thêm symbol nếu chưa có (thông tin của symbol đã có được giữ nguyên như config.json trước đây)
+
+        Returns:
+        bool: True nếu symbol vừa được thêm
+        """
+        cursor = self.conn.execute(
+            "INSERT INTO symbols (symbol_key, position, symbol, pair, fullname, icon, symbol_desc) "
+            "VALUES (?, (SELECT COUNT(*) FROM symbols), ?, ?, ?, ?, ?) "
+            "ON CONFLICT (symbol_key) DO NOTHING",
+            (fullname.lower(), symbol, pair, fullname, icon,
+             json.dumps(symbol_desc) if symbol_desc else None))
+        self._changed()
+        return cursor.rowcount > 0
+
+    def get_symbol_desc(self, symbol):
+        row = self.conn.execute("SELECT symbol_desc FROM symbols WHERE symbol_key = ?",
+                                (symbol.lower(),)).fetchone()
+        if row is None or row['symbol_desc'] is None:
+            return None
+        return json.loads(row['symbol_desc'])
+
+    def get_coverage(self, symbol, timeframe):
+        """
+        Thông tin dữ liệu đã có của (symbol, timeframe), hoặc None nếu chưa có
+
+        Returns:
+        dict: name, datalink, fromdate, enddate như config.json, kèm first_open_time, last_open_time,
+              row_count, data_start, file_size
+        """
+        row = self.conn.execute("SELECT * FROM coverage WHERE symbol_key = ? AND timeframe = ?",
+                                (symbol.lower(), timeframe)).fetchone()
+        if row is None:
+            return None
+        info = dict(row)
+        info["name"] = info.pop("timeframe")
+        return info
+
+    def tracked_symbols(self, timeframe):
+        """
+        Các symbol (fullname, theo thứ tự trong config) đã có dữ liệu của timeframe
+        """
+        rows = self.conn.execute("SELECT s.fullname FROM coverage c JOIN symbols s ON s.symbol_key = c.symbol_key "
+                                 "WHERE c.timeframe = ? ORDER BY s.position", (timeframe,))
+        return [row["fullname"] for row in rows]
+
+    def set_coverage(self, symbol, timeframe, datalink, fromdate="", enddate="", first_open_time=None,
+                     last_open_time=None, row_count=None, data_start=None, file_size=None):
+        """
+        Ghi (thêm hoặc cập nhật) thông tin dữ liệu của (symbol, timeframe)
+        """
+        self.conn.execute(
+            "INSERT INTO coverage (symbol_key, timeframe, position, datalink, fromdate, enddate, "
+            "first_open_time, last_open_time, row_count, data_start, file_size, updated_at) "
+            "VALUES (?, ?, (SELECT COUNT(*) FROM coverage WHERE symbol_key = ?), ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (symbol_key, timeframe) DO UPDATE SET "
+            "datalink = excluded.datalink, fromdate = excluded.fromdate, enddate = excluded.enddate, "
+            "first_open_time = excluded.first_open_time, last_open_time = excluded.last_open_time, "
+            "row_count = excluded.row_count, data_start = excluded.data_start, "
+            "file_size = excluded.file_size, updated_at = excluded.updated_at",
+            (symbol.lower(), timeframe, symbol.lower(), datalink, fromdate or "", enddate or "",
+             first_open_time, last_open_time, row_count, data_start, file_size, int(time.time() * 1000)))
+        self._changed()
+
+    def import_config(self, config):
+        """
+        Nạp nội dung config.json (dict) vào store, giữ nguyên thứ tự symbol và timeframe
+        """
+        marketdata = config.get("exchange", {}).get(EXCHANGE_NAME, {}).get("marketdata", {})
+        with self.batch():
+            for symbol_key, item in marketdata.items():
+                fullname = item.get("fullname", symbol_key.upper())
+                self.add_symbol(fullname, item.get("symbol", ""), item.get("pair", ""),
+                                item.get("icon", ""), item.get("symbolDesc"))
+                for tf_data in item.get("data", []):
+                    self.set_coverage(fullname, tf_data["name"], tf_data.get("datalink", ""),
+                                      tf_data.get("fromdate", ""), tf_data.get("enddate", ""))
+        return len(marketdata)
+
+    def to_config(self):
+        """
+        Dựng lại cấu trúc config.json từ store
+        """
+        marketdata = {}
+        for row in self.conn.execute("SELECT * FROM symbols ORDER BY position"):
+            entry = {
+                "symbol": row["symbol"],
+                "pair": row["pair"],
+                "fullname": row["fullname"],
+                "icon": row["icon"],
+                "data": [],
+            }
+            if row["symbol_desc"]:
+                entry["symbolDesc"] = json.loads(row["symbol_desc"])
+            marketdata[row["symbol_key"]] = entry
+
+        for row in self.conn.execute("SELECT symbol_key, timeframe, datalink, fromdate, enddate "
+                                     "FROM coverage ORDER BY symbol_key, position"):
+            if row["symbol_key"] in marketdata:
+                marketdata[row["symbol_key"]]["data"].append({
+                    "name": row["timeframe"],
+                    "datalink": row["datalink"],
+                    "fromdate": row["fromdate"],
+                    "enddate": row["enddate"],
+                })
+
+        exchange = dict(EXCHANGE_INFO)
+        exchange["marketdata"] = marketdata
+        return {"exchange": {EXCHANGE_NAME: exchange}}
+
+    def export_config(self, path=CONFIG_FILE):
+        """
+        Ghi config.json (ghi file tạm rồi đổi tên để trang web không đọc phải file ghi dở)
+        """
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.to_config(), f, indent=4)
+        os.replace(temp_path, path)
+        return path
+
+def open_store(path=METADATA_DB, config_file=CONFIG_FILE):
+    """
+    Mở metadata store; lần đầu (store rỗng) thì nạp config.json có sẵn
+    """
+    store = MetadataStore(path)
+    if store.is_empty() and os.path.exists(config_file):
+        with open(config_file, 'r') as f:
+            store.import_config(json.load(f))
+    return store
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Metadata của dữ liệu đã tải")
+    parser.add_argument('command', choices=['export', 'import'])
+    parser.add_argument('--db', default=METADATA_DB)
+    parser.add_argument('--config', default=CONFIG_FILE)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    store = MetadataStore(args.db)
+    if args.command == 'export':
+        print(f"Đã xuất {store.export_config(args.config)}")
+    else:
+        with open(args.config, 'r') as f:
+            count = store.import_config(json.load(f))
+        print(f"Đã nạp {count} symbol từ {args.config}")
+    store.close()
+
+if __name__ == '__main__':
+    main()
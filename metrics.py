@@ -0,0 +1,180 @@
+"""
+Đo thời gian từng bước và đếm sự kiện cho downloader (binance.py) và server (server.py)
+
+- Metrics.timer(name, **labels): đo thời gian một khối lệnh, cộng vào histogram của (name, labels)
+- Metrics.inc(name, value, **labels): bộ đếm; Metrics.set(name, value, **labels): giá trị tức thời
+- to_prometheus(): định dạng text của Prometheus (server.py trả qua /metrics)
+- summary(): dict tổng hợp (số lần, tổng/trung bình/lớn nhất) để ghi báo cáo JSON
+
+Mỗi tiến trình dùng chung một `registry`; mọi phương thức đều an toàn khi gọi từ nhiều luồng.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Các ngưỡng (giây) của histogram thời gian
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metrics:
+    """
+    Bộ đếm, gauge và histogram thời gian, mỗi loại được phân biệt theo tên và nhãn
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        # (name, labels) -> [count, sum, max, số lần rơi vào từng bucket]
+        self.timings = {}
+        self.descriptions = {}
+        self.started = time.time()
+
+    def describe(self, name, text):
+        self.descriptions[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, label_key(labels))] = value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            timing = self.timings.get(key)
+            if timing is None:
+                timing = self.timings[key] = [0, 0.0, 0.0, [0] * len(self.buckets)]
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    timing[3][index] += 1
+                    break
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter(self, name, **labels):
+        with self.lock:
+            return self.counters.get((name, label_key(labels)), 0)
+
+    def timing(self, name, **labels):
+        """
+        Returns:
+        dict: count, total_seconds, max_seconds của (name, labels), hoặc None nếu chưa đo lần nào
+        """
+        with self.lock:
+            timing = self.timings.get((name, label_key(labels)))
+            if timing is None:
+                return None
+            return {"count": timing[0], "total_seconds": timing[1], "max_seconds": timing[2]}
+
+    def counter_series(self, name):
+        """
+        Mọi bộ nhãn đã ghi của một bộ đếm: list (dict nhãn, giá trị)
+        """
+        with self.lock:
+            return [(dict(labels), value) for (counter_name, labels), value in self.counters.items()
+                    if counter_name == name]
+
+    def series(self, name):
+        """
+        Mọi bộ nhãn đã ghi của một histogram: list (dict nhãn, count, tổng giây, max giây)
+        """
+        with self.lock:
+            return [(dict(labels), timing[0], timing[1], timing[2])
+                    for (timing_name, labels), timing in self.timings.items() if timing_name == name]
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.timings.clear()
+            self.started = time.time()
+
+    def summary(self):
+        """
+        Tổng hợp dạng dict để ghi JSON: khóa là tên kèm nhãn như trong Prometheus
+        """
+        with self.lock:
+            counters = {name + format_labels(labels): value for (name, labels), value in self.counters.items()}
+            gauges = {name + format_labels(labels): value for (name, labels), value in self.gauges.items()}
+            timings = {}
+            for (name, labels), (count, total, largest, _) in self.timings.items():
+                timings[name + format_labels(labels)] = {
+                    "count": count,
+                    "total_seconds": round(total, 6),
+                    "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+                    "max_ms": round(largest * 1000, 3),
+                }
+        return {"counters": counters, "gauges": gauges, "timings": timings}
+
+    def to_prometheus(self, prefix='ohl_'):
+        """
+        Định dạng text exposition của Prometheus (version 0.0.4)
+        """
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            timings = sorted((key, (count, total, list(buckets)))
+                             for key, (count, total, _, buckets) in self.timings.items())
+
+        lines = []
+        declared = set()
+
+        def declare(metric, name, kind):
+            if metric in declared:
+                return
+            declared.add(metric)
+            if name in self.descriptions:
+                lines.append(f"# HELP {metric} {self.descriptions[name]}")
+            lines.append(f"# TYPE {metric} {kind}")
+
+        for (name, labels), value in counters:
+            metric = f"{prefix}{name}_total"
+            declare(metric, name, 'counter')
+            lines.append(f"{metric}{format_labels(labels)} {format_value(value)}")
+        for (name, labels), value in gauges:
+            metric = f"{prefix}{name}"
+            declare(metric, name, 'gauge')
+            lines.append(f"{metric}{format_labels(labels)} {format_value(value)}")
+        for (name, labels), (count, total, buckets) in timings:
+            metric = f"{prefix}{name}_seconds"
+            declare(metric, name, 'histogram')
+            cumulative = 0
+            for bound, hits in zip(self.buckets, buckets):
+                cumulative += hits
+                lines.append(f"{metric}_bucket{format_labels(labels, [('le', format_value(bound))])} {cumulative}")
+            lines.append(f"{metric}_bucket{format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {format_value(total)}")
+            lines.append(f"{metric}_count{format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+# Registry dùng chung trong một tiến trình
+registry = Metrics()
@@ -0,0 +1,195 @@
+"""
+Mock server giả lập /fapi/v1/klines và /fapi/v1/exchangeInfo của Binance Futures
+Dữ liệu được lấy từ các file CSV trong binance_futures_data, dùng để benchmark offline
+
+Chạy: python mock_binance.py --port 8081 --weight-limit 2400 --latency 0.05
+Sau đó: BINANCE_FAPI_URL=http://127.0.0.1:8081 python binance.py
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from flask import Flask, request, jsonify
+
+from rate_limiter import get_klines_weight
+
+DATA_DIRECTORY = "binance_futures_data"
+CONFIG_FILE = "config.json"
+
+INTERVAL_MS = {
+    '1m': 60 * 1000,
+    '5m': 5 * 60 * 1000,
+    '15m': 15 * 60 * 1000,
+    '1h': 60 * 60 * 1000,
+    '4h': 4 * 60 * 60 * 1000,
+    '1d': 24 * 60 * 60 * 1000,
+}
+
+app = Flask(__name__)
+
+# Cấu hình giả lập (có thể đổi qua command line hoặc trực tiếp từ benchmark)
+settings = {
+    "weight_limit": 2400,
+    "latency": 0.0,
+    "retry_after": 1,
+    # Hàm trả về thời gian hiện tại giả lập (ms), VD: đồng hồ của replay_stream; None là giờ thật
+    "clock": None,
+}
+
+# Thống kê
+stats = {
+    "requests": 0,
+    "rate_limited": 0,
+    "weight": 0,
+}
+
+_lock = threading.Lock()
+_window = {"minute": None, "used": 0}
+_cache = {}
+
+def now_ms():
+    clock = settings["clock"]
+    return int(clock()) if clock is not None else int(time.time() * 1000)
+
+def load_symbol(symbol, interval):
+    """
+    Đọc file CSV một lần và giữ lại dạng mảng để trả về nhanh
+    """
+    key = (symbol, interval)
+    if key not in _cache:
+        path = os.path.join(DATA_DIRECTORY, f"binance_{symbol}_{interval}.csv")
+        if not os.path.exists(path):
+            _cache[key] = None
+        else:
+            df = pd.read_csv(path)
+            open_time = pd.to_datetime(df['open_time']).to_numpy('datetime64[ms]').astype(np.int64)
+            close_time = pd.to_datetime(df['close_time']).to_numpy('datetime64[ms]').astype(np.int64)
+            _cache[key] = {
+                "open_time": open_time,
+                "close_time": close_time,
+                "rows": df.astype(str).to_numpy(),
+                "trades": df['number_of_trades'].to_numpy(np.int64),
+            }
+    return _cache[key]
+
+def use_weight(weight):
+    """
+    Cộng weight vào cửa sổ một phút hiện tại, trả về (weight đã dùng, có vượt giới hạn không)
+    """
+    minute = int(time.time() // 60)
+    with _lock:
+        if _window["minute"] != minute:
+            _window["minute"] = minute
+            _window["used"] = 0
+        _window["used"] += weight
+        stats["requests"] += 1
+        stats["weight"] += weight
+        exceeded = _window["used"] > settings["weight_limit"]
+        if exceeded:
+            stats["rate_limited"] += 1
+        return _window["used"], exceeded
+
+def reset_stats():
+    with _lock:
+        for key in stats:
+            stats[key] = 0
+        _window["minute"] = None
+        _window["used"] = 0
+
+@app.route('/fapi/v1/klines', methods=['GET'])
+def klines():
+    symbol = request.args.get('symbol', '')
+    interval = request.args.get('interval', '15m')
+    limit = min(int(request.args.get('limit', 500)), 1500)
+    start_time = request.args.get('startTime')
+    end_time = request.args.get('endTime')
+
+    used, exceeded = use_weight(get_klines_weight(limit))
+    headers = {"X-MBX-USED-WEIGHT-1M": str(used)}
+    if exceeded:
+        headers["Retry-After"] = str(settings["retry_after"])
+        return jsonify({"code": -1003, "msg": "Too many requests."}), 429, headers
+
+    if settings["latency"]:
+        time.sleep(settings["latency"])
+
+    data = load_symbol(symbol, interval)
+    if data is None or interval not in INTERVAL_MS:
+        return jsonify({"code": -1121, "msg": "Invalid symbol."}), 400, headers
+
+    open_time = data["open_time"]
+    # Nến chưa mở theo đồng hồ (giả lập) thì chưa tồn tại
+    visible = int(np.searchsorted(open_time, now_ms(), side='right'))
+    if start_time is not None:
+        lo = int(np.searchsorted(open_time, int(start_time), side='left'))
+    elif end_time is not None:
+        lo = max(0, min(visible, int(np.searchsorted(open_time, int(end_time), side='right'))) - limit)
+    else:
+        lo = max(0, visible - limit)
+    hi = min(lo + limit, visible)
+    if end_time is not None:
+        hi = min(hi, int(np.searchsorted(open_time, int(end_time), side='right')))
+
+    rows = data["rows"]
+    result = [
+        [int(open_time[i]), rows[i][1], rows[i][2], rows[i][3], rows[i][4], rows[i][5],
+         int(data["close_time"][i]), rows[i][7], int(data["trades"][i]), rows[i][9], rows[i][10], "0"]
+        for i in range(lo, max(lo, hi))
+    ]
+    return app.response_class(json.dumps(result), mimetype='application/json', headers=headers)
+
+@app.route('/fapi/v1/exchangeInfo', methods=['GET'])
+def exchange_info():
+    used, exceeded = use_weight(1)
+    headers = {"X-MBX-USED-WEIGHT-1M": str(used)}
+    if exceeded:
+        headers["Retry-After"] = str(settings["retry_after"])
+        return jsonify({"code": -1003, "msg": "Too many requests."}), 429, headers
+
+    symbols = []
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'r') as f:
+            config = json.load(f)
+        for item in config["exchange"]["binance"]["marketdata"].values():
+            if "symbolDesc" in item:
+                symbols.append(item["symbolDesc"])
+    return jsonify({"timezone": "UTC", "serverTime": now_ms(), "symbols": symbols}), 200, headers
+
+@app.route('/fapi/v1/time', methods=['GET'])
+def server_time():
+    return jsonify({"serverTime": now_ms()})
+
+@app.route('/mock/stats', methods=['GET'])
+def mock_stats():
+    return jsonify(stats)
+
+def start_in_thread(host='127.0.0.1', port=0):
+    """
+    Chạy mock server trong một luồng nền, trả về (server, base_url)
+    """
+    import logging
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server(host, port, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_port}"
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mock Binance Futures API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--weight-limit', type=int, default=2400)
+    parser.add_argument('--latency', type=float, default=0.0, help="Độ trễ giả lập mỗi request (giây)")
+    parser.add_argument('--retry-after', type=int, default=1)
+    args = parser.parse_args()
+
+    settings["weight_limit"] = args.weight_limit
+    settings["latency"] = args.latency
+    settings["retry_after"] = args.retry_after
+    app.run(host=args.host, port=args.port, threaded=True)
@@ -0,0 +1,389 @@
+"""
+Backtest cấp danh mục: chạy chiến lược EMA/LWMA/Donchian của backtest.py trên nhiều symbol cùng lúc
+với một quỹ ký quỹ chung
+
+- Dữ liệu của mỗi symbol được đọc lười theo từng đoạn (chunk_size nến, hoặc từng block của archive)
+  từ candle store / archive / CSV; chỉ báo được tính trên từng đoạn, mang theo trạng thái EMA và các
+  nến cuối của đoạn trước nên kết quả giống hệt khi tính trên toàn bộ lịch sử
+- Các chuỗi nến được trộn theo thời gian bằng heap (k-way merge theo (open_time, thứ tự symbol)):
+  bộ nhớ chỉ gồm một đoạn của mỗi symbol và các lệnh đang mở, không phụ thuộc độ dài lịch sử
+- Tại mỗi thời điểm: kiểm tra thoát lệnh (SL trước TP, khớp đúng giá) của mọi symbol có nến, rồi mới
+  xét vào lệnh mới theo thứ tự symbol, để vốn vừa giải phóng dùng được ngay
+- Quy tắc theo từng symbol giống backtest.py: bỏ qua max(các chu kỳ) nến đầu, vào lệnh ở giá close,
+  thoát từ nến kế tiếp, nến vừa thoát lệnh không vào lệnh mới, mỗi symbol tối đa một lệnh
+- Vốn chung: khối lượng = balance * order_size_percent / giá, ký quỹ = giá trị lệnh / leverage; lệnh
+  không vào nếu đã đủ max_positions lệnh hoặc ký quỹ còn trống không đủ. Phí tính trên giá trị lệnh
+  lúc vào và lúc ra (fee_percent), trừ vào pnl khi đóng lệnh
+
+Với một symbol, fee_percent=0 và ký quỹ đủ, kết quả trùng với backtest.run_backtest.
+
+Chạy: python portfolio.py --max-positions 10 --leverage 2 --fee 0.04 --trades portfolio_trades.csv
+"""
+import argparse
+import csv
+import heapq
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+import backtest
+import candle_archive
+import candle_store
+import indicators
+from data_cache import DATA_DIRECTORY, resolve_source
+from scanner import config_symbols
+
+# Tham số riêng của danh mục (cộng thêm vào backtest.DEFAULT_PARAMS)
+DEFAULT_PORTFOLIO_PARAMS = {
+    "max_positions": 10,
+    "leverage": 1.0,
+    # Phí taker của Binance Futures: 0.04% giá trị lệnh mỗi chiều
+    "fee_percent": 0.0004,
+}
+# Số nến mỗi lần đọc từ store/CSV cho một symbol
+CHUNK_SIZE = 1024
+STREAM_COLUMNS = ['open_time', 'high', 'low', 'close']
+TRADE_COLUMNS = ['id', 'symbol', 'type', 'entryPrice', 'exitPrice', 'quantity', 'exitReason', 'pnl', 'pnlPercent',
+                 'fees', 'entryTime', 'exitTime', 'duration']
+# Khoảng lấy mẫu đường balance (giây)
+EQUITY_SAMPLE_SECONDS = 86400
+
+def merge_portfolio_params(params=None):
+    merged = backtest.merge_params(DEFAULT_PORTFOLIO_PARAMS)
+    if params:
+        merged.update(params)
+    return merged
+
+def chunk_reader(symbol, timeframe='15m', directory=DATA_DIRECTORY, chunk_size=CHUNK_SIZE):
+    """
+    Đọc lần lượt từng đoạn nến của một symbol: dict open_time (ms, int64), high, low, close (float64)
+    """
+    path, _ = resolve_source(symbol, timeframe, directory)
+    if path is None:
+        return
+    if path.endswith(candle_store.STORE_SUFFIX):
+        n_rows, _ = candle_store.read_header(path)
+        for start in range(0, n_rows, chunk_size):
+            columns = candle_store.read_columns(path, STREAM_COLUMNS, start=start, stop=start + chunk_size)
+            # Chép ra khỏi memory-map để đoạn cũ được giải phóng khi đọc đoạn mới
+            yield {name: np.array(values) for name, values in columns.items()}
+    elif path.endswith(candle_archive.ARCHIVE_SUFFIX):
+        yield from candle_archive.iter_blocks(path, STREAM_COLUMNS)
+    else:
+        for df in pd.read_csv(path, usecols=STREAM_COLUMNS, chunksize=chunk_size):
+            chunk = {name: df[name].to_numpy(np.float64) for name in STREAM_COLUMNS[1:]}
+            chunk['open_time'] = pd.to_datetime(df['open_time']).to_numpy('datetime64[ms]').astype(np.int64)
+            yield chunk
+
+class SymbolStream:
+    """
+    Nến của một symbol kèm tín hiệu vào lệnh, đọc từng đoạn khi cần
+
+    Chỉ báo được tính trên đoạn hiện tại ghép với các nến cuối của đoạn trước (đủ cho cửa sổ LWMA và
+    Donchian), EMA chạy tiếp từ giá trị cuối, nên mọi giá trị giống hệt backtest.compute_indicators
+    trên toàn bộ lịch sử.
+    """
+
+    def __init__(self, symbol, chunks, params):
+        self.symbol = symbol
+        self.chunks = iter(chunks)
+        self.ema = indicators.EMA(params["ema_period"])
+        weights = params.get("lwma_weights")
+        if not weights or len(weights) < 2:
+            weights = [params["lwma_period"] - j for j in range(params["lwma_period"])]
+        self.weights = weights
+        self.donchian_period = params["donchian_period"]
+        self.max_period = max(params["ema_period"], params["lwma_period"], params["donchian_period"])
+        self.keep = max(len(weights), self.donchian_period) - 1
+        self.carry = {name: np.empty(0) for name in ('high', 'low', 'close')}
+        self.offset = 0
+        self.size = 0
+        self.pos = 0
+        self.load()
+
+    def load(self):
+        """
+        Đọc đoạn kế tiếp, trả về False nếu đã hết dữ liệu
+        """
+        self.offset += self.size
+        self.size = 0
+        self.pos = 0
+        for chunk in self.chunks:
+            if len(chunk['open_time']):
+                break
+        else:
+            return False
+
+        close = np.asarray(chunk['close'], dtype=np.float64)
+        high = np.asarray(chunk['high'], dtype=np.float64)
+        low = np.asarray(chunk['low'], dtype=np.float64)
+        size = len(close)
+        ema_values = np.array([self.ema.update(value) for value in close.tolist()])
+        joined = {name: np.concatenate([self.carry[name], values])
+                  for name, values in (('close', close), ('high', high), ('low', low))}
+        skip = len(joined['close']) - size
+        lwma_values = indicators.weighted_ma(joined['close'], self.weights)[skip:]
+        middle = indicators.donchian(joined['high'], joined['low'], self.donchian_period)[1][skip:]
+        self.carry = {name: values[len(values) - min(self.keep, len(values)):] for name, values in joined.items()}
+
+        long_mask = (close > ema_values) & (lwma_values > middle)
+        short_mask = (close < ema_values) & (lwma_values < middle)
+        # Như entry_signals: bỏ qua max_period nến đầu của toàn bộ lịch sử
+        warmup = max(0, min(size, self.max_period - self.offset))
+        long_mask[:warmup] = False
+        short_mask[:warmup] = False
+
+        # Truy cập từng phần tử trên list Python nhanh hơn trên mảng NumPy
+        self.time = (np.asarray(chunk['open_time'], dtype=np.int64) // 1000).tolist()
+        self.high = high.tolist()
+        self.low = low.tolist()
+        self.close = close.tolist()
+        self.long = long_mask.tolist()
+        self.short = short_mask.tolist()
+        self.size = size
+        return True
+
+    def advance(self):
+        """
+        Sang nến kế tiếp, trả về False nếu đã hết dữ liệu
+        """
+        self.pos += 1
+        if self.pos < self.size:
+            return True
+        return self.load()
+
+def new_symbol_stats():
+    return {"trades": 0, "wins": 0, "pnl": 0.0, "fees": 0.0}
+
+def run_portfolio(symbols, params=None, timeframe='15m', directory=DATA_DIRECTORY, chunk_size=CHUNK_SIZE,
+                  on_trade=None):
+    """
+    Chạy backtest danh mục trên các symbol
+
+    on_trade: hàm nhận từng lệnh đã đóng (dict); danh sách lệnh không được giữ trong bộ nhớ
+
+    Returns:
+    dict: metrics (như backtest.run_backtest, tính trên balance chung), balance, fees, openPositions,
+          symbols (thống kê theo symbol), skipped (số tín hiệu bỏ qua vì max_positions / ký quỹ),
+          equity ([time, balance] lấy mẫu mỗi ngày), bars (số nến đã xử lý)
+    """
+    params = merge_portfolio_params(params)
+    streams = []
+    for symbol in symbols:
+        stream = SymbolStream(symbol, chunk_reader(symbol, timeframe, directory, chunk_size), params)
+        if stream.size:
+            streams.append(stream)
+    heap = [(stream.time[0], index) for index, stream in enumerate(streams)]
+    heapq.heapify(heap)
+
+    balance = float(params["initial_balance"])
+    order_size = params["order_size_percent"]
+    tp_percent = params["take_profit_percent"]
+    sl_percent = params["stop_loss_percent"]
+    fee_percent = params["fee_percent"]
+    leverage = params["leverage"]
+    max_positions = params["max_positions"]
+
+    metrics = backtest.new_metrics(balance)
+    symbol_stats = {stream.symbol: new_symbol_stats() for stream in streams}
+    positions = {}
+    margin_used = 0.0
+    total_fees = 0.0
+    trade_count = 0
+    skipped = {"max_positions": 0, "margin": 0}
+    equity = []
+    next_sample = None
+    bars = 0
+
+    while heap:
+        now = heap[0][0]
+        # Mọi symbol có nến tại thời điểm này, theo thứ tự symbol
+        batch = []
+        while heap and heap[0][0] == now:
+            batch.append(heapq.heappop(heap)[1])
+        bars += len(batch)
+        if next_sample is None or now >= next_sample:
+            equity.append([now, balance])
+            next_sample = now - now % EQUITY_SAMPLE_SECONDS + EQUITY_SAMPLE_SECONDS
+
+        # 1) Thoát lệnh
+        exited = set()
+        for index in batch:
+            position = positions.get(index)
+            if position is None:
+                continue
+            stream = streams[index]
+            high = stream.high[stream.pos]
+            low = stream.low[stream.pos]
+            if position["is_long"]:
+                reason = 'SL' if low <= position["stopLoss"] else 'TP' if high >= position["takeProfit"] else None
+            else:
+                reason = 'SL' if high >= position["stopLoss"] else 'TP' if low <= position["takeProfit"] else None
+            if reason is None:
+                continue
+
+            exit_price = position["stopLoss"] if reason == 'SL' else position["takeProfit"]
+            quantity = position["quantity"]
+            direction = 1 if position["is_long"] else -1
+            fees = (position["entryPrice"] + exit_price) * quantity * fee_percent
+            pnl = direction * (exit_price - position["entryPrice"]) * quantity - fees
+            trade_count += 1
+            trade = {
+                "id": trade_count,
+                "symbol": stream.symbol,
+                "type": 'LONG' if position["is_long"] else 'SHORT',
+                "entryPrice": position["entryPrice"],
+                "exitPrice": exit_price,
+                "quantity": quantity,
+                "exitReason": reason,
+                "pnl": pnl,
+                "pnlPercent": (pnl / (position["entryPrice"] * quantity)) * 100,
+                "fees": fees,
+                "entryTime": position["entryTime"],
+                "exitTime": now,
+                "duration": (now - position["entryTime"]) // 60,
+            }
+            balance += pnl
+            margin_used -= position["margin"]
+            total_fees += fees
+            backtest.update_metrics(metrics, trade, balance)
+            stats = symbol_stats[stream.symbol]
+            stats["trades"] += 1
+            stats["wins"] += pnl > 0
+            stats["pnl"] += pnl
+            stats["fees"] += fees
+            del positions[index]
+            exited.add(index)
+            if on_trade is not None:
+                on_trade(trade)
+
+        # 2) Vào lệnh mới
+        for index in batch:
+            if index in positions or index in exited:
+                continue
+            stream = streams[index]
+            is_long = stream.long[stream.pos]
+            if not is_long and not stream.short[stream.pos]:
+                continue
+            if len(positions) >= max_positions:
+                skipped["max_positions"] += 1
+                continue
+            entry_price = stream.close[stream.pos]
+            notional = balance * order_size
+            margin = notional / leverage
+            if margin <= 0 or margin > balance - margin_used:
+                skipped["margin"] += 1
+                continue
+            quantity = notional / entry_price
+            if is_long:
+                take_profit = entry_price * (1 + tp_percent)
+                stop_loss = entry_price * (1 - sl_percent)
+            else:
+                take_profit = entry_price * (1 - tp_percent)
+                stop_loss = entry_price * (1 + sl_percent)
+            if quantity <= 0 or stop_loss == entry_price or take_profit == entry_price:
+                continue
+            positions[index] = {
+                "is_long": is_long, "entryPrice": entry_price, "quantity": quantity, "margin": margin,
+                "entryTime": now, "takeProfit": take_profit, "stopLoss": stop_loss,
+            }
+            margin_used += margin
+
+        # 3) Nến kế tiếp của các symbol vừa xử lý
+        for index in batch:
+            stream = streams[index]
+            if stream.advance():
+                heapq.heappush(heap, (stream.time[stream.pos], index))
+
+    if equity and equity[-1][1] != balance:
+        equity.append([now, balance])
+    open_positions = [{
+        "symbol": streams[index].symbol,
+        "type": 'LONG' if position["is_long"] else 'SHORT',
+        "entryPrice": position["entryPrice"],
+        "quantity": position["quantity"],
+        "entryTime": position["entryTime"],
+        "takeProfit": position["takeProfit"],
+        "stopLoss": position["stopLoss"],
+    } for index, position in sorted(positions.items())]
+
+    return {
+        "metrics": metrics,
+        "balance": balance,
+        "fees": total_fees,
+        "openPositions": open_positions,
+        "symbols": symbol_stats,
+        "skipped": skipped,
+        "equity": equity,
+        "bars": bars,
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backtest danh mục EMA/LWMA/Donchian trên nhiều symbol")
+    parser.add_argument('--symbols', help="Danh sách symbol, cách nhau bởi dấu phẩy (mặc định: mọi symbol trong config.json)")
+    parser.add_argument('--timeframe', default='15m')
+    parser.add_argument('--ema', type=int, default=backtest.DEFAULT_PARAMS["ema_period"])
+    parser.add_argument('--lwma', type=int, default=backtest.DEFAULT_PARAMS["lwma_period"])
+    parser.add_argument('--weights', default='', help="Trọng số LWMA tùy chỉnh, VD: 14,13,12")
+    parser.add_argument('--donchian', type=int, default=backtest.DEFAULT_PARAMS["donchian_period"])
+    parser.add_argument('--tp', type=float, default=backtest.DEFAULT_PARAMS["take_profit_percent"] * 100, help="Take profit (%%)")
+    parser.add_argument('--sl', type=float, default=backtest.DEFAULT_PARAMS["stop_loss_percent"] * 100, help="Stop loss (%%)")
+    parser.add_argument('--size', type=float, default=backtest.DEFAULT_PARAMS["order_size_percent"] * 100, help="Khối lượng mỗi lệnh (%% balance)")
+    parser.add_argument('--balance', type=float, default=backtest.DEFAULT_PARAMS["initial_balance"])
+    parser.add_argument('--max-positions', type=int, default=DEFAULT_PORTFOLIO_PARAMS["max_positions"])
+    parser.add_argument('--leverage', type=float, default=DEFAULT_PORTFOLIO_PARAMS["leverage"])
+    parser.add_argument('--fee', type=float, default=DEFAULT_PORTFOLIO_PARAMS["fee_percent"] * 100, help="Phí mỗi chiều (%%)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Số nến mỗi lần đọc cho một symbol")
+    parser.add_argument('--trades', help="Ghi các lệnh đã đóng ra file CSV (ghi dần, không giữ trong bộ nhớ)")
+    parser.add_argument('--output', help="Ghi thống kê ra file JSON")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    symbols = [symbol.strip().upper() for symbol in args.symbols.split(',')] if args.symbols else config_symbols()
+    params = {
+        "ema_period": args.ema,
+        "lwma_period": args.lwma,
+        "lwma_weights": indicators.parse_weights(args.weights),
+        "donchian_period": args.donchian,
+        "initial_balance": args.balance,
+        "order_size_percent": args.size / 100,
+        "take_profit_percent": args.tp / 100,
+        "stop_loss_percent": args.sl / 100,
+        "max_positions": args.max_positions,
+        "leverage": args.leverage,
+        "fee_percent": args.fee / 100,
+    }
+
+    trades_file = open(args.trades, 'w', newline='') if args.trades else None
+    writer = None
+    if trades_file is not None:
+        writer = csv.DictWriter(trades_file, fieldnames=TRADE_COLUMNS)
+        writer.writeheader()
+    try:
+        start = time.perf_counter()
+        result = run_portfolio(symbols, params, args.timeframe, chunk_size=args.chunk_size,
+                               on_trade=writer.writerow if writer is not None else None)
+        elapsed = time.perf_counter() - start
+    finally:
+        if trades_file is not None:
+            trades_file.close()
+
+    metrics = result["metrics"]
+    print(f"{len(result['symbols'])} symbol, {result['bars']} nến trong {elapsed:.1f}s "
+          f"({result['bars'] / elapsed:,.0f} nến/s)")
+    print(f"Số lệnh: {metrics['totalTrades']} (LONG {metrics['longTrades']} / SHORT {metrics['shortTrades']}), "
+          f"TP {metrics['tpHits']} / SL {metrics['slHits']}, bỏ qua: {result['skipped']}")
+    print(f"Win rate: {metrics['winRate']:.2f}%, profit factor: {metrics['profitFactor']:.2f}, "
+          f"max drawdown: {metrics['maxDrawdown']:.2f}%, phí: {result['fees']:.2f}")
+    print(f"Balance: {params['initial_balance']:.2f} -> {result['balance']:.2f}, "
+          f"{len(result['openPositions'])} lệnh đang mở")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=4)
+
+if __name__ == '__main__':
+    main()
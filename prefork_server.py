@@ -0,0 +1,177 @@
+"""
+Chạy một ứng dụng WSGI (server.py) ở chế độ production: nhiều tiến trình worker pre-fork, mỗi worker đa luồng
+
+- Tiến trình cha mở socket lắng nghe một lần rồi fork `workers` tiến trình con; các worker cùng accept
+  trên socket đó nên kernel chia kết nối cho các worker
+- Mỗi worker là một WSGI server đa luồng của werkzeug (không có debugger/reloader như app.run(debug=True))
+- Tiến trình cha không đọc dữ liệu nào trước khi fork; dữ liệu candle store được mỗi worker memory-map chỉ đọc
+  nên mọi worker dùng chung page cache của hệ điều hành
+- Worker chết bất thường được fork lại; SIGTERM/SIGINT dừng tất cả các worker
+- Mỗi worker có cache và số liệu /metrics riêng; cập nhật cần tới mọi worker (nến mới từ POST /api/bars)
+  được worker nhận request ghi vào SharedJournal, các worker khác đọc lại trước request kế tiếp của chúng
+
+Có gunicorn thì cũng chạy được trực tiếp: gunicorn -w 4 --threads 8 -b 0.0.0.0:5000 server:app
+"""
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+# Số worker mặc định: số CPU
+DEFAULT_WORKERS = int(os.environ.get('OHL_WORKERS', os.cpu_count() or 1))
+# Độ dài hàng đợi kết nối của socket lắng nghe
+LISTEN_BACKLOG = 1024
+# Thời gian chờ tối thiểu trước khi fork lại một worker vừa chết (tránh fork liên tục khi lỗi lúc khởi động)
+RESPAWN_DELAY = 1.0
+
+class SharedJournal:
+    """
+    File ghi nối tiếp dùng chung giữa các worker: mỗi bản ghi là một dòng JSON kèm pid của worker đã ghi,
+    mỗi worker giữ vị trí đã đọc của mình và chỉ nhận các bản ghi của worker khác
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.lock = threading.Lock()
+
+    def append(self, record):
+        line = json.dumps({"pid": os.getpid(), "record": record}, separators=(',', ':')) + '\n'
+        # O_APPEND: mỗi lần write là một dòng liền, không xen với dòng của worker khác
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+
+    def skip(self):
+        """
+        Bỏ qua các bản ghi hiện có (worker mới fork chưa có cache nên không cần đọc lại)
+        """
+        with self.lock:
+            self.offset = os.path.getsize(self.path)
+
+    def read_new(self):
+        """
+        Các bản ghi mới của worker khác từ lần đọc trước (dòng đang ghi dở được để lần sau)
+        """
+        with self.lock:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                return []
+            if size <= self.offset:
+                return []
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read(size - self.offset)
+            end = data.rfind(b'\n') + 1
+            self.offset += end
+        pid = os.getpid()
+        records = []
+        for line in data[:end].splitlines():
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            if item.get("pid") != pid:
+                records.append(item.get("record"))
+        return records
+
+# Journal của lần chạy pre-fork hiện tại (None khi chỉ có một tiến trình)
+shared_journal = None
+
+def create_listener(host, port, backlog=LISTEN_BACKLOG):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    listener = socket.create_server((host, port), family=family, backlog=backlog)
+    listener.set_inheritable(True)
+    return listener
+
+def run_worker(app, host, port, listener, access_log=False):
+    """
+    Vòng phục vụ của một worker trên socket đã mở sẵn, dừng khi nhận SIGTERM/SIGINT
+    """
+    if not access_log:
+        # Mỗi request một dòng log trên stderr là đáng kể khi tải cao
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+
+    def stop(signum, frame):
+        # shutdown() chờ serve_forever() kết thúc nên phải gọi từ luồng khác
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    server.serve_forever()
+    server.server_close()
+
+def serve(app, host='0.0.0.0', port=5000, workers=DEFAULT_WORKERS, access_log=False):
+    """
+    Chạy app với `workers` tiến trình (1 hoặc hệ điều hành không có fork: chạy trong tiến trình hiện tại)
+    """
+    listener = create_listener(host, port)
+    print(f"Phục vụ trên http://{host}:{listener.getsockname()[1]} với {workers} worker (pid cha {os.getpid()})")
+    if workers <= 1 or not hasattr(os, 'fork'):
+        run_worker(app, host, port, listener, access_log)
+        return
+
+    global shared_journal
+    fd, journal_path = tempfile.mkstemp(prefix='ohl-journal-', suffix='.jsonl')
+    os.close(fd)
+    shared_journal = SharedJournal(journal_path)
+    children = {}
+    stopping = threading.Event()
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                shared_journal.skip()
+                run_worker(app, host, port, listener, access_log)
+            except BaseException:
+                logging.exception("Worker dừng do lỗi")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        stopping.set()
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if started is None or stopping.is_set():
+            continue
+        print(f"Worker {pid} dừng (mã {os.waitstatus_to_exitcode(status)}), fork lại", file=sys.stderr)
+        time.sleep(max(0.0, RESPAWN_DELAY - (time.monotonic() - started)))
+        if not stopping.is_set():
+            spawn()
+    listener.close()
+    try:
+        os.remove(journal_path)
+    except OSError:
+        pass
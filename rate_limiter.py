@@ -0,0 +1,117 @@
+import threading
+import time
+
+# Giới hạn request weight mặc định của Binance Futures (mỗi phút)
+DEFAULT_WEIGHT_LIMIT = 2400
+# Thời gian chờ mặc định khi bị 429/418 mà không có header Retry-After
+DEFAULT_BACKOFF_SECONDS = 5
+
+def get_klines_weight(limit):
+    """
+    Tính request weight của /fapi/v1/klines theo tham số limit
+    (theo bảng weight trong tài liệu của Binance Futures)
+    """
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+class WeightRateLimiter:
+    """
+    Token bucket dùng chung cho mọi luồng tải, tính theo request weight.
+
+    - Bucket được nạp lại đều đặn `weight_limit * safety_margin` token mỗi `interval` giây.
+    - Sau mỗi response, `update_from_headers` đồng bộ với X-MBX-USED-WEIGHT-1M
+      để không vượt quá số weight mà server đã ghi nhận.
+    - Khi gặp 429/418, `backoff` chặn toàn bộ các luồng cho tới khi hết thời gian chờ.
+    """
+
+    def __init__(self, weight_limit=DEFAULT_WEIGHT_LIMIT, interval=60.0, safety_margin=0.9):
+        self.weight_limit = weight_limit
+        self.capacity = weight_limit * safety_margin
+        self.refill_rate = self.capacity / interval
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+        # Thống kê
+        self.used_weight = 0
+        self.total_weight = 0
+        self.backoff_count = 0
+        self.wait_time = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.updated = now
+
+    def acquire(self, weight=1):
+        """
+        Chờ cho tới khi đủ token rồi trừ `weight` token
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= weight:
+                    self.tokens -= weight
+                    self.total_weight += weight
+                    return
+                else:
+                    wait = (weight - self.tokens) / self.refill_rate
+                self.wait_time += wait
+            time.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """
+        Đồng bộ bucket với weight đã dùng mà server trả về trong header
+        """
+        used = headers.get('X-MBX-USED-WEIGHT-1M')
+        if used is None:
+            return
+        try:
+            used = int(used)
+        except ValueError:
+            return
+
+        with self.lock:
+            self.used_weight = used
+            self._refill(time.monotonic())
+            # Server là nguồn chính xác nhất: không giữ nhiều token hơn phần weight còn lại
+            self.tokens = min(self.tokens, self.capacity - used)
+
+    def backoff(self, retry_after=None, attempt=1):
+        """
+        Tạm dừng mọi request sau khi nhận 429 (quá giới hạn) hoặc 418 (bị chặn IP)
+        """
+        try:
+            delay = float(retry_after) if retry_after is not None else None
+        except ValueError:
+            delay = None
+        if delay is None:
+            delay = DEFAULT_BACKOFF_SECONDS * attempt
+
+        with self.lock:
+            self.backoff_count += 1
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self.tokens = 0
+        return delay
+
+    def stats(self):
+        """
+        Trả về thống kê sử dụng weight
+        """
+        with self.lock:
+            return {
+                "used_weight_1m": self.used_weight,
+                "total_weight": self.total_weight,
+                "backoff_count": self.backoff_count,
+                "wait_time": round(self.wait_time, 3),
+            }
@@ -0,0 +1,264 @@
+"""
+Server WebSocket phát lại stream kline của Binance Futures từ các file CSV, để chạy follower offline
+
+- Cùng định dạng combined stream của Binance: ws://host:port/stream?streams=btcusdt@kline_15m/...
+  mỗi message là {"stream": ..., "data": {"e": "kline", "E": ..., "s": ..., "k": {...}}}
+- Một đồng hồ giả lập dùng chung: bắt đầu `bars_back` nến trước nến cuối cùng trong dữ liệu và chạy
+  nhanh hơn thời gian thật (mỗi nến kéo dài `bar_seconds` giây). Giữa nến gửi một cập nhật chưa đóng
+  (x=false), hết nến gửi nến đã đóng (x=true) cho mọi symbol đã đăng ký.
+- Chạy kèm mock REST (mock_binance) theo cùng đồng hồ: /fapi/v1/klines chỉ trả các nến đã mở,
+  /fapi/v1/time trả thời gian giả lập, nên follower bắt kịp qua REST rồi nhận tiếp qua stream.
+
+Follower chỉ ghi các nến mới hơn nến cuối nó đã có, nên dữ liệu của follower phải kết thúc trước đồng hồ
+phát lại. --seed DIR tạo một thư mục làm việc riêng cho follower: bản sao các file CSV của --directory
+cắt tới trước thời điểm bắt đầu phát lại, kèm config.json; dữ liệu gốc không bị sửa.
+
+Chạy: python replay_stream.py --bars-back 20 --bar-seconds 2 --seed /tmp/follower_run
+Sau đó: cd /tmp/follower_run && BINANCE_FAPI_URL=http://127.0.0.1:8081 BINANCE_FSTREAM_URL=ws://127.0.0.1:8765 \
+        python /đường/dẫn/tới/follower.py
+"""
+import argparse
+import glob
+import json
+import os
+import socketserver
+import threading
+import shutil
+import time
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, urlsplit
+
+import mock_binance
+from tail_reader import read_tail
+from websocket_io import WebSocket, WebSocketError, server_handshake
+
+DEFAULT_WS_PORT = 8765
+DEFAULT_REST_PORT = 8081
+# Tên thư mục dữ liệu mà binance.py/follower.py dùng (tương đối với thư mục làm việc)
+FOLLOWER_DATA_DIRECTORY = "binance_futures_data"
+
+class ReplayClock:
+    """
+    Đồng hồ giả lập (ms): bắt đầu từ start_ms, mỗi nến `interval_ms` trôi qua trong `bar_seconds` giây thật
+    """
+
+    def __init__(self, start_ms, interval_ms, bar_seconds):
+        self.start_ms = start_ms
+        self.speed = interval_ms / (bar_seconds * 1000.0)
+        self.started = time.monotonic()
+
+    def now(self):
+        return int(self.start_ms + (time.monotonic() - self.started) * 1000 * self.speed)
+
+    def sleep_until(self, target_ms, stop_event):
+        """
+        Chờ tới khi đồng hồ đạt target_ms, trả về False nếu stop_event được bật trước đó
+        """
+        remaining = (target_ms - self.now()) / 1000.0 / self.speed
+        return not stop_event.wait(max(0.0, remaining))
+
+def last_open_time(directory, interval):
+    """
+    open_time (ms) mới nhất trong các file CSV của interval
+    """
+    latest = None
+    for path in glob.glob(os.path.join(directory, f"*_{interval}.csv")):
+        tail = read_tail(path, 1)
+        if len(tail):
+            value = int(tail['open_time'].to_numpy('datetime64[ms]').astype('int64')[-1])
+            latest = value if latest is None else max(latest, value)
+    return latest
+
+def seed_workdir(source, workdir, interval, until_ms, config_file=mock_binance.CONFIG_FILE):
+    """
+    Tạo thư mục làm việc cho follower: các file CSV của interval trong `source` chỉ giữ các nến có
+    open_time < until_ms (cắt theo byte, không đổi định dạng các dòng còn lại), kèm config.json
+
+    Returns:
+    int: Số file CSV đã tạo
+    """
+    target = os.path.join(workdir, FOLLOWER_DATA_DIRECTORY)
+    if os.path.abspath(target) == os.path.abspath(source):
+        raise ValueError("Thư mục của follower phải khác thư mục dữ liệu phát lại")
+    os.makedirs(target, exist_ok=True)
+    # open_time trong CSV có dạng cố định 'YYYY-MM-DD HH:MM:SS' nên so sánh chuỗi đúng theo thời gian
+    cutoff = datetime.fromtimestamp(until_ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S').encode()
+    count = 0
+    for path in glob.glob(os.path.join(source, f"*_{interval}.csv")):
+        with open(path, 'rb') as src, open(os.path.join(target, os.path.basename(path)), 'wb') as dst:
+            dst.write(src.readline())
+            for line in src:
+                if line[:len(cutoff)] >= cutoff:
+                    break
+                dst.write(line)
+        count += 1
+    if os.path.exists(config_file):
+        shutil.copyfile(config_file, os.path.join(workdir, os.path.basename(config_file)))
+    return count
+
+def parse_streams(path):
+    """
+    Danh sách (symbol, interval) từ đường dẫn /stream?streams=btcusdt@kline_15m/ethusdt@kline_15m
+    """
+    query = parse_qs(urlsplit(path).query)
+    streams = []
+    for name in '/'.join(query.get('streams', [])).split('/'):
+        symbol, _, kind = name.partition('@kline_')
+        if symbol and kind:
+            streams.append((symbol.upper(), kind))
+    return streams
+
+def kline_event(symbol, interval, data, index, closed):
+    """
+    Message combined stream cho nến thứ `index` trong dữ liệu của symbol (chuỗi số giống API thật)
+    """
+    rows = data["rows"]
+    open_time = int(data["open_time"][index])
+    close_time = int(data["close_time"][index])
+    values = {
+        "o": rows[index][1], "h": rows[index][2], "l": rows[index][3], "c": rows[index][4],
+        "v": rows[index][5], "q": rows[index][7], "V": rows[index][9], "Q": rows[index][10],
+    }
+    if not closed:
+        # Cập nhật giữa nến: mới chỉ có giá mở cửa
+        values.update({"h": values["o"], "l": values["o"], "c": values["o"],
+                       "v": "0", "q": "0", "V": "0", "Q": "0"})
+    kline = {
+        "t": open_time, "T": close_time, "s": symbol, "i": interval, "f": 0, "L": 0,
+        "o": values["o"], "c": values["c"], "h": values["h"], "l": values["l"], "v": values["v"],
+        "n": int(data["trades"][index]) if closed else 0, "x": closed,
+        "q": values["q"], "V": values["V"], "Q": values["Q"], "B": "0",
+    }
+    event_time = close_time if closed else open_time + (close_time - open_time) // 2
+    return json.dumps({
+        "stream": f"{symbol.lower()}@kline_{interval}",
+        "data": {"e": "kline", "E": event_time, "s": symbol, "k": kline},
+    })
+
+class ReplayHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            path = server_handshake(self.connection, self.rfile)
+        except (WebSocketError, ConnectionError, OSError):
+            return
+        ws = WebSocket(self.connection, self.rfile, mask=False)
+        try:
+            self.server.replay(ws, parse_streams(path))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            ws.close()
+
+class ReplayServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, clock, interval):
+        super().__init__(address, ReplayHandler)
+        self.clock = clock
+        self.interval = interval
+        self.interval_ms = mock_binance.INTERVAL_MS[interval]
+        # Mỗi kết nối có một Event dừng, được bật khi client đóng kết nối hoặc server dừng
+        self.active = set()
+        self.connections = 0
+
+    def replay(self, ws, streams):
+        """
+        Gửi các nến theo đồng hồ cho tới khi client đóng kết nối hoặc server dừng
+        """
+        self.connections += 1
+        data = {}
+        for symbol, interval in streams:
+            if interval == self.interval:
+                loaded = mock_binance.load_symbol(symbol, interval)
+                if loaded is not None:
+                    data[symbol] = loaded
+
+        stop = threading.Event()
+        self.active.add(stop)
+
+        # Luồng đọc: trả lời ping và phát hiện client đóng kết nối
+        def read_loop():
+            try:
+                while ws.recv() is not None:
+                    pass
+            except (ConnectionError, OSError, WebSocketError):
+                pass
+            stop.set()
+
+        threading.Thread(target=read_loop, daemon=True).start()
+        try:
+            self._send_bars(ws, data, stop)
+        finally:
+            self.active.discard(stop)
+
+    def _send_bars(self, ws, data, stop):
+        bar = self.clock.now() // self.interval_ms * self.interval_ms
+        while not stop.is_set():
+            indexes = {}
+            for symbol, values in data.items():
+                position = int(values["open_time"].searchsorted(bar))
+                if position < len(values["open_time"]) and values["open_time"][position] == bar:
+                    indexes[symbol] = position
+            for closed_bar, target in ((False, bar + self.interval_ms // 2), (True, bar + self.interval_ms)):
+                if not self.clock.sleep_until(target, stop):
+                    return
+                for symbol, index in indexes.items():
+                    ws.send_text(kline_event(symbol, self.interval, data[symbol], index, closed_bar))
+            bar += self.interval_ms
+
+    def shutdown(self):
+        for stop in list(self.active):
+            stop.set()
+        super().shutdown()
+
+def start_replay(bars_back=20, bar_seconds=2.0, interval='15m', host='127.0.0.1', ws_port=0, rest_port=0,
+                 directory=None):
+    """
+    Chạy server phát lại và mock REST trong luồng nền
+
+    Returns:
+    tuple: (ReplayServer, mock REST server, ws_url, rest_url, clock)
+    """
+    if directory is not None:
+        mock_binance.DATA_DIRECTORY = directory
+    interval_ms = mock_binance.INTERVAL_MS[interval]
+    latest = last_open_time(mock_binance.DATA_DIRECTORY, interval)
+    if latest is None:
+        raise FileNotFoundError(f"Không có file CSV {interval} trong {mock_binance.DATA_DIRECTORY}")
+    clock = ReplayClock(latest - (bars_back - 1) * interval_ms, interval_ms, bar_seconds)
+    mock_binance.settings["clock"] = clock.now
+
+    ws_server = ReplayServer((host, ws_port), clock, interval)
+    threading.Thread(target=ws_server.serve_forever, daemon=True).start()
+    rest_server, rest_url = mock_binance.start_in_thread(host, rest_port)
+    return ws_server, rest_server, f"ws://{host}:{ws_server.server_address[1]}", rest_url, clock
+
+def main():
+    parser = argparse.ArgumentParser(description="Phát lại stream kline của Binance Futures từ file CSV")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_WS_PORT, help="Cổng WebSocket")
+    parser.add_argument('--rest-port', type=int, default=DEFAULT_REST_PORT, help="Cổng mock REST")
+    parser.add_argument('--interval', default='15m')
+    parser.add_argument('--bars-back', type=int, default=20, help="Bắt đầu phát lại từ bao nhiêu nến trước nến cuối")
+    parser.add_argument('--bar-seconds', type=float, default=2.0, help="Thời gian thật của mỗi nến (giây)")
+    parser.add_argument('--directory', default=mock_binance.DATA_DIRECTORY, help="Thư mục CSV để phát lại")
+    parser.add_argument('--seed', help="Tạo thư mục làm việc cho follower với dữ liệu kết thúc trước đồng hồ phát lại")
+    args = parser.parse_args()
+
+    ws_server, rest_server, ws_url, rest_url, clock = start_replay(
+        args.bars_back, args.bar_seconds, args.interval, args.host, args.port, args.rest_port, args.directory)
+    if args.seed:
+        count = seed_workdir(args.directory, args.seed, args.interval, clock.start_ms)
+        print(f"Đã tạo {count} file CSV cho follower trong {args.seed}, chạy follower.py từ thư mục đó")
+    print(f"Stream: {ws_url}/stream?streams=<symbol>@kline_{args.interval}/...")
+    print(f"REST:   {rest_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        ws_server.shutdown()
+        rest_server.shutdown()
+
+if __name__ == '__main__':
+    main()
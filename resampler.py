@@ -0,0 +1,200 @@
+"""
+Tạo khung thời gian lớn hơn (1h/4h/1d...) từ nến 15m đã lưu, bằng các phép gộp vectorized của NumPy
+
+Quy tắc gộp giống Binance: open đầu tiên, high lớn nhất, low nhỏ nhất, close cuối cùng,
+cộng dồn volume, quote volume, số giao dịch và taker volume.
+Các bucket được căn theo UTC (1w bắt đầu từ thứ Hai như Binance).
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from single_flight import SingleFlight
+
+BASE_TIMEFRAME = '15m'
+
+TIMEFRAME_MS = {
+    '15m': 15 * 60 * 1000,
+    '30m': 30 * 60 * 1000,
+    '1h': 60 * 60 * 1000,
+    '2h': 2 * 60 * 60 * 1000,
+    '4h': 4 * 60 * 60 * 1000,
+    '6h': 6 * 60 * 60 * 1000,
+    '8h': 8 * 60 * 60 * 1000,
+    '12h': 12 * 60 * 60 * 1000,
+    '1d': 24 * 60 * 60 * 1000,
+    '1w': 7 * 24 * 60 * 60 * 1000,
+}
+# 1970-01-01 là thứ Năm, nến tuần của Binance bắt đầu từ thứ Hai (1970-01-05)
+TIMEFRAME_OFFSET_MS = {
+    '1w': 4 * 24 * 60 * 60 * 1000,
+}
+
+FIRST_COLUMNS = ['open']
+LAST_COLUMNS = ['close']
+MAX_COLUMNS = ['high']
+MIN_COLUMNS = ['low']
+SUM_COLUMNS = ['volume', 'quote_asset_volume', 'number_of_trades',
+               'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume']
+
+def can_resample(timeframe, base_timeframe=BASE_TIMEFRAME):
+    """
+    Timeframe có tạo được từ base_timeframe không (lớn hơn và chia hết)
+    """
+    if timeframe not in TIMEFRAME_MS or base_timeframe not in TIMEFRAME_MS:
+        return False
+    target, base = TIMEFRAME_MS[timeframe], TIMEFRAME_MS[base_timeframe]
+    return target > base and target % base == 0
+
+def bucket_start(open_time, timeframe):
+    """
+    Thời điểm mở của bucket chứa mỗi open_time (ms)
+    """
+    target = TIMEFRAME_MS[timeframe]
+    offset = TIMEFRAME_OFFSET_MS.get(timeframe, 0)
+    return (open_time - offset) // target * target + offset
+
+def frame_to_columns(df):
+    """
+    DataFrame (open_time dạng datetime) -> dict mảng NumPy, open_time dạng int64 ms
+    """
+    columns = {name: df[name].to_numpy() for name in
+               FIRST_COLUMNS + LAST_COLUMNS + MAX_COLUMNS + MIN_COLUMNS + SUM_COLUMNS if name in df}
+    columns['open_time'] = df['open_time'].to_numpy('datetime64[ms]').astype(np.int64)
+    return columns
+
+def resample_columns(columns, timeframe):
+    """
+    Gộp các nến (dict mảng, open_time int64 ms, đã sắp xếp) sang timeframe lớn hơn
+
+    Returns:
+    dict: Các cột đã gộp, kèm 'close_time' và 'count' (số nến gốc trong mỗi bucket)
+    """
+    open_time = columns['open_time']
+    if len(open_time) == 0:
+        empty = {name: values[:0] for name, values in columns.items()}
+        empty['close_time'] = open_time[:0]
+        empty['count'] = np.empty(0, dtype=np.int64)
+        return empty
+
+    buckets = bucket_start(open_time, timeframe)
+    # Vị trí bắt đầu của mỗi bucket
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(buckets)) + 1])
+    ends = np.concatenate([starts[1:], [len(buckets)]])
+
+    result = {'open_time': buckets[starts]}
+    for name in FIRST_COLUMNS:
+        result[name] = columns[name][starts]
+    for name in LAST_COLUMNS:
+        result[name] = columns[name][ends - 1]
+    for name in MAX_COLUMNS:
+        result[name] = np.maximum.reduceat(columns[name], starts)
+    for name in MIN_COLUMNS:
+        result[name] = np.minimum.reduceat(columns[name], starts)
+    for name in SUM_COLUMNS:
+        if name in columns:
+            result[name] = np.add.reduceat(columns[name], starts)
+    result['close_time'] = result['open_time'] + TIMEFRAME_MS[timeframe] - 1
+    result['count'] = ends - starts
+    return result
+
+def columns_to_frame(columns):
+    """
+    dict mảng -> DataFrame với open_time/close_time dạng datetime như file CSV
+    """
+    data = {name: values for name, values in columns.items() if name != 'count'}
+    data['open_time'] = columns['open_time'].astype('datetime64[ms]')
+    data['close_time'] = columns['close_time'].astype('datetime64[ms]')
+    ordered = ['open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time']
+    ordered += [name for name in data if name not in ordered]
+    return pd.DataFrame({name: data[name] for name in ordered})
+
+def resample(df, timeframe):
+    """
+    Gộp DataFrame nến gốc sang timeframe lớn hơn
+    """
+    return columns_to_frame(resample_columns(frame_to_columns(df), timeframe))
+
+class ResampleCache:
+    """
+    Cache kết quả gộp theo (symbol, timeframe), cập nhật tăng dần khi có nến gốc mới
+
+    Khi nến 15m mới được ghi thêm, chỉ bucket cuối cùng (có thể chưa đủ nến) và các bucket mới
+    được tính lại; các bucket đã đóng được giữ nguyên.
+    """
+
+    def __init__(self, frame_cache, base_timeframe=BASE_TIMEFRAME, max_entries=256):
+        self.frame_cache = frame_cache
+        self.base_timeframe = base_timeframe
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.full_builds = 0
+        self.incremental_updates = 0
+        self.flights = SingleFlight()
+
+    def get(self, symbol, timeframe):
+        """
+        Trả về DataFrame đã gộp, hoặc None nếu không có dữ liệu gốc
+        """
+        source = self.frame_cache.get(symbol, self.base_timeframe)
+        if source is None:
+            return None
+        source_open_time = source['open_time'].to_numpy('datetime64[ms]').astype(np.int64)
+        key = (symbol, timeframe)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+
+        n_rows = len(source_open_time)
+        if entry is not None and entry['source_rows'] == n_rows and n_rows > 0 \
+                and source_open_time[n_rows - 1] == entry['source_last']:
+            return entry['frame']
+        # Nhiều request cùng lúc cho một timeframe cần tính lại: chỉ một luồng tính, các luồng khác dùng chung
+        source_last = source_open_time[-1] if n_rows else None
+        return self.flights.do((symbol, timeframe, n_rows, source_last),
+                               self._rebuild, key, entry, source, source_open_time, timeframe)
+
+    def _rebuild(self, key, entry, source, source_open_time, timeframe):
+        n_rows = len(source_open_time)
+        if entry is not None and entry['source_rows'] <= n_rows and entry['source_rows'] > 0 \
+                and source_open_time[entry['source_rows'] - 1] == entry['source_last']:
+            columns = self._update(entry['columns'], source, source_open_time, timeframe)
+            self.incremental_updates += 1
+        else:
+            columns = resample_columns(frame_to_columns(source), timeframe)
+            self.full_builds += 1
+
+        entry = {
+            'columns': columns,
+            'frame': columns_to_frame(columns),
+            'source_rows': n_rows,
+            'source_last': source_open_time[-1] if n_rows else None,
+        }
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry['frame']
+
+    def _update(self, columns, source, source_open_time, timeframe):
+        """
+        Tính lại từ bucket cuối cùng đã có, giữ nguyên các bucket trước đó
+        """
+        if len(columns['open_time']) == 0:
+            return resample_columns(frame_to_columns(source), timeframe)
+
+        last_bucket = columns['open_time'][-1]
+        start = int(np.searchsorted(source_open_time, last_bucket, side='left'))
+        tail = resample_columns(frame_to_columns(source.iloc[start:]), timeframe)
+        return {name: np.concatenate([values[:-1], tail[name]]) for name, values in columns.items()}
+
+    def invalidate(self, symbol):
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == symbol]:
+                del self.entries[key]
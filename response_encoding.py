@@ -0,0 +1,182 @@
+"""
+Mã hóa response /api/data theo cột, không tạo list Python cho từng nến
+
+- rows: định dạng cũ, mỗi nến một mảng [timestamp, open, high, low, close, volume]
+- columns: JSON theo cột {"timestamp": [...], "open": [...], ...}; mỗi cột được ghi bằng encoder C
+  của pandas với số chữ số thập phân nhỏ nhất giữ nguyên giá trị (VD: 0.3147 thay vì 0.31470000001)
+- binary: các cột thô little-endian (timestamp int64, còn lại float64) sau một header nhỏ, đọc được
+  trực tiếp bằng BigInt64Array/Float64Array trong JS:
+    header 16 byte: magic 'OHLB' (4s), version (H), số cột (H), số nến (Q)
+    mỗi cột 24 byte: tên (16s, đệm \\0), kiểu ('q' int64 / 'd' float64) (c), 7 byte đệm
+    sau đó là dữ liệu từng cột nối tiếp (mọi cột bắt đầu ở offset chia hết cho 8)
+- arrow: Arrow IPC stream (cần pyarrow)
+
+Nén gzip (hoặc brotli nếu có thư viện brotli) khi client chấp nhận.
+"""
+import gzip
+import hashlib
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+FORMAT_ROWS = 'rows'
+FORMAT_COLUMNS = 'columns'
+FORMAT_BINARY = 'binary'
+FORMAT_ARROW = 'arrow'
+
+MIMETYPES = {
+    FORMAT_ROWS: 'application/json',
+    FORMAT_COLUMNS: 'application/json',
+    FORMAT_BINARY: 'application/octet-stream',
+    FORMAT_ARROW: 'application/vnd.apache.arrow.stream',
+}
+
+BINARY_MAGIC = b'OHLB'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sHHQ')
+BINARY_COLUMN = struct.Struct('<16sc7x')
+
+# Số chữ số thập phân tối đa khi ghi JSON bằng encoder của pandas, cột cần nhiều hơn thì dùng repr
+JSON_MAX_DECIMALS = 10
+# Không nén body nhỏ hơn ngưỡng này
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+def available_formats():
+    formats = [FORMAT_ROWS, FORMAT_COLUMNS, FORMAT_BINARY]
+    if pyarrow is not None:
+        formats.append(FORMAT_ARROW)
+    return formats
+
+def available_encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def negotiate_format(format_param, accept_mimetypes):
+    """
+    Chọn định dạng: tham số format được ưu tiên, sau đó đến header Accept, mặc định là rows
+
+    accept_mimetypes: request.accept_mimetypes của Flask
+    """
+    formats = available_formats()
+    if format_param:
+        if format_param not in formats:
+            raise ValueError(f"Định dạng không hỗ trợ: {format_param} (chỉ hỗ trợ {', '.join(formats)})")
+        return format_param
+    # Chỉ chọn binary/arrow khi client yêu cầu rõ ràng (không tính */*)
+    for name in (FORMAT_ARROW, FORMAT_BINARY):
+        if name in formats and MIMETYPES[name] in accept_mimetypes.values():
+            return name
+    return FORMAT_ROWS
+
+def frame_columns(df, columns):
+    """
+    Các cột của response dạng mảng NumPy: timestamp (Unix giây, int64) và các cột giá/khối lượng (float64)
+    """
+    data = {}
+    for name in columns:
+        if name == 'timestamp':
+            data[name] = pd.to_datetime(df['open_time']).to_numpy('datetime64[s]').astype(np.int64)
+        else:
+            data[name] = df[name].to_numpy(dtype=np.float64)
+    return data
+
+def json_decimals(values):
+    """
+    Số chữ số thập phân nhỏ nhất để làm tròn không làm đổi giá trị nào, None nếu cần nhiều hơn JSON_MAX_DECIMALS
+    """
+    if not np.all(np.isfinite(values)):
+        return None
+    for decimals in range(JSON_MAX_DECIMALS + 1):
+        if np.array_equal(np.round(values, decimals), values):
+            return decimals
+    return None
+
+def column_to_json(values):
+    if values.dtype.kind in 'iu':
+        return pd.Series(values, copy=False).to_json(orient='values')
+    decimals = json_decimals(values)
+    if decimals is None:
+        # Giá trị cộng dồn (VD: volume của nến đã gộp) có thể cần đủ 17 chữ số
+        return json.dumps(values.tolist())
+    return pd.Series(values, copy=False).to_json(orient='values', double_precision=decimals)
+
+def encode_columns_json(envelope, symbol_key, market, columns):
+    """
+    JSON của response với data theo cột, ghép từ chuỗi JSON của từng cột
+
+    envelope: các khóa cấp ngoài (datatype, markettype); market: phần marketdata của symbol, không gồm data
+    """
+    data = '{' + ','.join(f'{json.dumps(name)}:{column_to_json(values)}' for name, values in columns.items()) + '}'
+    market_json = json.dumps(market)
+    market_json = f'{market_json[:-1]}, "data": {data}}}' if market else f'{{"data": {data}}}'
+    outer = json.dumps(envelope)[:-1]
+    separator = ', ' if envelope else ''
+    return f'{outer}{separator}"marketdata": {{{json.dumps(symbol_key)}: {market_json}}}}}'.encode()
+
+def encode_binary(columns):
+    """
+    Returns:
+    list: các đoạn bytes/memoryview của body (header rồi từng cột), gửi lần lượt không cần ghép lại
+    """
+    n_rows = len(next(iter(columns.values()))) if columns else 0
+    chunks = [BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(columns), n_rows)]
+    descriptors = []
+    for name, values in columns.items():
+        kind = b'q' if values.dtype.kind in 'iu' else b'd'
+        descriptors.append(BINARY_COLUMN.pack(name.encode(), kind))
+    chunks.append(b''.join(descriptors))
+    for values in columns.values():
+        dtype = '<i8' if values.dtype.kind in 'iu' else '<f8'
+        chunks.append(memoryview(np.ascontiguousarray(values, dtype=dtype)).cast('B'))
+    return chunks
+
+def decode_binary(body):
+    """
+    Đọc lại body binary thành dict các mảng NumPy (dùng cho kiểm tra và client Python)
+    """
+    magic, version, n_columns, n_rows = BINARY_HEADER.unpack_from(body, 0)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("Body binary không đúng định dạng")
+    offset = BINARY_HEADER.size
+    descriptors = []
+    for _ in range(n_columns):
+        name, kind = BINARY_COLUMN.unpack_from(body, offset)
+        descriptors.append((name.rstrip(b'\0').decode(), '<i8' if kind == b'q' else '<f8'))
+        offset += BINARY_COLUMN.size
+    columns = {}
+    for name, dtype in descriptors:
+        columns[name] = np.frombuffer(body, dtype=dtype, count=n_rows, offset=offset)
+        offset += n_rows * 8
+    return columns
+
+def encode_arrow(columns):
+    table = pyarrow.table({name: pyarrow.array(values) for name, values in columns.items()})
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+def make_etag(*parts):
+    """
+    ETag từ các tham số của request và nến cuối của dữ liệu (đổi khi có nến mới hoặc nến cuối được cập nhật)
+    """
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
@@ -0,0 +1,258 @@
+"""
+Quét toàn bộ các symbol cùng lúc theo điều kiện vào lệnh của backtest.html (checkAndExecuteTrades)
+
+- load_panel: đọc `bars` nến cuối của mọi symbol vào các mảng 2 chiều (symbol x thời gian) căn theo
+  cùng một trục thời gian kết thúc ở nến mới nhất; ô không có dữ liệu là NaN
+- Chỉ báo được tính một lần cho mọi symbol: EMA chạy theo trục thời gian (mỗi bước là một phép tính
+  vector trên mọi symbol), LWMA và Donchian tính trên toàn mảng. Cùng thứ tự phép tính như indicators.py
+  nên mỗi dòng trùng khớp với indicators.ema/lwma/donchian trên các nến của symbol đó trong cửa sổ
+- Symbol mới niêm yết (ít nến hơn `bars`) bắt đầu tính từ nến đầu tiên của nó; symbol không có nến
+  mới nhất (ngừng giao dịch, chưa cập nhật) không được chọn
+
+LONG: close > EMA và LWMA > Donchian middle; SHORT: close < EMA và LWMA < Donchian middle (tại nến cuối).
+EMA khởi tạo từ nến đầu của cửa sổ nên `bars` cần đủ lớn so với ema_period (mặc định 500).
+
+Chạy: python scanner.py --ema 20 --lwma 14 --donchian 20 --side long
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import candle_store
+from data_cache import CONFIG_FILE, DATA_DIRECTORY, ConfigCache, FrameCache, resolve_source
+from resampler import TIMEFRAME_MS, ResampleCache, can_resample
+
+DEFAULT_BARS = 500
+PANEL_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+SIDES = ('long', 'short', 'both')
+
+def config_symbols(config_file=CONFIG_FILE):
+    """
+    Danh sách symbol (fullname) trong marketdata của config.json
+    """
+    marketdata = ConfigCache(config_file).marketdata()
+    return [item.get("fullname", key.upper()) for key, item in marketdata.items()]
+
+def store_loader(directory=DATA_DIRECTORY, fallback=None):
+    """
+    Hàm đọc nến cho load_panel: lấy thẳng các cột đã memory-map từ candle store (không tạo DataFrame),
+    symbol chưa có store mới hơn CSV thì đọc bằng fallback (mặc định FrameCache().get, timeframe không có
+    file riêng thì gộp từ nến 15m qua ResampleCache như server.py)
+    """
+    if fallback is None:
+        frame_cache = FrameCache(directory=directory)
+        resample_cache = ResampleCache(frame_cache)
+
+        def fallback(symbol, timeframe, limit):
+            if resolve_source(symbol, timeframe, directory)[0] is None and can_resample(timeframe):
+                df = resample_cache.get(symbol, timeframe)
+                return df.tail(limit) if df is not None else None
+            return frame_cache.get(symbol, timeframe, limit)
+
+    def load(symbol, timeframe, limit):
+        path, _ = resolve_source(symbol, timeframe, directory)
+        if path is not None and path.endswith(candle_store.STORE_SUFFIX):
+            return candle_store.read_columns(path, ['open_time'] + PANEL_COLUMNS, last=limit)
+        return fallback(symbol, timeframe, limit)
+
+    return load
+
+def load_panel(symbols, timeframe='15m', bars=DEFAULT_BARS, load=None):
+    """
+    Đọc `bars` nến cuối của các symbol vào mảng (số symbol, bars) căn theo open_time
+
+    load: hàm (symbol, timeframe, limit) -> DataFrame (hoặc dict cột, open_time tính bằng ms) hoặc None,
+          mặc định là store_loader()
+
+    Returns:
+    dict: symbols, time (Unix giây của từng cột), open/high/low/close/volume (mảng 2 chiều float64),
+          count (số nến có dữ liệu của mỗi symbol)
+    """
+    if load is None:
+        load = store_loader()
+    interval = TIMEFRAME_MS[timeframe]
+    frames = []
+    for symbol in symbols:
+        df = load(symbol, timeframe, bars)
+        if df is None or len(df) == 0:
+            continue
+        open_time = np.asarray(df['open_time'])
+        if open_time.dtype.kind == 'M':
+            open_time = open_time.astype('datetime64[ms]').astype(np.int64)
+        frames.append((symbol, open_time, df))
+
+    panel = {"symbols": [symbol for symbol, _, _ in frames]}
+    if not frames:
+        panel["time"] = np.empty(0, dtype=np.int64)
+        for name in PANEL_COLUMNS:
+            panel[name] = np.empty((0, 0))
+        panel["count"] = np.empty(0, dtype=np.int64)
+        return panel
+
+    end = max(int(open_time[-1]) for _, open_time, _ in frames)
+    start = end - (bars - 1) * interval
+    panel["time"] = (start + np.arange(bars, dtype=np.int64) * interval) // 1000
+    for name in PANEL_COLUMNS:
+        panel[name] = np.full((len(frames), bars), np.nan)
+    count = np.zeros(len(frames), dtype=np.int64)
+    for row, (_, open_time, df) in enumerate(frames):
+        offset = open_time - start
+        first = int(offset[0]) // interval
+        if offset[0] >= 0 and offset[0] % interval == 0 and offset[-1] - offset[0] == (len(offset) - 1) * interval:
+            # Trường hợp thường gặp: nến liên tục, chép thẳng vào cuối dòng
+            for name in PANEL_COLUMNS:
+                panel[name][row, first:first + len(offset)] = df[name]
+            count[row] = len(offset)
+            continue
+        # Bỏ nến ngoài cửa sổ và nến lệch lưới thời gian
+        mask = (offset >= 0) & (offset % interval == 0)
+        columns = offset[mask] // interval
+        for name in PANEL_COLUMNS:
+            panel[name][row, columns] = np.asarray(df[name], dtype=np.float64)[mask]
+        count[row] = len(columns)
+    panel["count"] = count
+    return panel
+
+def ema_2d(values, period):
+    """
+    EMA theo từng dòng, khởi tạo bằng SMA của `period` giá trị đầu tiên của dòng (bỏ qua NaN ở đầu)
+    """
+    rows, n = values.shape
+    out = np.full((n, rows), np.nan)
+    if period < 2 or n < period or rows == 0:
+        return out.T
+    k = 2 / (period + 1)
+    # Mỗi cột của by_time là một thời điểm của mọi symbol (liền nhau trong bộ nhớ)
+    by_time = np.ascontiguousarray(values.T)
+    valid = ~np.isnan(values)
+    first = np.where(valid.any(axis=1), valid.argmax(axis=1), n)
+    seed_index = first + period - 1
+
+    # SMA khởi tạo: cộng lần lượt `period` giá trị đầu của mỗi dòng như indicators.ema
+    row_index = np.arange(rows)
+    total = np.zeros(rows)
+    for j in range(period):
+        total = total + by_time[np.minimum(first + j, n - 1), row_index]
+    seed = total / period
+
+    last = np.full(rows, np.nan)
+    for i in range(int(seed_index.min()), n):
+        running = by_time[i] * k + last * (1 - k)
+        last = np.where(seed_index == i, seed, np.where(seed_index < i, running, last))
+        out[i] = last
+    return out.T
+
+def weighted_ma_2d(values, weights):
+    """
+    Trung bình có trọng số theo từng dòng (như indicators.weighted_ma)
+    """
+    weights = [float(w) for w in weights]
+    period = len(weights)
+    rows, n = values.shape
+    out = np.full((rows, n), np.nan)
+    weight_sum = 0.0
+    for w in weights:
+        weight_sum += w
+    if period < 2 or n < period or weight_sum == 0:
+        return out
+    total = np.zeros((rows, n - period + 1))
+    for j, w in enumerate(weights):
+        total = total + values[:, period - 1 - j:n - j] * w
+    out[:, period - 1:] = total / weight_sum
+    return out
+
+def lwma_2d(values, period):
+    if period < 2:
+        return np.full(values.shape, np.nan)
+    return weighted_ma_2d(values, [period - j for j in range(period)])
+
+def donchian_middle_2d(high, low, period):
+    rows, n = high.shape
+    middle = np.full((rows, n), np.nan)
+    if period < 2 or n < period:
+        return middle
+    # So sánh lần lượt với các cửa sổ dịch chuyển: nhanh hơn max trên sliding_window_view theo trục cuối
+    upper = high[:, period - 1:]
+    lower = low[:, period - 1:]
+    for j in range(1, period):
+        upper = np.maximum(upper, high[:, period - 1 - j:n - j])
+        lower = np.minimum(lower, low[:, period - 1 - j:n - j])
+    middle[:, period - 1:] = (upper + lower) / 2
+    return middle
+
+def scan(panel, ema_period=20, lwma_period=14, donchian_period=20, lwma_weights=None, side='both'):
+    """
+    Các symbol thỏa điều kiện vào lệnh tại nến cuối của panel
+
+    Returns:
+    list: mỗi phần tử là dict symbol, side, time, close, ema, lwma, donchian_middle
+    """
+    if not panel["symbols"]:
+        return []
+    close = panel["close"]
+    ema_values = ema_2d(close, ema_period)[:, -1]
+    if lwma_weights and len(lwma_weights) > 1:
+        lwma_values = weighted_ma_2d(close, lwma_weights)[:, -1]
+    else:
+        lwma_values = lwma_2d(close, lwma_period)[:, -1]
+    middle = donchian_middle_2d(panel["high"], panel["low"], donchian_period)[:, -1]
+    last_close = close[:, -1]
+
+    # Như backtest: chỉ xét nến có chỉ số >= max(các chu kỳ); so sánh với NaN luôn False
+    enough = panel["count"] > max(ema_period, lwma_period, donchian_period)
+    long_mask = enough & (last_close > ema_values) & (lwma_values > middle)
+    short_mask = enough & (last_close < ema_values) & (lwma_values < middle)
+
+    matches = []
+    for name, mask in (("long", long_mask), ("short", short_mask)):
+        if side not in (name, 'both'):
+            continue
+        for row in np.flatnonzero(mask):
+            matches.append({
+                "symbol": panel["symbols"][row],
+                "side": name,
+                "time": int(panel["time"][-1]),
+                "close": float(last_close[row]),
+                "ema": float(ema_values[row]),
+                "lwma": float(lwma_values[row]),
+                "donchian_middle": float(middle[row]),
+            })
+    return matches
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Quét điều kiện vào lệnh trên mọi symbol trong config.json")
+    parser.add_argument('--timeframe', default='15m', choices=sorted(TIMEFRAME_MS))
+    parser.add_argument('--bars', type=int, default=DEFAULT_BARS, help="Số nến cuối đọc cho mỗi symbol")
+    parser.add_argument('--ema', type=int, default=20)
+    parser.add_argument('--lwma', type=int, default=14)
+    parser.add_argument('--donchian', type=int, default=20)
+    parser.add_argument('--side', default='both', choices=SIDES)
+    parser.add_argument('--config', default=CONFIG_FILE)
+    parser.add_argument('--json', action='store_true', help="In kết quả dạng JSON")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    start = time.perf_counter()
+    panel = load_panel(config_symbols(args.config), args.timeframe, args.bars)
+    loaded = time.perf_counter()
+    matches = scan(panel, args.ema, args.lwma, args.donchian, side=args.side)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(matches, indent=2))
+        return
+    if len(panel["time"]):
+        bar_time = datetime.fromtimestamp(int(panel["time"][-1]), tz=timezone.utc).strftime('%Y-%m-%d %H:%M')
+        print(f"Nến {bar_time} UTC, {len(panel['symbols'])} symbol, đọc {(loaded - start) * 1000:.0f} ms, "
+              f"tổng {elapsed * 1000:.0f} ms")
+    for match in matches:
+        print(f"{match['side'].upper():5s} {match['symbol']:20s} close={match['close']:<12g} "
+              f"ema={match['ema']:<12.6g} lwma={match['lwma']:<12.6g} donchian={match['donchian_middle']:.6g}")
+    print(f"{len(matches)} symbol thỏa điều kiện")
+
+if __name__ == '__main__':
+    main()
@@ -1,91 +1,534 @@
-
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 import pandas as pd
+import numpy as np
 import requests
+import argparse
 import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import pytz
 
+from cross_analytics import AnalyticsCache, time_axis, to_json_values
+from data_cache import ConfigCache, FrameCache, parse_time_param, resolve_source, slice_by_time
+from kline_ingest import KLINE_FIELDS, pages_to_dataframe
+from metrics import registry as metrics
+from resampler import ResampleCache, can_resample
+import prefork_server
+import response_encoding
+import scanner
+
 app = Flask(__name__)
 
+# Nguồn dữ liệu: 'local' (đọc từ DATA_DIRECTORY, có cache) hoặc 'github' (tải từ GitHub mỗi request)
+DATA_SOURCE = os.environ.get('OHL_DATA_SOURCE', 'local')
+GITHUB_BASE_URL = "https://raw.githubusercontent.com/btm2021/ohl/master"
+
+# Config và dữ liệu được parse một lần, tự làm mới khi file thay đổi
+config_cache = ConfigCache()
+frame_cache = FrameCache()
+# Timeframe lớn hơn (1h/4h/1d...) được gộp từ nến 15m khi không có file riêng
+resample_cache = ResampleCache(frame_cache)
+# Số liệu liên symbol do cross_analytics.py tính sẵn (memory-map, đọc lại khi được cập nhật)
+analytics_cache = AnalyticsCache()
+
+# Các cột của mỗi nến trong response (timestamp luôn có và đứng đầu)
+DATA_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+# /api/data/batch: số luồng đọc dữ liệu đồng thời và số symbol tối đa mỗi request
+BATCH_WORKERS = int(os.environ.get('OHL_BATCH_WORKERS', 8))
+MAX_BATCH_SYMBOLS = int(os.environ.get('OHL_MAX_BATCH_SYMBOLS', 100))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS)
+# /api/analytics: các chuỗi theo thời gian và ma trận được phục vụ, số dòng tối đa mỗi request
+ANALYTICS_SERIES = ('log_return', 'rolling_return', 'volatility')
+ANALYTICS_MATRICES = ('correlation', 'covariance')
+MAX_ANALYTICS_ROWS = 5000
+# /api/bars chỉ nhận từ máy local (follower.py chạy cùng máy)
+LOCAL_ADDRESSES = {'127.0.0.1', '::1'}
+
+metrics.describe('http_request', "Thời gian xử lý request theo endpoint")
+metrics.describe('http_requests', "Số request theo endpoint và mã trạng thái")
+metrics.describe('request_stage', "Thời gian từng bước của request: parse, load (cache/đọc file), encode, compress")
+metrics.describe('frame_cache_hit_ratio', "Tỉ lệ cache hit của FrameCache từ khi server chạy")
+metrics.describe('frame_cache_coalesced', "Số lần cache miss được gộp vào một lần đọc đang chạy cùng key (single-flight)")
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def apply_shared_bars():
+    # Chế độ pre-fork: nến mới mà worker khác nhận qua POST /api/bars
+    journal = prefork_server.shared_journal
+    if journal is not None:
+        for record in journal.read_new():
+            append_bars(record["timeframe"], record["bars"])
+
+@app.after_request
+def record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe('http_request', time.perf_counter() - started, endpoint=endpoint)
+        metrics.inc('http_requests', endpoint=endpoint, status=response.status_code)
+    return response
+
+def build_market_data(symbol, data_list, marketdata):
+    """
+    Tạo phần marketdata của response cho một symbol
+    """
+    symbol_lower = symbol.lower()
+    icon = f"https://github.com/spothq/cryptocurrency-icons/blob/master/128/icon/{symbol_lower.replace('usdt', '')}.png"
+
+    if symbol_lower in marketdata and 'symbolDesc' in marketdata[symbol_lower]:
+        symbol_desc = marketdata[symbol_lower]['symbolDesc']
+
+        # Tạo cấu trúc dữ liệu theo yêu cầu
+        return {
+            "symbol": symbol_desc.get('baseAsset', symbol.upper().replace('USDT', '')),
+            "pair": symbol_desc.get('quoteAsset', 'USDT'),
+            "fullname": symbol.upper(),
+            "icon": icon,
+            "symbolDesc": symbol_desc,
+            "data": data_list
+        }
+
+    # Nếu không tìm thấy trong config, tạo dữ liệu mặc định
+    symbol_base = symbol.upper().replace('USDT', '')
+    return {
+        "symbol": symbol_base,
+        "pair": "USDT",
+        "fullname": symbol.upper(),
+        "icon": icon,
+        "symbolDesc": {
+            "symbol": symbol.upper(),
+            "pair": symbol.upper(),
+            "baseAsset": symbol_base,
+            "quoteAsset": "USDT",
+        },
+        "data": data_list
+    }
+
+def parse_columns(value):
+    """
+    Đọc tham số columns (VD: "close,volume") thành danh sách cột theo thứ tự của DATA_COLUMNS
+    """
+    if not value:
+        return DATA_COLUMNS
+    names = {name.strip().lower() for name in value.split(',') if name.strip()}
+    unknown = names.difference(DATA_COLUMNS)
+    if unknown:
+        raise ValueError(f"Cột không hợp lệ: {', '.join(sorted(unknown))} (chỉ hỗ trợ {', '.join(DATA_COLUMNS)})")
+    return ['timestamp'] + [name for name in DATA_COLUMNS[1:] if name in names]
+
+def parse_request_window(args):
+    """
+    Đọc limit, from, to từ query string
+
+    Returns:
+    tuple: (limit, start_ms, end_ms); limit là None khi có from/to mà không truyền limit
+    """
+    limit = int(args.get('limit', 100))
+    # Khoảng thời gian (Unix giây/ms hoặc chuỗi ngày), tính theo open_time, gồm cả hai đầu
+    start_ms = parse_time_param(args.get('from'))
+    end_ms = parse_time_param(args.get('to'))
+    # Khi có from/to, limit chỉ áp dụng nếu được truyền rõ ràng
+    if (start_ms is not None or end_ms is not None) and 'limit' not in args:
+        limit = None
+    return limit, start_ms, end_ms
+
+def to_data_list(df, columns=DATA_COLUMNS):
+    """
+    Chuyển DataFrame thành danh sách [timestamp, open, high, low, close, volume]
+    (timestamp là Unix giây tính từ open_time), chỉ gồm các cột trong `columns`
+    """
+    frame = pd.DataFrame({
+        name: (pd.to_datetime(df['open_time']).to_numpy('datetime64[s]').astype(np.int64)
+               if name == 'timestamp' else df[name].to_numpy())
+        for name in columns
+    })
+    return frame.values.tolist()
+
+def load_github_csv(symbol, timeframe, start_ms=None, end_ms=None):
+    """
+    Đọc CSV trực tiếp từ GitHub (chế độ cũ, chậm)
+    """
+    csv_url = f"{GITHUB_BASE_URL}/binance_futures_data/binance_{symbol}_{timeframe}.csv"
+    df = pd.read_csv(csv_url)
+    if start_ms is not None or end_ms is not None:
+        open_time = pd.to_datetime(df['open_time']).to_numpy('datetime64[ms]').astype(np.int64)
+        mask = np.ones(len(df), dtype=bool)
+        if start_ms is not None:
+            mask &= open_time >= start_ms
+        if end_ms is not None:
+            mask &= open_time <= end_ms
+        df = df[mask]
+    return df
+
+def load_github_marketdata():
+    config_data = requests.get(f"{GITHUB_BASE_URL}/config.json").json()
+    return config_data.get("exchange", {}).get("binance", {}).get("marketdata", {})
+
+def load_local(symbol, timeframe, limit, start_ms=None, end_ms=None):
+    """
+    Đọc dữ liệu của một symbol từ thư mục dữ liệu (qua cache)
+
+    Returns:
+    DataFrame hoặc None nếu không có dữ liệu
+    """
+    has_range = start_ms is not None or end_ms is not None
+    if resolve_source(symbol, timeframe)[0] is None and can_resample(timeframe):
+        # Gộp từ nến 15m (kết quả được cache và cập nhật tăng dần)
+        df = resample_cache.get(symbol, timeframe)
+        if df is not None and has_range:
+            df = slice_by_time(df, start_ms, end_ms)
+        return df
+    if has_range:
+        # Tìm kiếm nhị phân trên index thời gian, chỉ đọc đúng khoảng cần thiết
+        return frame_cache.get_range(symbol, timeframe, start_ms, end_ms)
+    # Chỉ đọc `limit` nến cuối, không parse cả file
+    return frame_cache.get(symbol, timeframe, limit)
+
+def load_symbol_frame(symbol, timeframe, limit, start_ms=None, end_ms=None):
+    """
+    Đọc dữ liệu của một symbol theo nguồn dữ liệu, đã cắt theo limit (None nếu không có dữ liệu)
+    """
+    if DATA_SOURCE == 'github':
+        df = load_github_csv(symbol, timeframe, start_ms, end_ms)
+    else:
+        df = load_local(symbol, timeframe, limit, start_ms, end_ms)
+    if df is None:
+        return None
+    # Chỉ giữ lại số lượng dòng theo limit (từ cuối lên)
+    if limit is not None and len(df) > limit:
+        df = df.tail(limit)
+    return df
+
+def load_data_list(symbol, timeframe, limit, start_ms=None, end_ms=None, columns=DATA_COLUMNS):
+    """
+    Đọc dữ liệu của một symbol và chuyển thành data list (None nếu không có dữ liệu)
+    """
+    df = load_symbol_frame(symbol, timeframe, limit, start_ms, end_ms)
+    if df is None:
+        return None
+    return to_data_list(df, columns)
+
+def load_marketdata():
+    if DATA_SOURCE == 'github':
+        return load_github_marketdata()
+    return config_cache.marketdata()
+
+def frame_etag(df, *params):
+    """
+    ETag của response: tham số request cùng số nến, nến đầu và toàn bộ nến cuối
+    """
+    if len(df) == 0:
+        return response_encoding.make_etag(*params, 0)
+    first = df['open_time'].iloc[0]
+    last = df.iloc[-1]
+    return response_encoding.make_etag(*params, len(df), first, *last.tolist())
+
+def encoded_response(body, mimetype, etag):
+    """
+    Response với ETag, nén gzip/brotli nếu client chấp nhận và body đủ lớn
+    body: bytes hoặc list các đoạn bytes (binary gửi lần lượt khi không nén)
+    """
+    size = len(body) if isinstance(body, bytes) else sum(len(chunk) for chunk in body)
+    encoding = None
+    if size >= response_encoding.MIN_COMPRESS_SIZE:
+        encoding = request.accept_encodings.best_match(response_encoding.available_encodings())
+    if encoding is not None:
+        with metrics.timer('request_stage', stage='compress', endpoint=request.path):
+            if not isinstance(body, bytes):
+                body = b''.join(body)
+            body = response_encoding.compress(body, encoding)
+    response = Response(body, mimetype=mimetype)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+        response.headers['Content-Length'] = str(len(body))
+    elif not isinstance(body, bytes):
+        response.headers['Content-Length'] = str(size)
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+    # ETag yếu vì cùng dữ liệu có thể được gửi dưới các dạng nén khác nhau
+    response.set_etag(etag, weak=True)
+    return response
+
 @app.route('/api/data', methods=['GET'])
 def get_data():
+    """
+    Dữ liệu của một symbol
+
+    format=rows (mặc định, như cũ) | columns (JSON theo cột) | binary (cột thô) | arrow (nếu có pyarrow),
+    hoặc chọn qua header Accept. Response có ETag, If-None-Match trùng thì trả 304 không cần mã hóa lại.
+    """
     # Lấy tham số từ request
     symbol = request.args.get('symbol', 'BTCUSDT')
     timeframe = request.args.get('timeframe', '15m')
-    limit = int(request.args.get('limit', 100))
-    
-    # Tạo URL để lấy dữ liệu CSV từ GitHub
-    base_url = "https://raw.githubusercontent.com/btm2021/ohl/master/binance_futures_data"
-    csv_url = f"{base_url}/binance_{symbol}_{timeframe}.csv"
-    
-    # Lấy config từ GitHub
-    config_url = "https://raw.githubusercontent.com/btm2021/ohl/master/config.json"
-    
+
+    try:
+        with metrics.timer('request_stage', stage='parse', endpoint='/api/data'):
+            limit, start_ms, end_ms = parse_request_window(request.args)
+            columns = parse_columns(request.args.get('columns'))
+            data_format = response_encoding.negotiate_format(request.args.get('format'), request.accept_mimetypes)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        with metrics.timer('request_stage', stage='load', endpoint='/api/data'):
+            df = load_symbol_frame(symbol, timeframe, limit, start_ms, end_ms)
+        if df is None:
+            return jsonify({"error": f"Không có dữ liệu cho {symbol} ({timeframe})"}), 404
+
+        etag = frame_etag(df, symbol.upper(), timeframe, limit, start_ms, end_ms, ','.join(columns), data_format)
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+
+        mimetype = response_encoding.MIMETYPES[data_format]
+        with metrics.timer('request_stage', stage='encode', endpoint='/api/data'):
+            if data_format == response_encoding.FORMAT_ROWS:
+                # Tạo response JSON
+                response = {
+                    "datatype": "crypto",
+                    "markettype": "future",
+                    "marketdata": {symbol.lower(): build_market_data(symbol, to_data_list(df, columns), load_marketdata())}
+                }
+                body = jsonify(response).get_data()
+            else:
+                data = response_encoding.frame_columns(df, columns)
+                if data_format == response_encoding.FORMAT_COLUMNS:
+                    market = build_market_data(symbol, None, load_marketdata())
+                    market.pop("data")
+                    body = response_encoding.encode_columns_json(
+                        {"datatype": "crypto", "markettype": "future"}, symbol.lower(), market, data)
+                elif data_format == response_encoding.FORMAT_BINARY:
+                    body = response_encoding.encode_binary(data)
+                else:
+                    body = response_encoding.encode_arrow(data)
+        return encoded_response(body, mimetype, etag)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/data/batch', methods=['GET'])
+def get_data_batch():
+    """
+    Dữ liệu của nhiều symbol trong một response (VD: watchlist)
+    symbols=BTCUSDT,ETHUSDT,... cùng timeframe, limit, from, to, columns như /api/data
+
+    Các symbol được đọc đồng thời qua batch_executor; symbol không có dữ liệu hoặc lỗi được liệt kê
+    trong "errors" thay vì làm hỏng cả request.
+    """
+    symbols = list(dict.fromkeys(name.strip().upper()
+                                 for name in request.args.get('symbols', '').split(',') if name.strip()))
+    timeframe = request.args.get('timeframe', '15m')
+    if not symbols:
+        return jsonify({"error": "Thiếu tham số symbols"}), 400
+    if len(symbols) > MAX_BATCH_SYMBOLS:
+        return jsonify({"error": f"Tối đa {MAX_BATCH_SYMBOLS} symbol mỗi request"}), 400
+
     try:
-        # Đọc file CSV từ GitHub
-        df = pd.read_csv(csv_url)
-        
-        # Lấy config từ GitHub
-        config_response = requests.get(config_url)
-        config_data = config_response.json()
-        
-        # Chỉ giữ lại số lượng dòng theo limit (từ cuối lên)
-        if len(df) > limit:
-            df = df.tail(limit)
-        
-        # Chuyển đổi cột open_time sang Unix timestamp
-        df['timestamp'] = pd.to_datetime(df['open_time']).apply(lambda x: int(x.timestamp()))
-        
-        # Chỉ lấy các cột cần thiết
-        selected_columns = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
-        data_list = df[selected_columns].values.tolist()
-        
-        # Lấy thông tin symbol từ config nếu có
-        symbol_lower = symbol.lower()
-        symbol_desc = {}
-        market_data = {}
-        print(data_list)
-        if symbol_lower in config_data.get('marketdata', {}):
-            symbol_desc = config_data['marketdata'][symbol_lower]['symbolDesc']
-            
-            # Tạo cấu trúc dữ liệu theo yêu cầu
-            market_data[symbol_lower] = {
-                "symbol": symbol_desc.get('baseAsset', symbol.upper().replace('USDT', '')),
-                "pair": symbol_desc.get('quoteAsset', 'USDT'),
-                "fullname": symbol.upper(),
-                "icon": f"https://github.com/spothq/cryptocurrency-icons/blob/master/128/icon/{symbol_lower.replace('usdt', '')}.png",
-                "symbolDesc": symbol_desc,
-                "data": data_list
-            }
-        else:
-            # Nếu không tìm thấy trong config, tạo dữ liệu mặc định
-            symbol_base = symbol.upper().replace('USDT', '')
-            market_data[symbol_lower] = {
-                "symbol": symbol_base,
-                "pair": "USDT",
-                "fullname": symbol.upper(),
-                "icon": f"https://github.com/spothq/cryptocurrency-icons/blob/master/128/icon/{symbol_lower.replace('usdt', '')}.png",
-                "symbolDesc": {
-                    "symbol": symbol.upper(),
-                    "pair": symbol.upper(),
-                    "baseAsset": symbol_base,
-                    "quoteAsset": "USDT",
-                },
-                "data": data_list
-            }
-        
-        # Tạo response JSON
+        with metrics.timer('request_stage', stage='parse', endpoint='/api/data/batch'):
+            limit, start_ms, end_ms = parse_request_window(request.args)
+            columns = parse_columns(request.args.get('columns'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        marketdata = load_marketdata()
+        result = {}
+        errors = {}
+        # Mỗi symbol được đọc và chuyển thành data list trong batch_executor
+        with metrics.timer('request_stage', stage='load', endpoint='/api/data/batch'):
+            futures = {symbol: batch_executor.submit(load_data_list, symbol, timeframe, limit, start_ms, end_ms, columns)
+                       for symbol in symbols}
+            for symbol, future in futures.items():
+                try:
+                    data_list = future.result()
+                except Exception as e:
+                    errors[symbol.lower()] = str(e)
+                    continue
+                if data_list is None:
+                    errors[symbol.lower()] = f"Không có dữ liệu cho {symbol} ({timeframe})"
+                    continue
+                result[symbol.lower()] = build_market_data(symbol, data_list, marketdata)
+
         response = {
             "datatype": "crypto",
             "markettype": "future",
-            "marketdata": market_data
+            "marketdata": result
         }
-        
-        return jsonify(response)
-    
+        if errors:
+            response["errors"] = errors
+
+        with metrics.timer('request_stage', stage='encode', endpoint='/api/data/batch'):
+            return jsonify(response)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Scanner đọc thẳng candle store nếu có, còn lại (CSV, timeframe gộp, chế độ github) qua load_symbol_frame
+scan_loader = load_symbol_frame if DATA_SOURCE == 'github' else scanner.store_loader(fallback=load_symbol_frame)
+
+@app.route('/api/scan', methods=['GET'])
+def get_scan():
+    """
+    Các symbol trong config thỏa điều kiện vào lệnh tại nến mới nhất
+    timeframe, bars (số nến cuối đọc cho mỗi symbol), ema, lwma, donchian, side=long|short|both
+    """
+    timeframe = request.args.get('timeframe', '15m')
+    side = request.args.get('side', 'both')
+    try:
+        bars = int(request.args.get('bars', scanner.DEFAULT_BARS))
+        ema_period = int(request.args.get('ema', 20))
+        lwma_period = int(request.args.get('lwma', 14))
+        donchian_period = int(request.args.get('donchian', 20))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if timeframe not in scanner.TIMEFRAME_MS or side not in scanner.SIDES or bars < 2:
+        return jsonify({"error": "Tham số timeframe, side hoặc bars không hợp lệ"}), 400
+
+    try:
+        symbols = [item.get("fullname", key.upper()) for key, item in load_marketdata().items()]
+        panel = scanner.load_panel(symbols, timeframe, bars, scan_loader)
+        matches = scanner.scan(panel, ema_period, lwma_period, donchian_period, side=side)
+        return jsonify({
+            "timeframe": timeframe,
+            "time": int(panel["time"][-1]) if len(panel["time"]) else None,
+            "scanned": len(panel["symbols"]),
+            "matches": matches,
+        })
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/analytics', methods=['GET'])
+def get_analytics():
+    """
+    Số liệu liên symbol đã tính sẵn bởi cross_analytics.py (không tính lại khi có request)
+
+    kind=correlation|covariance: ma trận trên corr_window log return cuối cùng
+    kind=volatility|rolling_return|log_return: `limit` dòng cuối (mặc định 1) của chuỗi theo thời gian
+    symbols=BTCUSDT,ETHUSDT,...: chỉ lấy các symbol này (mặc định: tất cả)
+    """
+    timeframe = request.args.get('timeframe', '15m')
+    kind = request.args.get('kind', 'correlation')
+    if kind not in ANALYTICS_SERIES + ANALYTICS_MATRICES:
+        return jsonify({"error": f"kind phải là một trong {', '.join(ANALYTICS_SERIES + ANALYTICS_MATRICES)}"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 1)), 1), MAX_ANALYTICS_ROWS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    state = analytics_cache.get(timeframe)
+    if state is None:
+        return jsonify({"error": f"Chưa có số liệu {timeframe}, chạy: python cross_analytics.py --timeframe {timeframe}"}), 404
+
+    position = {symbol: index for index, symbol in enumerate(state["symbols"])}
+    requested = [name.strip().upper() for name in request.args.get('symbols', '').split(',') if name.strip()]
+    requested = list(dict.fromkeys(requested)) or state["symbols"]
+    columns = [position[symbol] for symbol in requested if symbol in position]
+    missing = [symbol for symbol in requested if symbol not in position]
+
+    etag = response_encoding.make_etag(timeframe, kind, limit, state["updated_at"], ','.join(requested))
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+
+    last_time = state["start"] + (state["rows"] - 1) * state["interval"]
+    result = {
+        "timeframe": timeframe,
+        "kind": kind,
+        "symbols": [state["symbols"][column] for column in columns],
+        "updated_at": state["updated_at"],
+    }
+    if kind in ANALYTICS_MATRICES:
+        result.update({
+            "time": last_time // 1000,
+            "window": state["corr_window"],
+            "matrix": to_json_values(state[kind][np.ix_(columns, columns)]),
+        })
+    else:
+        start_row = max(0, state["rows"] - limit)
+        result.update({
+            "window": 1 if kind == 'log_return' else state["window"],
+            "time": time_axis(state, start_row).tolist(),
+            "values": to_json_values(state[kind][start_row:][:, columns]),
+        })
+    if missing:
+        result["missing"] = missing
+    return encoded_response(jsonify(result).get_data(), 'application/json', etag)
+
+@app.route('/api/bars', methods=['POST'])
+def post_bars():
+    """
+    Nhận các nến vừa được follower.py ghi vào file và cập nhật cache tại chỗ (không đọc lại file)
+    Body: {"timeframe": "15m", "bars": {"BTCUSDT": [[open_time, open, high, ...], ...]}} theo thứ tự cột của API klines
+
+    Chế độ pre-fork: nến được ghi thêm vào journal dùng chung để các worker khác cũng cập nhật cache của chúng
+    """
+    if request.remote_addr not in LOCAL_ADDRESSES:
+        return jsonify({"error": "Chỉ nhận từ localhost"}), 403
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get("bars"), dict):
+        return jsonify({"error": "Body không hợp lệ"}), 400
+    timeframe = payload.get("timeframe", '15m')
+
+    try:
+        frames = {symbol.upper(): bars_to_dataframe(rows) for symbol, rows in payload["bars"].items()}
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    if prefork_server.shared_journal is not None:
+        prefork_server.shared_journal.append({"timeframe": timeframe, "bars": payload["bars"]})
+    updated = {symbol: frame_cache.append(symbol, timeframe, df) for symbol, df in frames.items()}
+    return jsonify({"timeframe": timeframe, "updated": updated})
+
+def bars_to_dataframe(rows):
+    page = np.asarray(rows, dtype=np.float64).reshape(-1, KLINE_FIELDS)
+    return pages_to_dataframe([page])
+
+def append_bars(timeframe, bars):
+    """
+    Cập nhật cache với các nến do worker khác nhận (dữ liệu đã được kiểm tra ở worker đó)
+    """
+    for symbol, rows in bars.items():
+        frame_cache.append(symbol.upper(), timeframe, bars_to_dataframe(rows))
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Số liệu của server theo định dạng text của Prometheus (format=json để xem dạng JSON):
+    thời gian request theo endpoint và theo từng bước, số request theo mã trạng thái, trạng thái các cache
+    """
+    cache = frame_cache.stats()
+    for name in ('entries', 'bytes', 'hits', 'misses', 'hit_ratio', 'coalesced'):
+        metrics.set(f'frame_cache_{name}', cache[name])
+    metrics.set('resample_cache_full_builds', resample_cache.full_builds)
+    metrics.set('resample_cache_incremental_updates', resample_cache.incremental_updates)
+    metrics.set('resample_cache_coalesced', resample_cache.flights.coalesced)
+    metrics.set('worker_pid', os.getpid())
+    metrics.set('uptime_seconds', round(time.time() - metrics.started, 3))
+
+    if request.args.get('format') == 'json':
+        return jsonify(metrics.summary())
+    return Response(metrics.to_prometheus(), mimetype='text/plain; version=0.0.4')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="API dữ liệu nến Binance Futures")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--production', action='store_true',
+                        help="Chạy nhiều worker pre-fork, không bật debugger/reloader")
+    parser.add_argument('--workers', type=int, default=prefork_server.DEFAULT_WORKERS,
+                        help="Số tiến trình worker ở chế độ production")
+    parser.add_argument('--access-log', action='store_true', help="Ghi log từng request ở chế độ production")
+    return parser.parse_args()
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    args = parse_args()
+    if args.production:
+        prefork_server.serve(app, args.host, args.port, args.workers, args.access_log)
+    else:
+        app.run(debug=True, host=args.host, port=args.port)
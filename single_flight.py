@@ -0,0 +1,49 @@
+"""
+Single-flight: gộp các lần gọi đồng thời cùng key thành một lần thực thi
+
+Dùng cho các cache của server.py (data_cache.FrameCache, resampler.ResampleCache): khi nhiều request
+cùng bị miss một key, chỉ một luồng đọc file/tính toán, các luồng còn lại chờ và dùng chung kết quả.
+"""
+import threading
+
+class SingleFlight:
+    """
+    Gộp các lần gọi đồng thời cùng key thành một lần thực thi: luồng đến trước chạy hàm,
+    các luồng đến sau chờ và nhận chung kết quả (hoặc chung exception)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> [Event báo xong, kết quả, exception]
+        self.calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn, *args):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = [threading.Event(), None, None]
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call[0].wait()
+            if call[2] is not None:
+                raise call[2]
+            return call[1]
+
+        try:
+            call[1] = fn(*args)
+            return call[1]
+        except BaseException as e:
+            call[2] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call[0].set()
+
+    def in_flight(self):
+        with self.lock:
+            return len(self.calls)
@@ -0,0 +1,220 @@
+"""
+Quét lưới tham số (grid search) cho chiến lược của backtest.py trên nhiều symbol bằng process pool
+
+- Mỗi symbol là một tác vụ: nến được đọc một lần, chỉ báo được tính một lần cho mỗi chu kỳ
+  và dùng chung cho mọi tổ hợp tham số có cùng chu kỳ
+- Kết quả được ghi dần vào file CSV kèm thanh tiến trình
+- Chạy lại cùng file kết quả sẽ bỏ qua các tổ hợp (symbol, timeframe, tham số, vốn, cỡ lệnh) đã có, nên có thể tiếp tục
+  sau khi bị ngắt; dòng cuối bị ghi dở khi ngắt được cắt bỏ và chạy lại
+
+Chạy: python sweep.py --ema 10,20,50 --lwma 14,28 --donchian 20,55 --tp 1.5,2.5 --sl 1,1.5 --workers 8
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tqdm import tqdm
+
+import backtest
+import indicators
+from data_cache import CONFIG_FILE, DATA_DIRECTORY, resolve_source
+
+PARAM_COLUMNS = ['ema_period', 'lwma_period', 'donchian_period', 'take_profit_percent', 'stop_loss_percent']
+METRIC_COLUMNS = ['totalTrades', 'winRate', 'profitFactor', 'maxDrawdown', 'longTrades', 'shortTrades',
+                  'tpHits', 'slHits', 'finalBalance', 'returnPercent']
+# Tham số chung của cả lần quét (--size, --balance), cũng là một phần của khóa tổ hợp
+BASE_COLUMNS = ['order_size_percent', 'initial_balance']
+RESULT_COLUMNS = ['symbol', 'timeframe'] + PARAM_COLUMNS + BASE_COLUMNS + METRIC_COLUMNS
+
+def config_symbols(config_file=CONFIG_FILE, timeframe='15m', directory=DATA_DIRECTORY):
+    """
+    Danh sách symbol trong marketdata của config.json có file dữ liệu
+    """
+    with open(config_file, 'r') as f:
+        config = json.load(f)
+    marketdata = config["exchange"]["binance"]["marketdata"]
+    symbols = [item.get("fullname", key.upper()) for key, item in marketdata.items()]
+    return [symbol for symbol in symbols if resolve_source(symbol, timeframe, directory)[0] is not None]
+
+def build_grid(ema_periods, lwma_periods, donchian_periods, tp_percents, sl_percents):
+    """
+    Tạo danh sách tổ hợp tham số (TP/SL truyền vào theo %, lưu dạng tỉ lệ như backtest.py)
+    """
+    return [
+        {
+            "ema_period": ema_period,
+            "lwma_period": lwma_period,
+            "donchian_period": donchian_period,
+            "take_profit_percent": tp / 100,
+            "stop_loss_percent": sl / 100,
+        }
+        for ema_period, lwma_period, donchian_period, tp, sl
+        in itertools.product(ema_periods, lwma_periods, donchian_periods, tp_percents, sl_percents)
+    ]
+
+def combo_key(symbol, timeframe, params):
+    # repr giữ đủ chữ số để hai giá trị gần nhau (VD: 1000000 và 1000001) không trùng khóa
+    return (symbol, timeframe) + tuple(repr(float(params[name])) for name in PARAM_COLUMNS + BASE_COLUMNS)
+
+def repair_results(results_file):
+    """
+    Cắt dòng cuối bị ghi dở (không kết thúc bằng xuống dòng) để các dòng mới không bị nối vào nó
+
+    Raises:
+    ValueError: File có header khác RESULT_COLUMNS (file của phiên bản cũ hoặc không phải kết quả sweep)
+    """
+    if not os.path.exists(results_file) or os.path.getsize(results_file) == 0:
+        return
+    with open(results_file, 'rb+') as f:
+        header = f.readline().decode().strip()
+        if header and header.split(',') != RESULT_COLUMNS:
+            raise ValueError(f"{results_file} có các cột khác kết quả sweep hiện tại, hãy dùng --output khác")
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - 1))
+        if f.read(1) == b'\n':
+            return
+        # Tìm lần xuống dòng cuối cùng, từ cuối file ngược lên
+        end = size
+        while end > 0:
+            start = max(0, end - 65536)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            end = start
+        f.truncate(0)
+
+def load_done(results_file):
+    """
+    Đọc file kết quả đã có để bỏ qua các tổ hợp đã chạy (dòng thiếu cột thì coi như chưa chạy)
+    """
+    done = set()
+    if not os.path.exists(results_file):
+        return done
+    with open(results_file, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            # Thiếu cột (giá trị None) hoặc thừa cột (khóa None)
+            if None in row or None in row.values():
+                continue
+            try:
+                done.add(combo_key(row['symbol'], row['timeframe'], row))
+            except (KeyError, ValueError):
+                continue
+    return done
+
+def run_symbol(symbol, combos, timeframe='15m', base_params=None):
+    """
+    Chạy toàn bộ tổ hợp tham số cho một symbol (chạy trong process con)
+    Chỉ báo được cache theo chu kỳ để dùng chung giữa các tổ hợp
+    """
+    candles = backtest.load_candles(symbol, timeframe)
+    close = candles["close"]
+    ema_cache = {}
+    lwma_cache = {}
+    donchian_cache = {}
+
+    rows = []
+    for combo in combos:
+        params = backtest.merge_params(base_params)
+        params.update(combo)
+        ema_period = params["ema_period"]
+        lwma_period = params["lwma_period"]
+        donchian_period = params["donchian_period"]
+        if ema_period not in ema_cache:
+            ema_cache[ema_period] = indicators.ema(close, ema_period)
+        if lwma_period not in lwma_cache:
+            lwma_cache[lwma_period] = indicators.lwma(close, lwma_period)
+        if donchian_period not in donchian_cache:
+            donchian_cache[donchian_period] = indicators.donchian(candles["high"], candles["low"], donchian_period)[1]
+
+        result = backtest.run_backtest(candles, params, {
+            "ema": ema_cache[ema_period],
+            "lwma": lwma_cache[lwma_period],
+            "donchian_middle": donchian_cache[donchian_period],
+        })
+        metrics = result["metrics"]
+        row = {"symbol": symbol, "timeframe": timeframe}
+        row.update({name: params[name] for name in PARAM_COLUMNS + BASE_COLUMNS})
+        row.update({name: metrics[name] for name in METRIC_COLUMNS if name in metrics})
+        row["finalBalance"] = result["balance"]
+        row["returnPercent"] = (result["balance"] / params["initial_balance"] - 1) * 100
+        rows.append(row)
+    return symbol, rows
+
+def run_sweep(symbols, grid, results_file, workers=None, timeframe='15m', base_params=None):
+    """
+    Chạy grid trên danh sách symbol bằng process pool, ghi dần kết quả vào results_file
+    """
+    repair_results(results_file)
+    done = load_done(results_file)
+    base = {name: backtest.merge_params(base_params)[name] for name in BASE_COLUMNS}
+    tasks = {}
+    for symbol in symbols:
+        remaining = [combo for combo in grid if combo_key(symbol, timeframe, {**combo, **base}) not in done]
+        if remaining:
+            tasks[symbol] = remaining
+
+    total = sum(len(combos) for combos in tasks.values())
+    skipped = len(symbols) * len(grid) - total
+    print(f"{len(symbols)} symbol x {len(grid)} tổ hợp: cần chạy {total}, bỏ qua {skipped} đã có")
+    if not tasks:
+        return
+
+    write_header = not os.path.exists(results_file) or os.path.getsize(results_file) == 0
+    with open(results_file, 'a', newline='') as f, ProcessPoolExecutor(max_workers=workers) as executor:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        if write_header:
+            writer.writeheader()
+
+        futures = {executor.submit(run_symbol, symbol, combos, timeframe, base_params): symbol
+                   for symbol, combos in tasks.items()}
+        progress = tqdm(total=total, desc="Sweep")
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                _, rows = future.result()
+            except Exception as e:
+                print(f"\nLỗi khi chạy {symbol}: {e}")
+                progress.update(len(tasks[symbol]))
+                continue
+            writer.writerows(rows)
+            # Ghi xuống đĩa ngay để có thể tiếp tục nếu bị ngắt
+            f.flush()
+            progress.update(len(rows))
+        progress.close()
+
+def parse_list(text, cast):
+    return [cast(part) for part in text.split(',') if part.strip()]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Quét tham số chiến lược trên nhiều symbol")
+    parser.add_argument('--symbols', default='', help="Danh sách symbol, mặc định: mọi symbol trong config.json")
+    parser.add_argument('--timeframe', default='15m')
+    parser.add_argument('--ema', default='20', help="Các chu kỳ EMA, VD: 10,20,50")
+    parser.add_argument('--lwma', default='14')
+    parser.add_argument('--donchian', default='20')
+    parser.add_argument('--tp', default='2.5', help="Các mức take profit (%%)")
+    parser.add_argument('--sl', default='1.5', help="Các mức stop loss (%%)")
+    parser.add_argument('--size', type=float, default=backtest.DEFAULT_PARAMS["order_size_percent"] * 100)
+    parser.add_argument('--balance', type=float, default=backtest.DEFAULT_PARAMS["initial_balance"])
+    parser.add_argument('--workers', type=int, default=None, help="Số process (mặc định: số CPU)")
+    parser.add_argument('--output', default="sweep_results.csv")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    symbols = parse_list(args.symbols, str) or config_symbols(timeframe=args.timeframe)
+    grid = build_grid(parse_list(args.ema, int), parse_list(args.lwma, int), parse_list(args.donchian, int),
+                      parse_list(args.tp, float), parse_list(args.sl, float))
+    base_params = {"order_size_percent": args.size / 100, "initial_balance": args.balance}
+    try:
+        run_sweep(symbols, grid, args.output, args.workers, args.timeframe, base_params)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+if __name__ == '__main__':
+    main()
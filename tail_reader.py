@@ -0,0 +1,230 @@
+"""
+Đọc nhanh N nến cuối của file CSV bằng cách đọc ngược từ cuối file theo từng block,
+chỉ parse đúng N dòng cần thiết (chi phí tỉ lệ với N, không phụ thuộc kích thước file)
+
+Kèm theo sparse index: offset byte của mỗi K dòng, dùng để nhảy thẳng tới một khoảng thời gian.
+"""
+import io
+import os
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+DEFAULT_INDEX_EVERY = 1000
+DATE_COLUMNS = ['open_time', 'close_time']
+INDEX_SUFFIX = '.idx'
+
+# times: open_time (ms) của dòng được đánh dấu, offsets: vị trí byte đầu dòng đó
+# file_size, n_rows: kích thước file và số dòng dữ liệu tại thời điểm tạo index
+SparseIndex = namedtuple('SparseIndex', ['times', 'offsets', 'every', 'data_start', 'file_size', 'n_rows'])
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        return f.readline().rstrip(b'\r\n')
+
+def read_last_lines(path, n, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Trả về tối đa n dòng dữ liệu cuối cùng (dạng bytes, không gồm header)
+    """
+    if n <= 0:
+        return []
+
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        position = f.tell()
+        chunks = []
+        newlines = 0
+        # Cần n + 1 dấu xuống dòng (tính cả dấu cuối file) để chắc chắn có n dòng hoàn chỉnh
+        while position > 0 and newlines <= n:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            chunk = f.read(read_size)
+            chunks.append(chunk)
+            newlines += chunk.count(b'\n')
+
+    data = b''.join(reversed(chunks)).rstrip(b'\r\n')
+    if not data:
+        return []
+    lines = data.split(b'\n')
+    # Dòng đầu là header (nếu đã đọc tới đầu file) hoặc một dòng bị cắt dở
+    lines = lines[1:]
+    return lines[-n:]
+
+def parse_lines(header, lines):
+    """
+    Parse các dòng CSV (bytes) thành DataFrame giống pd.read_csv của cả file
+    """
+    buffer = io.BytesIO(header + b'\n' + b'\n'.join(lines) + b'\n')
+    return pd.read_csv(buffer, parse_dates=DATE_COLUMNS)
+
+def read_tail(path, n, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Đọc n nến cuối cùng của file CSV thành DataFrame
+    """
+    return parse_lines(read_header(path), read_last_lines(path, n, block_size))
+
+def _parse_open_times(lines):
+    # Cột đầu tiên là open_time dạng 'YYYY-mm-dd HH:MM:SS'
+    values = np.array([line.split(b',', 1)[0].decode() for line in lines], dtype='datetime64[ms]')
+    return values.astype(np.int64)
+
+def _scan_rows(data, base_offset, first_row, every):
+    """
+    Tìm các dòng dữ liệu trong `data` (bắt đầu tại base_offset, dòng đầu tiên có số thứ tự first_row)
+    và trả về (times, offsets) của các dòng có số thứ tự chia hết cho `every`, cùng số dòng tìm được
+    """
+    newline_positions = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n'))
+    # Mỗi dòng bắt đầu ở đầu đoạn hoặc ngay sau dấu xuống dòng (bỏ vị trí cuối đoạn)
+    row_starts = np.concatenate([[0], newline_positions + 1])
+    row_starts = row_starts[row_starts < len(data)]
+
+    row_numbers = first_row + np.arange(len(row_starts))
+    marked = row_starts[row_numbers % every == 0]
+    lines = [data[start:data.find(b',', start)] for start in marked]
+    times = _parse_open_times(lines) if lines else np.empty(0, np.int64)
+    return times, marked.astype(np.int64) + base_offset, len(row_starts)
+
+def build_sparse_index(path, every=DEFAULT_INDEX_EVERY):
+    """
+    Quét file một lần, ghi lại open_time và offset byte của mỗi `every` dòng dữ liệu
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        data = f.read()
+
+    data_start = len(header)
+    times, offsets, n_rows = _scan_rows(data, data_start, 0, every)
+    return SparseIndex(times, offsets, every, data_start, data_start + len(data), n_rows)
+
+def _index_matches(path, index):
+    """
+    Kiểm tra nhanh index còn khớp với file: dòng được đánh dấu cuối cùng vẫn nằm đúng offset cũ
+    (file bị ghi lại toàn bộ thì thường không còn khớp)
+    """
+    if len(index.offsets) == 0:
+        return True
+    with open(path, 'rb') as f:
+        f.seek(int(index.offsets[-1]))
+        line = f.readline()
+    try:
+        return _parse_open_times([line.split(b',', 1)[0]])[0] == index.times[-1]
+    except ValueError:
+        return False
+
+def update_sparse_index(path, index):
+    """
+    Cập nhật index sau khi file được ghi nối tiếp: chỉ quét phần byte mới phía sau index.file_size
+    File bị thu nhỏ (ghi lại toàn bộ) thì tạo lại index từ đầu
+    """
+    size = os.path.getsize(path)
+    if size < index.file_size or not _index_matches(path, index):
+        return build_sparse_index(path, index.every)
+    if size == index.file_size:
+        return index
+
+    with open(path, 'rb') as f:
+        f.seek(index.file_size)
+        data = f.read(size - index.file_size)
+
+    times, offsets, n_rows = _scan_rows(data, index.file_size, index.n_rows, index.every)
+    return SparseIndex(np.concatenate([index.times, times]), np.concatenate([index.offsets, offsets]),
+                       index.every, index.data_start, size, index.n_rows + n_rows)
+
+def index_path_for_csv(csv_path):
+    return os.path.splitext(csv_path)[0] + INDEX_SUFFIX
+
+def save_sparse_index(index, path):
+    """
+    Lưu index ra file .npz (ghi file tạm rồi đổi tên)
+
+    Mỗi lần ghi dùng một file tạm riêng: server (nhiều luồng, nhiều worker) và downloader có thể
+    cùng lưu index của một file CSV.
+    """
+    meta = np.array([index.every, index.data_start, index.file_size, index.n_rows], dtype=np.int64)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.',
+                                     suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, times=index.times, offsets=index.offsets, meta=meta)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+def load_sparse_index(path):
+    with np.load(path) as data:
+        every, data_start, file_size, n_rows = (int(value) for value in data['meta'])
+        return SparseIndex(data['times'], data['offsets'], every, data_start, file_size, n_rows)
+
+def refresh_index(csv_path, every=DEFAULT_INDEX_EVERY):
+    """
+    Đọc index đã lưu của file CSV (tạo mới nếu chưa có), cập nhật phần ghi nối tiếp và lưu lại
+
+    Lưu lỗi (thư mục chỉ đọc, hết chỗ...) thì vẫn trả về index trong bộ nhớ, lần sau sẽ thử lưu lại.
+    """
+    path = index_path_for_csv(csv_path)
+    index = None
+    if os.path.exists(path):
+        try:
+            index = load_sparse_index(path)
+        except Exception:
+            index = None
+
+    if index is None or index.every != every:
+        updated = build_sparse_index(csv_path, every)
+    else:
+        updated = update_sparse_index(csv_path, index)
+
+    if updated is not index:
+        try:
+            save_sparse_index(updated, path)
+        except OSError:
+            pass
+    return updated
+
+def read_range(path, start_ms=None, end_ms=None, index=None):
+    """
+    Đọc các nến có open_time trong [start_ms, end_ms] (ms)
+
+    Có sparse index: chỉ đọc đoạn byte chứa khoảng thời gian cần thiết.
+    Không có index: parse cả file rồi lọc.
+    """
+    header = read_header(path)
+
+    if index is None or len(index.times) == 0:
+        df = pd.read_csv(path, parse_dates=DATE_COLUMNS)
+    else:
+        lo = index.data_start
+        if start_ms is not None:
+            position = int(np.searchsorted(index.times, start_ms, side='right')) - 1
+            if position >= 0:
+                lo = int(index.offsets[position])
+
+        hi = None
+        if end_ms is not None:
+            position = int(np.searchsorted(index.times, end_ms, side='right'))
+            if position < len(index.offsets):
+                hi = int(index.offsets[position])
+
+        with open(path, 'rb') as f:
+            f.seek(lo)
+            data = f.read() if hi is None else f.read(hi - lo)
+        data = data.rstrip(b'\r\n')
+        if not data:
+            return parse_lines(header, [])
+        df = parse_lines(header, data.split(b'\n'))
+
+    open_time = df['open_time'].to_numpy('datetime64[ms]').astype(np.int64)
+    mask = np.ones(len(df), dtype=bool)
+    if start_ms is not None:
+        mask &= open_time >= start_ms
+    if end_ms is not None:
+        mask &= open_time <= end_ms
+    return df[mask].reset_index(drop=True)
@@ -0,0 +1,70 @@
+"""
+Kiểm tra cross_analytics.update trên dữ liệu giả lập (CSV theo định dạng của binance.py)
+
+Chạy từ thư mục gốc: python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cross_analytics
+
+INTERVAL = pd.Timedelta(minutes=15)
+START = pd.Timestamp('2024-03-12 00:00:00')
+
+def write_csv(directory, symbol, n_rows, seed):
+    """
+    File CSV 15m giả lập với n_rows nến, giá đi ngẫu nhiên
+    """
+    rng = np.random.default_rng(seed)
+    close = 10.0 * np.exp(np.cumsum(rng.normal(0, 0.01, n_rows)))
+    open_time = pd.date_range(START, periods=n_rows, freq=INTERVAL)
+    df = pd.DataFrame({
+        'open_time': open_time.strftime('%Y-%m-%d %H:%M:%S'),
+        'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+        'volume': 1000.0,
+        'close_time': (open_time + INTERVAL - pd.Timedelta(milliseconds=1)).strftime('%Y-%m-%d %H:%M:%S.%f').str[:-3],
+        'quote_asset_volume': 1000.0 * close, 'number_of_trades': 10,
+        'taker_buy_base_asset_volume': 500.0, 'taker_buy_quote_asset_volume': 500.0 * close, 'ignore': 0,
+    })
+    df.to_csv(os.path.join(directory, f"binance_{symbol}_15m.csv"), index=False)
+
+def test_grid_shorter_than_window(tmp_path):
+    data, analytics = tmp_path / "data", tmp_path / "analytics"
+    data.mkdir()
+    # window/2 < 60 < window: rolling_return chưa có dòng nào đủ cửa sổ
+    write_csv(data, "AAAUSDT", 60, seed=1)
+    write_csv(data, "BBBUSDT", 60, seed=2)
+    summary = cross_analytics.update('15m', ["AAAUSDT", "BBBUSDT"], window=96, corr_window=96,
+                                     directory=str(analytics), data_directory=str(data))
+    assert summary["rows"] == 60
+
+    state = cross_analytics.load_state(summary["path"])
+    assert np.isnan(state["rolling_return"]).all()
+    assert np.isnan(state["log_return"][0]).all()
+    assert not np.isnan(state["log_return"][1:]).any()
+    assert not np.isnan(state["volatility"][-1]).any()
+
+def test_incremental_past_window_matches_rebuild(tmp_path):
+    data, incremental, rebuilt = tmp_path / "data", tmp_path / "incremental", tmp_path / "rebuilt"
+    data.mkdir()
+    symbols = ["AAAUSDT", "BBBUSDT"]
+    for n_rows in (60, 90, 150):
+        for seed, symbol in enumerate(symbols):
+            write_csv(data, symbol, n_rows, seed)
+        cross_analytics.update('15m', symbols, window=96, corr_window=96,
+                               directory=str(incremental), data_directory=str(data))
+    cross_analytics.update('15m', symbols, window=96, corr_window=96,
+                           directory=str(rebuilt), data_directory=str(data), rebuild=True)
+
+    first = cross_analytics.load_state(cross_analytics.analytics_path('15m', str(incremental)))
+    second = cross_analytics.load_state(cross_analytics.analytics_path('15m', str(rebuilt)))
+    assert first["rows"] == second["rows"] == 150
+    for name in list(cross_analytics.SERIES) + list(cross_analytics.MATRICES):
+        np.testing.assert_array_equal(first[name], second[name])
+    assert not np.isnan(first["rolling_return"][96:]).any()
@@ -0,0 +1,224 @@
+"""
+WebSocket tối giản (RFC 6455) trên socket của thư viện chuẩn, đủ cho stream kline của Binance
+và server phát lại cục bộ (replay_stream.py)
+
+- connect(url): client ws:// hoặc wss:// (TLS qua ssl), frame gửi đi được mask như quy định
+- server_handshake(): nhận HTTP Upgrade ở phía server, trả về đường dẫn được yêu cầu
+- WebSocket.recv(): trả về message text/binary đã ghép các fragment, tự trả lời ping bằng pong,
+  trả về None khi đầu kia đóng kết nối
+"""
+import base64
+import hashlib
+import os
+import socket
+import ssl
+import struct
+import threading
+from urllib.parse import urlsplit
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# Giới hạn kích thước một message để tránh cấp phát vô hạn khi dữ liệu hỏng
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+class WebSocketError(Exception):
+    pass
+
+def accept_key(key):
+    digest = hashlib.sha1((key + GUID).encode()).digest()
+    return base64.b64encode(digest).decode()
+
+def encode_frame(opcode, payload, mask):
+    """
+    Một frame hoàn chỉnh (FIN=1); client phải mask payload, server thì không
+    """
+    header = bytearray([0x80 | opcode])
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack('>H', length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack('>Q', length)
+    if not mask:
+        return bytes(header) + payload
+    key = os.urandom(4)
+    return bytes(header) + key + _apply_mask(payload, key)
+
+def _apply_mask(payload, key):
+    # XOR cả payload một lần qua số nguyên lớn, nhanh hơn nhiều so với XOR từng byte trong Python
+    repeated = (key * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')).to_bytes(len(payload), 'big')
+
+def _read_exact(reader, count):
+    data = reader.read(count)
+    if data is None or len(data) < count:
+        raise ConnectionError("Kết nối WebSocket bị đóng giữa chừng")
+    return data
+
+def read_headers(reader):
+    """
+    Đọc dòng đầu và các header HTTP tới dòng trống
+
+    Returns:
+    tuple: (dòng đầu, dict header với tên viết thường)
+    """
+    first_line = reader.readline().decode('latin-1').strip()
+    headers = {}
+    while True:
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Kết nối bị đóng khi đang đọc header")
+        line = line.decode('latin-1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return first_line, headers
+
+class WebSocket:
+    """
+    Một kết nối WebSocket đã handshake xong
+
+    reader: file đọc có buffer của socket (dùng chung với phần đọc header HTTP)
+    mask: True ở phía client
+    """
+
+    def __init__(self, sock, reader, mask):
+        self.sock = sock
+        self.reader = reader
+        self.mask = mask
+        self.send_lock = threading.Lock()
+        self.closed = False
+
+    def send_frame(self, opcode, payload):
+        frame = encode_frame(opcode, payload, self.mask)
+        with self.send_lock:
+            self.sock.sendall(frame)
+
+    def send_text(self, text):
+        self.send_frame(OP_TEXT, text.encode())
+
+    def read_frame(self):
+        """
+        Returns:
+        tuple: (fin, opcode, payload)
+        """
+        first, second = _read_exact(self.reader, 2)
+        fin = bool(first & 0x80)
+        opcode = first & 0x0F
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('>H', _read_exact(self.reader, 2))[0]
+        elif length == 127:
+            length = struct.unpack('>Q', _read_exact(self.reader, 8))[0]
+        if length > MAX_MESSAGE_SIZE:
+            raise WebSocketError(f"Frame quá lớn ({length} byte)")
+        key = _read_exact(self.reader, 4) if second & 0x80 else None
+        payload = _read_exact(self.reader, length) if length else b''
+        if key is not None and payload:
+            payload = _apply_mask(payload, key)
+        return fin, opcode, payload
+
+    def recv(self):
+        """
+        Message tiếp theo (str với text, bytes với binary), None nếu kết nối đã đóng
+        """
+        fragments = []
+        message_opcode = None
+        while True:
+            fin, opcode, payload = self.read_frame()
+            if opcode == OP_PING:
+                self.send_frame(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                if not self.closed:
+                    self.closed = True
+                    try:
+                        self.send_frame(OP_CLOSE, payload[:2])
+                    except OSError:
+                        pass
+                return None
+            if opcode != OP_CONTINUATION:
+                message_opcode = opcode
+            fragments.append(payload)
+            if fin:
+                data = b''.join(fragments)
+                return data.decode() if message_opcode == OP_TEXT else data
+
+    def close(self, code=1000):
+        if not self.closed:
+            self.closed = True
+            try:
+                self.send_frame(OP_CLOSE, struct.pack('>H', code))
+            except OSError:
+                pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+def connect(url, timeout=10):
+    """
+    Mở kết nối WebSocket tới url (ws:// hoặc wss://)
+
+    timeout: thời gian chờ tối đa cho kết nối và cho mỗi lần đọc (giây)
+    """
+    parts = urlsplit(url)
+    secure = parts.scheme == 'wss'
+    if parts.scheme not in ('ws', 'wss'):
+        raise WebSocketError(f"URL không hợp lệ: {url}")
+    host = parts.hostname
+    port = parts.port or (443 if secure else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+
+    sock = socket.create_connection((host, port), timeout=timeout)
+    if secure:
+        sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+    key = base64.b64encode(os.urandom(16)).decode()
+    request = (f"GET {path} HTTP/1.1\r\n"
+               f"Host: {host}:{port}\r\n"
+               "Upgrade: websocket\r\n"
+               "Connection: Upgrade\r\n"
+               f"Sec-WebSocket-Key: {key}\r\n"
+               "Sec-WebSocket-Version: 13\r\n\r\n")
+    sock.sendall(request.encode())
+    reader = sock.makefile('rb')
+    status, headers = read_headers(reader)
+    if ' 101 ' not in f"{status} " or headers.get('sec-websocket-accept') != accept_key(key):
+        sock.close()
+        raise WebSocketError(f"Handshake thất bại: {status}")
+    return WebSocket(sock, reader, mask=True)
+
+def server_handshake(sock, reader):
+    """
+    Nhận yêu cầu Upgrade từ client và trả lời 101
+
+    Returns:
+    str: Đường dẫn (kèm query string) client yêu cầu
+    """
+    request_line, headers = read_headers(reader)
+    key = headers.get('sec-websocket-key')
+    if not request_line.startswith('GET ') or headers.get('upgrade', '').lower() != 'websocket' or not key:
+        sock.sendall(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+        raise WebSocketError(f"Yêu cầu không phải WebSocket: {request_line}")
+    response = ("HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n")
+    sock.sendall(response.encode())
+    return request_line.split(' ')[1]